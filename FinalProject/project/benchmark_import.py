@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the time taken to import utils.brick, compared with the time taken
+to import it and initialize the brick, and with the import of the brick module before
+initialization was deferred (commit 3f9da15), which initialized the brick and wrote
+the PID file through a shell on every import.
+
+Each measurement runs in a fresh Python process, so nothing is already imported.
+The previous module is read from git into a temporary folder, and every process gets
+a temporary home folder, so the real ~/brickpi3_pid is never overwritten.
+"""
+
+from statistics import median
+import os
+import subprocess
+import sys
+import tempfile
+
+
+RUNS = 7
+PREVIOUS_COMMIT = "3f9da15"  # last commit where importing utils.brick initialized the brick
+PREVIOUS_FILES = ("utils/__init__.py", "utils/brick.py", "utils/dummy.py")
+PROJECT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_ONLY = """
+import time
+start = time.perf_counter()
+import utils.brick
+print(time.perf_counter() - start)
+"""
+IMPORT_AND_INITIALIZE = """
+import time
+start = time.perf_counter()
+import utils.brick
+utils.brick.initialize_brick()
+print(time.perf_counter() - start)
+"""
+
+
+def copy_previous_module(folder: str):
+    "Write the files of the previous brick module into folder, from git."
+    prefix = subprocess.run(["git", "rev-parse", "--show-prefix"], cwd=PROJECT_FOLDER,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    os.makedirs(os.path.join(folder, "utils"))
+    for path in PREVIOUS_FILES:
+        content = subprocess.run(["git", "show", f"{PREVIOUS_COMMIT}:{prefix}{path}"], cwd=PROJECT_FOLDER,
+                                 capture_output=True, check=True).stdout
+        with open(os.path.join(folder, path), "wb") as f:
+            f.write(content)
+
+
+def time_in_new_process(code: str, folder: str, home: str) -> float:
+    "Run code in a new Python process in folder, and return the number of seconds it prints."
+    env = dict(os.environ, HOME=home)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure imports from the compiled files
+    result = subprocess.run([sys.executable, "-c", code], cwd=folder, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark():
+    "Print the median time of each measurement over several runs."
+    with tempfile.TemporaryDirectory() as previous_folder, tempfile.TemporaryDirectory() as home:
+        copy_previous_module(previous_folder)
+        for folder in (PROJECT_FOLDER, previous_folder):
+            time_in_new_process(IMPORT_ONLY, folder, home)  # make sure the compiled files are cached
+        import_only = median(time_in_new_process(IMPORT_ONLY, PROJECT_FOLDER, home) for _ in range(RUNS))
+        initialized = median(time_in_new_process(IMPORT_AND_INITIALIZE, PROJECT_FOLDER, home) for _ in range(RUNS))
+        previous = median(time_in_new_process(IMPORT_ONLY, previous_folder, home) for _ in range(RUNS))
+    print(f"import utils.brick:                  {import_only * 1000:8.1f} ms")
+    print(f"import utils.brick + initialization: {initialized * 1000:8.1f} ms")
+    print(f"previous import of utils.brick:      {previous * 1000:8.1f} ms")
+    print(f"speedup of the import alone: {previous / import_only:.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
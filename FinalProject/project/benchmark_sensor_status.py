@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of Brick.get_sensor_status and Brick.get_sensor, comparing the request
+built on every call (as the original if/elif implementation and the BrickPi3 driver do)
+with the request precomputed by utils.brick.Brick.set_sensor_type.
+
+Run it on the robot to include the SPI transfer time, or on a computer
+(dummy brick) to measure only the Python overhead of each call. The dummy brick
+reads sensor values itself, so get_sensor is only compared on the robot.
+"""
+
+from utils.brick import Brick, BrickPi3, SENSOR_STATE, _SENSOR_REQUEST_LENGTHS
+import time
+
+
+CALLS = 20000
+SENSOR_TYPES = {
+    "touch": BrickPi3.SENSOR_TYPE.TOUCH,
+    "ultrasonic": BrickPi3.SENSOR_TYPE.EV3_ULTRASONIC_CM,
+    "color components": BrickPi3.SENSOR_TYPE.EV3_COLOR_COLOR_COMPONENTS,
+}
+
+# Sensor types in the order the original if/elif chain tested them
+LEGACY_TYPE_ORDER = list(_SENSOR_REQUEST_LENGTHS)
+
+
+def legacy_get_sensor_status(bp, port):
+    """
+    Minimal reference of the original Brick.get_sensor_status: it found the port and the
+    sensor type with if/elif chains, and built a new request list, on every call.
+    """
+    ports = [bp.PORT_1, bp.PORT_2, bp.PORT_3, bp.PORT_4]
+    if port not in ports:
+        raise IOError("get_sensor error. Must be one sensor port at a time. PORT_1, PORT_2, PORT_3, or PORT_4.")
+    port_index = ports.index(port)
+    message_type = bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_1 + port_index
+    for sensor_type in LEGACY_TYPE_ORDER:
+        if bp.SensorType[port_index] == sensor_type:
+            break
+    else:
+        raise IOError("get_sensor error: Sensor not configured or not supported.")
+    out_array = [bp.SPI_Address, message_type] + [0] * (_SENSOR_REQUEST_LENGTHS[sensor_type] - 2)
+    reply = bp.spi_transfer_array(out_array)
+    if reply[3] != 0xA5:
+        raise IOError("get_sensor error: No SPI response")
+    if reply[4] == bp.SensorType[port_index]:
+        return reply[5]
+    return SENSOR_STATE.INCORRECT_SENSOR_PORT
+
+
+def time_per_call(func, port) -> float:
+    "Return the average time in microseconds of func(port)."
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func(port)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def run_benchmark():
+    "Print the per-call cost of both implementations for a few sensor types."
+    brick = Brick()
+    port = BrickPi3.PORT_1
+    print(f"{'read':<28}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, sensor_type in SENSOR_TYPES.items():
+        brick.set_sensor_type(port, sensor_type)
+        rows = [("status", lambda p: legacy_get_sensor_status(brick.bp, p), brick.get_sensor_status)]
+        if brick._decodes_values:
+            rows.append(("value", brick.bp.get_sensor, brick.get_sensor))
+        for read, before_func, after_func in rows:
+            before = time_per_call(before_func, port)
+            after = time_per_call(after_func, port)
+            print(f"{name + ' ' + read:<28}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
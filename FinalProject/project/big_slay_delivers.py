@@ -4,7 +4,7 @@ This code handles the delivery system.
 Author: Yu An Lu, Nazia Chowdhury, Lucy Zhang, and Samantha Perez Hoffman
 """
 
-from utils.brick import EV3ColorSensor, wait_ready_sensors, BP, Motor, TouchSensor
+from utils.brick import EV3ColorSensor, wait_ready_sensors, BP, Motor, MotorGroup, TouchSensor, SensorHub
 import time
 import color_detection_navigation as cdn
 import color_detection_delivery_zone as cddz
@@ -17,6 +17,13 @@ LEFT_MOTOR = Motor("C")
 RIGHT_MOTOR = Motor("B")
 PUSH_MOTOR = Motor("A")
 CONVEYOR_BELT_MOTOR = Motor("D")
+WHEELS = MotorGroup(LEFT_MOTOR, RIGHT_MOTOR)
+
+# One thread polls every sensor, navigation and zone detection read its cache
+# The touch sensor is only polled while waiting for the button, see system_start
+SENSOR_HUB = SensorHub()
+SENSOR_HUB.register(COLOR_SENSOR_1, rate=50)
+SENSOR_HUB.register(COLOR_SENSOR_2, rate=50)
 
 POWER_LIMIT = 80       # Power limit = 80%
 SPEED_LIMIT = 720      # Speed limit = 720 deg per sec (dps)
@@ -28,10 +35,12 @@ stop_system = True
 
 def system_start():
     global stop_system
-    while stop_system:
-        if TOUCH_SENSOR.is_pressed():
-            print("System Activated!")
-            stop_system = False
+    if stop_system:
+        SENSOR_HUB.register(TOUCH_SENSOR, rate=TouchSensor.POLL_RATE)
+        TOUCH_SENSOR.wait_for_press()
+        SENSOR_HUB.unregister(TOUCH_SENSOR) # Not needed while the robot moves
+        print("System Activated!")
+        stop_system = False
     print ("Navigation Time!")
     navigation()
 
@@ -63,44 +72,28 @@ def motor_set_up():
     PUSH_MOTOR.set_power(0)
     CONVEYOR_BELT_MOTOR.set_power(0)
 
+def move_wheels(left_degrees, right_degrees, dps):
+    # Start both wheels together, then wait until both encoders reach their targets
+    WHEELS.move_relative([left_degrees, right_degrees], dps)
+
 def turn_right():
-    LEFT_MOTOR.set_dps(150) # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(150)
-    LEFT_MOTOR.set_position_relative(85) # Rotate the left motor only to turn right
-    RIGHT_MOTOR.set_position_relative(0)
-    time.sleep(0.5)
+    move_wheels(85, 0, 150) # Rotate the left motor only to turn right
 
 def turn_left():
     print("left!")
-    LEFT_MOTOR.set_dps(150) # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(150)
-    LEFT_MOTOR.set_position_relative(0) # Rotate the right motor only to turn left
-    RIGHT_MOTOR.set_position_relative(85)
-    time.sleep(0.5)
+    move_wheels(0, 85, 150) # Rotate the right motor only to turn left
 
 def move_forward():
     print("straight!")
-    LEFT_MOTOR.set_dps(150)                              # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(150)
-    LEFT_MOTOR.set_position_relative(90)             # Rotate the desired amount of degrees
-    RIGHT_MOTOR.set_position_relative(90)
-    time.sleep(0.5)
+    move_wheels(90, 90, 150)             # Rotate the desired amount of degrees
     
 def move_forward_small():
     print("move_forward_small!")
-    LEFT_MOTOR.set_dps(150)                              # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(150)
-    LEFT_MOTOR.set_position_relative(0)             # Rotate the desired amount of degrees
-    RIGHT_MOTOR.set_position_relative(15)
-    time.sleep(0.5)
+    move_wheels(0, 15, 150)             # Rotate the desired amount of degrees
     
 def move_forward_small_zone():
     print("move_forward_small_zone!")
-    LEFT_MOTOR.set_dps(150)                              # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(150)
-    LEFT_MOTOR.set_position_relative(20)             # Rotate the desired amount of degrees
-    RIGHT_MOTOR.set_position_relative(20)
-    time.sleep(1)
+    move_wheels(20, 20, 150)             # Rotate the desired amount of degrees
 
 def stop_moving():
     global zone_color, zone_color_detected, delivery_count
@@ -149,11 +142,7 @@ def zone_color_detection():
 
 def turn_180():
     print("Turning 180 degrees!")
-    LEFT_MOTOR.set_dps(90)                              # Set the speed for the motor
-    RIGHT_MOTOR.set_dps(90)
-    LEFT_MOTOR.set_position_relative(0)             # Rotate the desired amount of degrees
-    RIGHT_MOTOR.set_position_relative(1440)
-    time.sleep(15)
+    move_wheels(0, 1440, 90)             # Rotate the desired amount of degrees
 
 def navigation():
     global return_loading_bay, stop_system, delivery_count, zone_navigation, zone_color_detected
@@ -317,10 +306,7 @@ def moveConveyorBelt():
     rotations = numberOfPositions * rotationPerPositionConstant
 
     # Encoder keeps a record of degrees turned
-    CONVEYOR_BELT_MOTOR.set_dps(70)
-    CONVEYOR_BELT_MOTOR.set_position_relative(rotations)             # Rotate the desired amount of degrees
-    
-    time.sleep(5)
+    CONVEYOR_BELT_MOTOR.move_relative(rotations, 70)             # Rotate the desired amount of degrees
     pushCube() # push cube into delivery zone
 
 def pushCube():
@@ -329,17 +315,15 @@ def pushCube():
     # this is where the logic for the pusher will go
     print("push cube")
     # Encoder keeps a record of degrees turned
-    PUSH_MOTOR.set_position_relative(-50) # Rotate negative rotation when pushing out cube 
-    time.sleep(2)
-    PUSH_MOTOR.set_position_relative(50) # Rotate back to original position
-    time.sleep(2)
+    PUSH_MOTOR.move_relative(-50, timeout=2) # Rotate negative rotation when pushing out cube 
+    PUSH_MOTOR.move_relative(50, timeout=2) # Rotate back to original position
     
-    CONVEYOR_BELT_MOTOR.set_dps(70)
-    CONVEYOR_BELT_MOTOR.set_position_relative(-rotations)
-    time.sleep(1)
+    CONVEYOR_BELT_MOTOR.move_relative(-rotations, 70)
 
 
 if __name__ == "__main__":
+    wait_ready_sensors()
+    SENSOR_HUB.start()
     zone_navigation_thread = threading.Thread(target=zone_color_detection)
     zone_navigation_thread.start()
     motor_set_up()
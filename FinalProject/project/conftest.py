@@ -0,0 +1,23 @@
+"""
+pytest configuration. The tests in tests/ import utils from this directory,
+and run on the dummy brick when the brickpi3 library is not installed.
+
+Run them from the FinalProject folder with: pytest
+"""
+
+import pytest
+
+from utils import dummy
+
+
+# The motor_*_test.py files are programs for the robot, not tests
+collect_ignore_glob = ["*_test.py"]
+
+
+@pytest.fixture
+def bp():
+    "A dummy BrickPi3 for the devices of one test, so tests never command the robot's brick."
+    brick = dummy.BrickPi3()
+    yield brick
+    for motor in brick.Motors:
+        motor.shutdown()
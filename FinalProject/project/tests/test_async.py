@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.brick import EV3UltrasonicSensor, Motor, SensorHub, TouchSensor
+
+
+def test_reads_run_concurrently(bp):
+    first, second = EV3UltrasonicSensor(1, bp=bp), EV3UltrasonicSensor(2, bp=bp)
+    bp.set_sensor(first.port, 12.0)
+
+    async def main():
+        return await asyncio.gather(first.aio.read(), second.aio.read(), first.aio.get_status())
+    assert asyncio.run(main()) == [12.0, 12.0, "VALID_DATA"]
+
+
+def test_wait_ready_treats_errors_as_not_ready(bp, monkeypatch):
+    sensor = EV3UltrasonicSensor(1, bp=bp)
+
+    def fail(port):
+        raise OSError("get_sensor error: No SPI response")
+    monkeypatch.setattr(sensor.brick, "get_sensor_status", fail)
+    assert asyncio.run(sensor.aio.wait_ready(timeout=0.05)) is False
+    monkeypatch.undo()
+    assert asyncio.run(sensor.aio.wait_ready(timeout=1)) is True
+
+
+def test_wait_for_press(bp):
+    touch = TouchSensor(1, bp=bp)
+    hub = SensorHub()
+    hub.register(touch, rate=TouchSensor.POLL_RATE)
+
+    async def press_later():
+        await asyncio.sleep(0.05)
+        bp.set_sensor(touch.port, 1)
+
+    async def main():
+        timed_out = await touch.aio.wait_for_press(timeout=0.02)
+        assert touch.aio._waiters == []  # the waiter that timed out was removed
+        pressed, _ = await asyncio.gather(touch.aio.wait_for_press(timeout=2), press_later())
+        return timed_out, pressed
+    try:
+        assert asyncio.run(main()) == (False, True)
+    finally:
+        hub.stop()
+
+
+def test_motor_waits(bp):
+    motor = Motor("A", bp=bp)
+
+    async def main():
+        motor.set_dps(300)
+        moving = await motor.aio.wait_is_moving(timeout=1)
+        motor.set_dps(0)
+        stopped = await motor.aio.wait_is_stopped(timeout=1)
+        return moving, stopped, await motor.aio.get_status()
+    moving, stopped, status = asyncio.run(main())
+    assert moving and stopped
+    assert status[3] == 0
@@ -0,0 +1,84 @@
+import math
+import time
+
+from utils.control import PID, LoopRunner
+
+
+def test_pid_proportional_only():
+    pid = PID(kp=2)
+    assert pid.update(3, 0.1) == 6
+    assert pid.update(-1, 0.1) == -2
+
+
+def test_pid_integral_and_derivative():
+    pid = PID(kp=0, ki=1, kd=0.5)
+    assert pid.update(1, 0.1) == 0.1  # no derivative on the first update
+    output = pid.update(2, 0.1)
+    assert math.isclose(pid.integral, 0.3)
+    assert math.isclose(output, 0.3 + 0.5 * (2 - 1) / 0.1)
+
+
+def test_pid_output_limit_and_anti_windup():
+    pid = PID(kp=1, ki=10, output_limit=5)
+    assert pid.update(100, 1) == 5
+    assert pid.update(-100, 1) == -5
+    assert pid.integral == 0  # saturated updates do not accumulate
+
+
+def test_pid_zero_dt_skips_derivative():
+    pid = PID(kp=0, kd=1)
+    pid.update(1, 0.1)
+    assert pid.update(5, 0) == 0
+
+
+def test_pid_reset():
+    pid = PID(kp=1, ki=1, kd=1)
+    pid.update(1, 0.1)
+    pid.update(2, 0.1)
+    pid.reset()
+    assert pid.integral == 0 and pid.last_error is None
+    assert pid.update(1, 0.1) == 1 + 0.1
+
+
+def test_loop_runner_counts_overruns():
+    runner = LoopRunner(rate=100)
+    slow_ticks = {3, 6}
+
+    def step(dt):
+        if runner.ticks in slow_ticks:
+            time.sleep(0.025)  # 2.5 periods: one overrun, one whole missed tick
+    runner.run(step, stop_condition=lambda: runner.ticks >= 10)
+    stats = runner.get_stats()
+    assert stats["ticks"] == 10
+    assert stats["overruns"] == 2
+    assert stats["missed_ticks"] == 2
+    assert stats["max_jitter"] >= 0.015
+
+
+def test_loop_runner_keeps_its_rate():
+    runner = LoopRunner(rate=200)
+    dts = []
+    runner.run(dts.append, duration=0.2)
+    stats = runner.get_stats()
+    assert 35 <= stats["ticks"] <= 41
+    assert dts[0] == runner.period
+    assert math.isclose(stats["mean_period"], 0.005, rel_tol=0.2)
+
+
+def test_loop_runner_stops_from_another_thread():
+    runner = LoopRunner(rate=1000)
+    runner.start(lambda dt: None)
+    assert runner.is_running()
+    time.sleep(0.02)
+    runner.stop()
+    assert not runner.is_running()
+    ticks = runner.ticks
+    time.sleep(0.01)
+    assert runner.ticks == ticks > 0
+
+
+def test_loop_runner_stop_right_after_start():
+    runner = LoopRunner(rate=1000)
+    runner.start(lambda dt: None)
+    runner.stop()
+    assert not runner.is_running()
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from utils import brick
+from utils.brick import Motor, TouchSensor
+from utils.ioprocess import _FLAG, _RUNNING_OFFSET, BrickIOProcess
+
+
+# The I/O process uses the default brick: only run where it is the dummy brick
+pytestmark = pytest.mark.skipif(brick._DRIVER_WARNING is None, reason="would drive the robot's brick")
+
+
+@pytest.fixture
+def io():
+    io = BrickIOProcess(rate=500)
+    io.start()
+    yield io
+    io.stop()
+    brick.restore_default_brick()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.002)
+    return condition()
+
+
+def test_start_and_stop(io):
+    assert io.is_running()
+    assert _FLAG.unpack_from(io._memory.buf, _RUNNING_OFFSET)[0] == 1
+    io.stop()
+    assert not io.is_running()
+    assert io._memory is None
+    io.stop()  # stopping twice does nothing
+
+
+def test_commands_and_reads_round_trip(io):
+    bp = io.connect()
+    motor = Motor("A", bp=bp)
+    sensor = TouchSensor(1, bp=bp)
+    motor.set_dps(300)
+    assert wait_for(lambda: motor.get_status()[3] == 300)
+    assert wait_for(lambda: sensor.get_value() == 0)
+    first, second = sensor.get_sample(), sensor.get_sample()
+    assert second.seq >= first.seq and second.t >= first.t
+    assert bp.get_voltage_battery() == 9.0
+
+
+def test_terminated_process_resets_the_brick(io):
+    io._process.terminate()
+    io._process.join(2)
+    # The running flag is cleared by the cleanup that also resets the motors
+    assert _FLAG.unpack_from(io._memory.buf, _RUNNING_OFFSET)[0] == 0
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from utils.motion import MotionProfile
+
+
+def sample_times(profile, steps=1000):
+    return [profile.duration * i / steps for i in range(steps + 1)]
+
+
+def test_trapezoid_reaches_max_velocity():
+    profile = MotionProfile(720, max_velocity=360, max_acceleration=720)
+    assert profile.peak_velocity == 360
+    assert math.isclose(profile.ramp_time, 0.5)
+    assert math.isclose(profile.duration, 2.5)
+    assert profile.velocity(1.25) == 360
+
+
+def test_short_move_lowers_peak_velocity():
+    profile = MotionProfile(90, max_velocity=360, max_acceleration=720)
+    assert profile.peak_velocity < 360
+    assert profile.cruise_time < 1e-6
+    assert math.isclose(profile.position(profile.duration), 90)
+
+
+@pytest.mark.parametrize("max_jerk", [None, 3600])
+@pytest.mark.parametrize("distance", [500, -500, 30])
+def test_profile_respects_limits(distance, max_jerk):
+    profile = MotionProfile(distance, max_velocity=360, max_acceleration=720, max_jerk=max_jerk)
+    positions = []
+    for t in sample_times(profile):
+        speed = profile.velocity(t)
+        assert abs(speed) <= 360 + 1e-9
+        assert speed * distance >= 0  # never moves backwards
+        positions.append(profile.position(t))
+    assert positions[0] == 0
+    assert positions[-1] == distance
+    steps = [b - a for a, b in zip(positions, positions[1:])]
+    assert all(step * distance >= -1e-9 for step in steps)
+
+
+@pytest.mark.parametrize("max_jerk", [None, 3600])
+def test_position_is_integral_of_velocity(max_jerk):
+    profile = MotionProfile(400, max_velocity=300, max_acceleration=600, max_jerk=max_jerk)
+    times = sample_times(profile, 4000)
+    covered = 0.0
+    for t0, t1 in zip(times, times[1:]):
+        covered += (profile.velocity(t0) + profile.velocity(t1)) / 2 * (t1 - t0)
+        assert math.isclose(covered, profile.position(t1), abs_tol=0.05)
+
+
+def test_jerk_limit_smooths_acceleration():
+    profile = MotionProfile(720, max_velocity=360, max_acceleration=720, max_jerk=3600)
+    dt = 1e-4
+    accelerations = [(profile.velocity(t + dt) - profile.velocity(t)) / dt for t in sample_times(profile)]
+    assert max(abs(a) for a in accelerations) <= 720 + 1
+    assert abs(accelerations[0]) < 1  # starts without a step in acceleration
+    assert profile.duration > MotionProfile(720, max_velocity=360, max_acceleration=720).duration
+
+
+def test_zero_distance():
+    profile = MotionProfile(0, max_velocity=360, max_acceleration=720)
+    assert profile.duration == 0
+    assert profile.position(1) == 0 and profile.velocity(0.5) == 0
+
+
+@pytest.mark.parametrize("args", [(0, 720, None), (360, 0, None), (360, 720, 0)])
+def test_invalid_limits(args):
+    with pytest.raises(ValueError):
+        MotionProfile(100, *args)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from utils.brick import Motor
+
+
+COMMANDS = ("set_motor_power", "set_motor_dps", "set_motor_limits", "set_motor_position",
+            "set_motor_position_relative", "set_motor_position_kp")
+
+
+@pytest.fixture
+def sent(bp, monkeypatch):
+    "List of the (command, *args) sent to the dummy brick."
+    calls = []
+    for name in COMMANDS:
+        method = getattr(bp, name)
+
+        def record(port, *args, name=name, method=method):
+            calls.append((name, *args))
+            return method(port, *args)
+        monkeypatch.setattr(bp, name, record)
+    return calls
+
+
+@pytest.fixture
+def motor(bp, sent):
+    return Motor("A", bp=bp)
+
+
+def test_identical_commands_are_suppressed(motor, sent):
+    motor.set_power(30)
+    motor.set_power(30)
+    motor.set_power(40)
+    assert sent == [("set_motor_power", 30), ("set_motor_power", 40)]
+    assert motor.get_command_stats() == {"sent": 2, "suppressed": 1, "coalesced": 0}
+
+
+def test_mode_change_sends_again(motor, sent):
+    motor.set_power(30)
+    motor.set_position(90)
+    motor.set_power(30)
+    assert sent == [("set_motor_power", 30), ("set_motor_position", 90), ("set_motor_power", 30)]
+
+
+def test_dps_sends_its_limits_once(motor, sent):
+    motor.set_dps(200)
+    motor.set_dps(200)
+    assert sent == [("set_motor_dps", 200), ("set_motor_limits", 0, 200)]
+    motor.set_limits(50, 100)
+    motor.set_dps(200)
+    assert sent[-1] == ("set_motor_limits", 0, 200)
+
+
+def test_relative_moves_and_gains(motor, sent):
+    motor.set_position_relative(90)
+    motor.set_position_relative(90)
+    motor.set_position_kp(30)
+    motor.set_position_kp(30)
+    commands = [call for call in sent if call[0] != "set_motor_position"]  # used by the dummy relative move
+    assert commands == [("set_motor_position_relative", 90)] * 2 + [("set_motor_position_kp", 30)]
+
+
+def test_forget_commands(motor, sent):
+    motor.set_power(30)
+    motor.forget_commands()
+    motor.set_power(30)
+    assert sent == [("set_motor_power", 30)] * 2
+
+
+def test_setpoints_are_coalesced(motor, sent):
+    motor.set_command_interval(10)
+    motor.set_power(10)
+    motor.set_power(20)
+    motor.set_power(30)
+    assert sent == [("set_motor_power", 10)]
+    motor.flush()
+    assert sent == [("set_motor_power", 10), ("set_motor_power", 30)]
+    assert motor.get_command_stats()["coalesced"] == 1
+
+
+def test_timer_sends_latest_setpoint(motor, sent):
+    motor.set_command_interval(0.02)
+    motor.set_dps(100)
+    motor.set_dps(150)
+    motor.set_dps(200)
+    deadline = time.monotonic() + 1
+    while ("set_motor_dps", 200) not in sent and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert [call for call in sent if call[0] == "set_motor_dps"] == [("set_motor_dps", 100), ("set_motor_dps", 200)]
+
+
+def test_stop_is_never_delayed(motor, sent):
+    motor.set_command_interval(10)
+    motor.set_power(10)
+    motor.set_power(20)
+    motor.set_power(0)
+    assert sent == [("set_motor_power", 10), ("set_motor_power", 0)]
+    motor.flush()  # the pending setpoint was dropped
+    assert sent[-1] == ("set_motor_power", 0)
+
+
+def test_position_command_drops_pending_setpoint(motor, sent):
+    motor.set_command_interval(10)
+    motor.set_power(10)
+    motor.set_power(20)
+    motor.set_position(45)
+    motor.flush()
+    assert sent == [("set_motor_power", 10), ("set_motor_position", 45)]
+    assert motor.get_command_stats()["coalesced"] == 1
+
+
+def test_timer_and_caller_send_in_order(bp, motor, sent, monkeypatch):
+    "A setpoint flushed by the timer is never sent after a newer one from the caller."
+    send = bp.set_motor_power
+
+    def slow_timer_send(port, power):
+        if threading.current_thread() is not threading.main_thread():
+            time.sleep(0.002)  # the caller sends its next setpoint meanwhile, unless it waits
+        send(port, power)
+    monkeypatch.setattr(bp, "set_motor_power", slow_timer_send)
+    motor.set_command_interval(0.003)
+    for power in range(1, 200):
+        motor.set_power(power)
+        time.sleep(0.0005)
+    motor.flush()
+    powers = [command[1] for command in sent if command[0] == "set_motor_power"]
+    assert powers == sorted(powers)
+    assert powers[-1] == 199
@@ -0,0 +1,49 @@
+import time
+
+from utils.brick import Motor, MotorGroup
+
+
+def test_group_results_are_measured_from_the_same_start(bp):
+    moving, idle = Motor("A", bp=bp), Motor("B", bp=bp)
+    results = MotorGroup(moving, idle).move_relative([90, 0], dps=600, timeout=3)
+    assert all(result.reached for result in results)
+    assert results[0].position == 90
+    assert results[0].settle_time > 0.05
+    assert results[1].settle_time < 0.05  # already at its target, not delayed by the other motor
+    assert results[1].overshoot == 0
+
+
+def test_group_waits_for_all_motors_together(bp):
+    left, right = Motor("A", bp=bp), Motor("B", bp=bp)
+    results = MotorGroup(left, right).move_relative([45, -90], dps=600, timeout=3)
+    assert [result.position for result in results] == [45, -90]
+    assert all(result.reached for result in results)
+
+
+def test_move_settles_at_target(bp):
+    motor = Motor("A", bp=bp)
+    result = motor.move_relative(90, dps=600, timeout=3)
+    assert result.reached
+    assert abs(result.position - 90) <= Motor.MOVE_TOLERANCE
+    assert result.target == 90
+    assert 0 < result.settle_time < 3
+    assert result.overshoot >= 0
+
+
+def test_move_times_out_when_the_motor_is_stuck(bp, monkeypatch):
+    motor = Motor("A", bp=bp)
+    monkeypatch.setattr(bp, "set_motor_position_relative", lambda port, degrees: None)
+    start = time.perf_counter()
+    result = motor.move_relative(90, timeout=0.2)
+    assert not result.reached
+    assert result.position == 0
+    assert 0.2 <= result.settle_time < 0.5
+    assert time.perf_counter() - start < 0.5
+
+
+def test_wait_later(bp):
+    motor = Motor("A", bp=bp)
+    assert motor.wait_move_done() is None  # no move started
+    assert motor.move_relative(-45, dps=600, wait=False, timeout=3) is None
+    result = motor.wait_move_done()
+    assert result.reached and result.target == -45
@@ -0,0 +1,42 @@
+import math
+
+import pytest
+
+from utils.odometry import Pose, integrate_pose
+
+
+TRACK_WIDTH = 12
+
+
+def test_straight_line_along_heading():
+    pose = integrate_pose(Pose(1, 2, 90, 0), 5, 5, TRACK_WIDTH, 0.5)
+    assert math.isclose(pose.x, 1, abs_tol=1e-9)
+    assert math.isclose(pose.y, 7)
+    assert pose.theta == 90
+    assert pose.timestamp == 0.5
+
+
+def test_turn_in_place():
+    quarter = math.pi * TRACK_WIDTH / 4  # each wheel rolls a quarter of the turning circle
+    pose = integrate_pose(Pose(3, 4, 0, 0), quarter, -quarter, TRACK_WIDTH, 1)
+    assert (pose.x, pose.y) == (3, 4)
+    assert math.isclose(pose.theta, -90)
+
+
+def test_arc_matches_exact_geometry():
+    # Drive a half circle of radius 30 in small steps: the pose ends 60 to the left
+    radius, steps = 30, 200
+    left = math.pi * (radius - TRACK_WIDTH / 2) / steps
+    right = math.pi * (radius + TRACK_WIDTH / 2) / steps
+    pose = Pose(0, 0, 0, 0)
+    for i in range(steps):
+        pose = integrate_pose(pose, left, right, TRACK_WIDTH, i)
+    assert pose.x == pytest.approx(0, abs=1e-6)
+    assert pose.y == pytest.approx(2 * radius, rel=1e-4)
+    assert pose.theta == pytest.approx(180)
+
+
+def test_backwards():
+    pose = integrate_pose(Pose(0, 0, 180, 0), -10, -10, TRACK_WIDTH, 1)
+    assert pose.x == pytest.approx(10)
+    assert pose.y == pytest.approx(0, abs=1e-9)
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from utils.brick import NO_RETRY, EV3UltrasonicSensor, ReadPolicy, SensorError
+
+
+class FlakySensor:
+    "Replacement for BrickPi3.get_sensor that fails the reads listed in failures (0 is the first read)."
+
+    def __init__(self, failures=(), value=42.0):
+        self.failures = set(failures)
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, port):
+        call = self.calls
+        self.calls += 1
+        if call in self.failures or "all" in self.failures:
+            raise SensorError("get_sensor error: Invalid sensor data")
+        return self.value
+
+
+@pytest.fixture
+def sensor(bp):
+    return EV3UltrasonicSensor(1, bp=bp)
+
+
+def test_retries_until_success(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=(0, 1))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    sensor.set_read_policy(ReadPolicy(retries=2, backoff=0))
+    assert sensor.get_value() == 42.0
+    assert reads.calls == 3
+    assert sensor.get_read_stats() == {"errors": 2, "retries": 2, "fallbacks": 0, "failures": 0}
+
+
+def test_no_retry_reads_once(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=("all",))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    sensor.set_read_policy(NO_RETRY)
+    assert sensor.get_value() is None
+    assert reads.calls == 1
+    assert sensor.get_read_stats() == {"errors": 1, "retries": 0, "fallbacks": 0, "failures": 1}
+
+
+def test_falls_back_to_last_good_sample(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=range(1, 100))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    sensor.set_read_policy(ReadPolicy(retries=1, backoff=0, max_staleness=10))
+    good = sensor.get_sample()
+    fallback = sensor.get_sample()
+    assert fallback == good  # same value, time and sequence number
+    assert sensor.get_read_stats()["fallbacks"] == 1
+
+
+def test_stale_value_is_not_returned(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=range(1, 100))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    sensor.set_read_policy(ReadPolicy(retries=0, backoff=0, max_staleness=0.01))
+    assert sensor.get_value() == 42.0
+    time.sleep(0.02)
+    sample = sensor.get_sample()
+    assert sample.value is None
+    assert sample.t > time.monotonic() - 0.01
+    assert sensor.get_read_stats()["failures"] == 1
+
+
+def test_no_fallback_after_mode_change(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=range(1, 100))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    sensor.set_read_policy(ReadPolicy(retries=0, backoff=0, max_staleness=10))
+    assert sensor.get_value() == 42.0
+    sensor.set_mode(sensor.Mode.IN)
+    assert sensor.get_value() is None  # centimeters are not a valid reading in inches
+
+
+def test_default_policy_reads_once_without_fallback(bp, sensor, monkeypatch):
+    reads = FlakySensor(failures=range(1, 100))
+    monkeypatch.setattr(bp, "get_sensor", reads)
+    assert sensor.get_value() == 42.0
+    assert sensor.get_value() is None  # not the last good value
+    assert reads.calls == 2
+    assert sensor.get_read_stats() == {"errors": 1, "retries": 0, "fallbacks": 0, "failures": 1}
@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+from utils.brick import NO_RETRY, EV3ColorSensor, EV3UltrasonicSensor, Motor, SensorError
+from utils.recorder import Recorder, RecordingError, load_recording
+
+
+def test_round_trip(bp, tmp_path):
+    path = str(tmp_path / "run.rec")
+    distance = EV3UltrasonicSensor(1, bp=bp)
+    color = EV3ColorSensor(2, bp=bp)
+    motor = Motor("A", bp=bp)
+    recorder = Recorder(path, capacity=10)
+    recorder.add_sensor(distance, "distance")
+    recorder.add_sensor(color)
+    recorder.add_motor(motor, "left")
+    assert recorder.columns == ["time", "distance"] + [f"EV3ColorSensor{color.port}[{i}]" for i in range(4)] \
+        + ["left.flags", "left.power", "left.encoder", "left.dps"]
+    with recorder:
+        for i in range(3):
+            bp.set_sensor(distance.port, 10.0 + i)
+            bp.set_sensor(color.port, (i, 2 * i, 3 * i, 4 * i))
+            bp.Motors[0].position = 100 * i
+            recorder.record()
+
+    columns = load_recording(path)
+    assert list(columns) == recorder.columns
+    assert list(columns["distance"]) == [10.0, 11.0, 12.0]
+    assert list(columns[f"EV3ColorSensor{color.port}[3]"]) == [0.0, 4.0, 8.0]
+    assert list(columns["left.encoder"]) == [0.0, 100.0, 200.0]
+    times = list(columns["time"])
+    assert times == sorted(times)
+
+
+def test_ring_keeps_newest_rows(bp, tmp_path):
+    path = str(tmp_path / "ring.rec")
+    sensor = EV3UltrasonicSensor(1, bp=bp)
+    recorder = Recorder(path, capacity=3)
+    recorder.add_sensor(sensor, "distance")
+    with recorder:
+        for i in range(7):
+            bp.set_sensor(sensor.port, float(i))
+            recorder.record()
+    assert list(load_recording(path)["distance"]) == [4.0, 5.0, 6.0]
+
+
+def test_failed_read_is_nan(bp, tmp_path, monkeypatch):
+    path = str(tmp_path / "nan.rec")
+    sensor = EV3UltrasonicSensor(1, bp=bp)
+    sensor.set_read_policy(NO_RETRY)
+    recorder = Recorder(path, capacity=5)
+    recorder.add_sensor(sensor, "distance", width=1)
+
+    def fail(port):
+        raise SensorError("no data")
+    monkeypatch.setattr(bp, "get_sensor", fail)
+    with recorder:
+        recorder.record()
+    assert math.isnan(load_recording(path)["distance"][0])
+
+
+def test_devices_cannot_be_added_once_open(bp, tmp_path):
+    recorder = Recorder(str(tmp_path / "open.rec"))
+    with recorder:
+        with pytest.raises(RecordingError):
+            recorder.add_motor(Motor("A", bp=bp))
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "bad.rec"
+    path.write_bytes(b"not a recording at all, but long enough")
+    with pytest.raises(RecordingError):
+        load_recording(str(path))
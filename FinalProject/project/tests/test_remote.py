@@ -0,0 +1,24 @@
+import socket
+
+from utils import brick
+from utils.remote import RemoteBrickServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_server_exposes_the_brick_methods(bp, monkeypatch):
+    default = brick._LazyBrickPi3()
+    default._driver = bp  # the default brick, already created
+    monkeypatch.setattr(brick, "BP", default)
+    server = RemoteBrickServer("password", port=free_port())
+    try:
+        methods = server._caller_methods
+        for name in ("get_sensor", "set_sensor_type", "get_motor_status", "set_motor_power", "reset_all"):
+            assert methods[f"brick.{name}"].obj is bp
+        assert "brick._get_driver" not in methods
+    finally:
+        server.close()
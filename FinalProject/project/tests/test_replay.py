@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from utils.brick import EV3UltrasonicSensor, Motor
+from utils.recorder import Recorder
+from utils.replay import ReplayBrickPi3, compare_commands, load_commands
+
+
+SAMPLES = 10
+
+
+@pytest.fixture
+def recording(bp, tmp_path):
+    "Recording of an ultrasonic sensor counting 0 to 9, and a motor whose encoder counts 0 to 90."
+    path = str(tmp_path / "run.rec")
+    sensor = EV3UltrasonicSensor(1, bp=bp)
+    motor = Motor("A", bp=bp)
+    recorder = Recorder(path)
+    recorder.add_sensor(sensor, "distance")
+    recorder.add_motor(motor, "left")
+    with recorder:
+        for i in range(SAMPLES):
+            bp.set_sensor(sensor.port, float(i))
+            bp.Motors[0].position = 10 * i
+            recorder.record()
+            time.sleep(0.01)
+    return path
+
+
+def open_replay(path, speed):
+    replay = ReplayBrickPi3(path, sensors={1: "distance"}, motors={"A": "left"}, speed=speed)
+    replay.set_sensor_type(replay.PORT_1, replay.SENSOR_TYPE.EV3_ULTRASONIC_CM)
+    return replay
+
+
+def test_unthrottled_replay_serves_samples_in_order(recording):
+    replay = open_replay(recording, speed=None)
+    values = [replay.get_sensor(replay.PORT_1) for _ in range(SAMPLES + 2)]
+    assert values == list(range(SAMPLES)) + [SAMPLES - 1] * 2  # the last value is kept
+    encoders = [replay.get_motor_encoder(replay.PORT_A) for _ in range(SAMPLES)]
+    assert encoders == [10 * i for i in range(SAMPLES)]  # each device has its own cursor
+    assert replay.is_finished()
+    replay.rewind()
+    assert replay.get_sensor(replay.PORT_1) == 0
+
+
+def test_concurrent_readers_each_get_a_sample_once(recording):
+    replay = open_replay(recording, speed=None)
+    values = []
+    lock = threading.Lock()
+
+    def read():
+        for _ in range(SAMPLES // 2):
+            value = replay.get_sensor(replay.PORT_1)
+            with lock:
+                values.append(value)
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(values) == list(range(SAMPLES))
+
+
+def test_timed_replay_follows_the_recorded_clock(recording):
+    replay = open_replay(recording, speed=1)
+    replay.start()
+    values = []
+    while not replay.is_finished():
+        values.append(replay.get_sensor(replay.PORT_1))
+        time.sleep(0.002)
+    assert values == sorted(values)  # time never goes backwards
+    assert values[0] == 0 and replay.get_sensor(replay.PORT_1) == SAMPLES - 1
+    assert len(set(values)) > SAMPLES // 2
+
+
+def test_commands_are_kept_in_order(recording, tmp_path):
+    replay = open_replay(recording, speed=None)
+    replay.set_motor_dps(replay.PORT_A, 90)
+    replay.set_motor_power(replay.PORT_B, 20)
+    replay.reset_all()
+    names = [name for _, name, _ in replay.get_commands()]
+    assert names == ["set_sensor_type", "set_motor_dps", "set_motor_power", "reset_all"]
+    path = str(tmp_path / "commands.json")
+    replay.save_commands(path)
+    saved = load_commands(path)
+    assert compare_commands(saved, replay.get_commands()) == []
+    assert [t for t, _, _ in saved] == sorted(t for t, _, _ in saved)
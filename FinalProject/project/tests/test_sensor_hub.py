@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from utils.brick import EV3UltrasonicSensor, SensorHub
+
+
+@pytest.fixture
+def sensor(bp):
+    return EV3UltrasonicSensor(1, bp=bp)
+
+
+@pytest.fixture
+def hub():
+    hub = SensorHub()
+    yield hub
+    hub.stop()
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.002)
+    return condition()
+
+
+def test_not_started_hub_reads_through(bp, sensor, hub):
+    hub.register(sensor, rate=100)
+    bp.set_sensor(sensor.port, 10.0)
+    assert sensor.get_value() == 10.0
+    bp.set_sensor(sensor.port, 20.0)
+    assert sensor.get_value() == 20.0
+    assert sensor.get_sample_age() == 0.0
+
+
+def test_running_hub_serves_cached_values(bp, sensor, hub):
+    bp.set_sensor(sensor.port, 10.0)
+    hub.register(sensor, rate=2)  # next read in 0.5 s
+    hub.start()
+    assert wait_for(lambda: hub.get_stats(sensor)["reads"] > 0)
+    bp.set_sensor(sensor.port, 20.0)
+    assert sensor.get_value() == 10.0  # cached, not read again
+    assert hub.get_stats(sensor)["reads"] == 1
+    assert 0 <= sensor.get_sample_age() < 0.5
+    assert wait_for(lambda: sensor.get_value() == 20.0)
+
+
+def test_stopped_hub_does_not_serve_stale_values(bp, sensor, hub):
+    bp.set_sensor(sensor.port, 10.0)
+    hub.register(sensor, rate=200)
+    hub.start()
+    assert wait_for(lambda: hub.get_stats(sensor)["reads"] > 0)
+    hub.stop()
+    bp.set_sensor(sensor.port, 20.0)
+    assert sensor.get_value() == 20.0
+    value, age = hub.get_value(sensor)
+    assert value == 20.0 and age == 0.0
+
+
+def test_unregistered_sensor_reads_the_brick(bp, sensor, hub):
+    hub.register(sensor)
+    hub.unregister(sensor)
+    assert sensor.hub is None
+    bp.set_sensor(sensor.port, 30.0)
+    assert sensor.get_value() == 30.0
+
+
+def test_poller_respects_rates(bp, hub):
+    fast, slow = EV3UltrasonicSensor(1, bp=bp), EV3UltrasonicSensor(2, bp=bp)
+    hub.register(fast, rate=200)
+    hub.register(slow, rate=20)
+    hub.start()
+    time.sleep(0.3)
+    hub.stop()
+    assert hub.get_stats(fast)["reads"] > 3 * hub.get_stats(slow)["reads"]
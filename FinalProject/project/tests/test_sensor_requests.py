@@ -0,0 +1,116 @@
+import pytest
+
+from utils.brick import SENSOR_STATE, Brick, BrickPi3, SensorError, _SENSOR_REQUEST_LENGTHS
+
+
+TYPE = BrickPi3.SENSOR_TYPE
+PORT = BrickPi3.PORT_2
+
+
+class FakeSPI:
+    """
+    Replacement for BrickPi3.spi_transfer_array that records the requests, and answers them
+    with the configured type, status and data bytes, padded to the length of the request.
+    """
+
+    def __init__(self, bp):
+        self.bp = bp
+        self.requests = []
+        self.valid = 0xA5
+        self.sensor_type = None  # type of the sensor configured on the port if None
+        self.status = SENSOR_STATE.VALID_DATA
+        self.data = []
+        self.extra_bytes = 0
+
+    def __call__(self, out_array):
+        self.requests.append(list(out_array))
+        sensor_type = self.sensor_type
+        if sensor_type is None:
+            sensor_type = self.bp.SensorType[out_array[1] - self.bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_1]
+        reply = [0, 0, 0, self.valid, sensor_type, self.status] + self.data
+        reply += [0] * (len(out_array) - len(reply))
+        return reply + [0] * self.extra_bytes
+
+
+@pytest.fixture
+def spi(bp, monkeypatch):
+    fake = FakeSPI(bp)
+    monkeypatch.setattr(bp, "spi_transfer_array", fake)
+    return fake
+
+
+@pytest.fixture
+def brick(bp, spi):
+    "Brick that reads sensor values with its own requests, like with the BrickPi3 driver."
+    brick = Brick(bp)
+    brick._decodes_values = True
+    return brick
+
+
+def test_request_is_prepared_by_set_sensor_type(brick, spi):
+    brick.set_sensor_type(PORT, TYPE.EV3_ULTRASONIC_CM)
+    prepared = brick._sensor_requests[PORT]
+    assert brick.get_sensor_status(PORT) == SENSOR_STATE.VALID_DATA
+    request = spi.requests[-1]
+    assert len(request) == _SENSOR_REQUEST_LENGTHS[TYPE.EV3_ULTRASONIC_CM]
+    assert request[:2] == [brick.SPI_Address, BrickPi3.BPSPI_MESSAGE_TYPE.GET_SENSOR_1 + 1]
+    brick.get_sensor_status(PORT)
+    assert brick._sensor_requests[PORT] is prepared  # reused, not rebuilt
+
+
+def test_request_is_rebuilt_when_type_changes_behind_the_proxy(brick, bp, spi):
+    brick.set_sensor_type(PORT, TYPE.TOUCH)
+    brick.get_sensor_status(PORT)
+    assert len(spi.requests[-1]) == _SENSOR_REQUEST_LENGTHS[TYPE.TOUCH]
+    bp.set_sensor_type(PORT, TYPE.EV3_COLOR_COLOR_COMPONENTS)  # another proxy or direct driver use
+    assert brick.get_sensor_status(PORT) == SENSOR_STATE.VALID_DATA
+    assert len(spi.requests[-1]) == _SENSOR_REQUEST_LENGTHS[TYPE.EV3_COLOR_COLOR_COMPONENTS]
+    assert brick._sensor_requests[PORT].sensor_type == TYPE.EV3_COLOR_COLOR_COMPONENTS
+
+
+def test_status_of_wrong_sensor_type(brick, spi):
+    brick.set_sensor_type(PORT, TYPE.EV3_ULTRASONIC_CM)
+    spi.sensor_type = TYPE.EV3_GYRO_ABS
+    assert brick.get_sensor_status(PORT) == SENSOR_STATE.INCORRECT_SENSOR_PORT
+
+
+def test_touch_aliases_are_accepted(brick, spi):
+    brick.set_sensor_type(PORT, TYPE.TOUCH)
+    spi.sensor_type = TYPE.EV3_TOUCH
+    spi.data = [1]
+    assert brick.get_sensor_status(PORT) == SENSOR_STATE.VALID_DATA
+    assert brick.get_sensor(PORT) == 1
+
+
+@pytest.mark.parametrize("sensor_type, data, value", [
+    (TYPE.EV3_ULTRASONIC_CM, [0x01, 0x02], 25.8),
+    (TYPE.EV3_GYRO_ABS, [0xFF, 0xF6], -10),
+    (TYPE.EV3_GYRO_ABS_DPS, [0x00, 0x5A, 0xFF, 0xFF], [90, -1]),
+    (TYPE.EV3_COLOR_COLOR_COMPONENTS, [0, 1, 0, 2, 0, 3, 1, 0], [1, 2, 3, 256]),
+    (TYPE.EV3_COLOR_REFLECTED, [37], 37),
+])
+def test_values_are_decoded(brick, spi, sensor_type, data, value):
+    brick.set_sensor_type(PORT, sensor_type)
+    spi.data = data
+    assert brick.get_sensor(PORT) == value
+
+
+def test_invalid_replies(brick, spi):
+    brick.set_sensor_type(PORT, TYPE.EV3_ULTRASONIC_CM)
+    spi.status = SENSOR_STATE.NO_DATA
+    with pytest.raises(SensorError):
+        brick.get_sensor(PORT)
+    spi.status = SENSOR_STATE.VALID_DATA
+    spi.extra_bytes = 1
+    with pytest.raises(SensorError):
+        brick.get_sensor(PORT)
+    spi.valid = 0
+    with pytest.raises(OSError):
+        brick.get_sensor(PORT)
+    with pytest.raises(OSError):
+        brick.get_sensor_status(PORT)
+
+
+def test_unconfigured_port(brick):
+    with pytest.raises(OSError):
+        brick.get_sensor_status(BrickPi3.PORT_4)
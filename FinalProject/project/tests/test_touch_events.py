@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from utils.brick import SensorHub, TouchSensor
+
+
+@pytest.fixture
+def touch(bp):
+    sensor = TouchSensor(1, bp=bp)
+    sensor.set_debounce(0.01)
+    return sensor
+
+
+def feed(sensor, samples):
+    "Give the sensor (value, time) samples, as the hub would."
+    for value, timestamp in samples:
+        sensor._on_sample(value, timestamp)
+
+
+def test_debounce_counts_each_press_once(touch):
+    presses, releases = [], []
+    touch._press_callbacks.append(presses.append)
+    touch._release_callbacks.append(releases.append)
+    feed(touch, [(0, 0.000), (0, 0.020)])  # released at start: no event
+    # Contact bounce: the press only counts once it lasted the debounce time
+    feed(touch, [(1, 0.100), (0, 0.102), (1, 0.104), (0, 0.106), (1, 0.108), (1, 0.113), (1, 0.119)])
+    feed(touch, [(0, 0.300), (0, 0.305), (0, 0.311)])
+    feed(touch, [(1, 0.500), (1, 0.511)])
+    assert len(presses) == 2
+    assert len(releases) == 1
+    assert touch._press_count == 2
+
+
+def test_short_glitches_are_ignored(touch):
+    presses = []
+    touch._press_callbacks.append(presses.append)
+    feed(touch, [(0, 0.0), (0, 0.02)])
+    feed(touch, [(1, 0.100), (0, 0.105), (1, 0.200), (0, 0.209), (0, 0.300), (None, 0.4)])
+    assert presses == []
+
+
+def test_held_button_at_start_is_not_a_press(touch):
+    presses = []
+    touch._press_callbacks.append(presses.append)
+    feed(touch, [(1, 0.0), (1, 0.02), (0, 0.1), (0, 0.12), (1, 0.2), (1, 0.22)])
+    assert len(presses) == 1
+
+
+def test_wait_for_press_with_a_hub(bp, touch):
+    hub = SensorHub()
+    hub.register(touch, rate=TouchSensor.POLL_RATE)
+
+    def press():
+        time.sleep(0.05)
+        bp.set_sensor(touch.port, 1)
+    threading.Thread(target=press).start()
+    try:
+        assert touch.wait_for_press(timeout=2)
+        bp.set_sensor(touch.port, 0)
+        assert not touch.wait_for_press(timeout=0.05)
+    finally:
+        hub.stop()
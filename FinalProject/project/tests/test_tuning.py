@@ -0,0 +1,41 @@
+import math
+
+from utils.tuning import analyze_step
+
+
+TIMES = [0, 0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def test_step_with_overshoot():
+    result = analyze_step(TIMES, [0, 20, 90, 110, 101, 100], 0, 100, 2, kp=25, kd=70)
+    assert (result.kp, result.kd) == (25, 70)
+    assert math.isclose(result.rise_time, 0.15)  # 10 at t=0.05, 90 at t=0.2
+    assert result.overshoot == 10
+    assert result.settle_time == 0.4
+    assert result.final_error == 0
+
+
+def test_negative_step():
+    result = analyze_step(TIMES, [50, 30, -30, -60, -52, -49], 50, -50, 2)
+    assert math.isclose(result.rise_time, (0.2 + 0.1 * 10 / 30) - 0.05)  # -40 crossed between 0.2 and 0.3
+    assert result.overshoot == 10
+    assert result.settle_time == 0.4
+    assert result.final_error == -1
+
+
+def test_step_without_overshoot():
+    result = analyze_step(TIMES, [0, 40, 80, 95, 99, 100], 0, 100, 2)
+    assert result.overshoot == 0
+    assert result.settle_time == 0.4
+
+
+def test_step_never_reached():
+    result = analyze_step(TIMES, [0, 5, 20, 40, 60, 70], 0, 100, 2)
+    assert result.rise_time is None
+    assert result.settle_time is None
+    assert result.final_error == 30
+
+
+def test_leaving_tolerance_delays_settle_time():
+    result = analyze_step(TIMES, [0, 100, 100, 104, 100, 100], 0, 100, 2)
+    assert result.settle_time == 0.4
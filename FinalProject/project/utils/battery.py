@@ -0,0 +1,205 @@
+"""
+Module for keeping an eye on the battery during a run.
+
+A BatteryMonitor samples the battery voltage on a background thread at a low rate,
+filters it, and estimates how fast it is dropping. Motors attached to the monitor have
+their set_power commands scaled up as the voltage drops, so a given power keeps giving
+about the same speed over a session. The monitor warns before the voltage gets low
+enough for the brick to cut the motors (LOW_VOLTAGE_FLOAT motor status flag).
+
+Example:
+
+battery = BatteryMonitor()
+battery.attach(LEFT_MOTOR, RIGHT_MOTOR)
+battery.on_low_voltage(lambda monitor: print("Low battery:", monitor.get_voltage()))
+battery.start()
+"""
+
+from __future__ import annotations
+
+from collections import deque
+import math
+import sys
+import threading
+import time
+
+from . import brick
+from .brick import Motor
+from .filters import range_limit
+
+
+class BatteryMonitor:
+    """
+    Background service that samples the battery voltage of a brick (the default brick if None).
+
+    The voltage is filtered with an exponential moving average of time constant
+    time_constant seconds. The trend is the slope of the filtered voltage over the last
+    trend_window seconds, in volts per minute (negative while discharging).
+
+    The low voltage warning is raised once the filtered voltage is within warning_margin
+    volts of float_voltage (about where the brick cuts the motors), or is expected to get
+    there within lookahead seconds at the current trend, or when an attached motor reports
+    the LOW_VOLTAGE_FLOAT flag.
+    """
+    RATE = 1  # samples per second
+    NOMINAL_VOLTAGE = 9.0  # voltage at which power commands are not scaled
+    FLOAT_VOLTAGE = 7.0  # approximate voltage under which the brick floats the motors
+    WARNING_MARGIN = 0.5  # volts
+    TIME_CONSTANT = 10  # seconds
+    TREND_WINDOW = 60  # seconds
+    LOOKAHEAD = 120  # seconds
+
+    def __init__(self, bp=None, rate: float = RATE, nominal_voltage: float = NOMINAL_VOLTAGE,
+                 float_voltage: float = FLOAT_VOLTAGE, warning_margin: float = WARNING_MARGIN,
+                 time_constant: float = TIME_CONSTANT, trend_window: float = TREND_WINDOW,
+                 lookahead: float = LOOKAHEAD):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of samples per second")
+        self.bp = brick._resolve_brick(brick.BP if bp is None else bp)
+        self.period = 1 / rate
+        self.nominal_voltage = nominal_voltage
+        self.float_voltage = float_voltage
+        self.warning_margin = warning_margin
+        self.time_constant = time_constant
+        self.trend_window = trend_window
+        self.lookahead = lookahead
+        self.motors: list[Motor] = []
+        self.low_voltage = threading.Event()  # set once the low voltage warning is raised
+        self._callbacks = []
+        self._voltage: float = None
+        self._raw_voltage: float = None
+        self._last_sample_time: float = None
+        self._history: deque[tuple[float, float]] = deque()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+        self.samples = 0
+        self.missed_samples = 0
+
+    def attach(self, *motors: Motor):
+        "Scale the set_power commands of the motors with the battery voltage, and watch their status flags."
+        for motor in motors:
+            motor.battery = self
+            self.motors.append(motor)
+
+    def detach(self, *motors: Motor):
+        "Stop scaling the set_power commands of the motors."
+        for motor in motors:
+            if motor.battery is self:
+                motor.battery = None
+            if motor in self.motors:
+                self.motors.remove(motor)
+
+    def on_low_voltage(self, callback):
+        """
+        Call callback(monitor) when the low voltage warning is raised.
+        Callbacks run in the sampling thread, so they should return quickly.
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def start(self):
+        "Start sampling the battery. Does nothing if already running."
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop sampling the battery. The last values are kept."
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_voltage(self) -> float:
+        "Return the filtered battery voltage, or None if it could not be read yet."
+        return self._voltage
+
+    def get_raw_voltage(self) -> float:
+        "Return the last battery voltage read, or None if it could not be read yet."
+        return self._raw_voltage
+
+    def get_trend(self) -> float:
+        "Return the change of the filtered voltage in volts per minute, or 0 if not known yet."
+        history = list(self._history)
+        if len(history) < 2:
+            return 0.0
+        mean_t = sum(t for t, _ in history) / len(history)
+        mean_v = sum(v for _, v in history) / len(history)
+        variance = sum((t - mean_t) ** 2 for t, _ in history)
+        if variance == 0:
+            return 0.0
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in history) / variance
+        return slope * 60
+
+    def get_power_scale(self) -> float:
+        "Return the factor applied to the power commands of the attached motors."
+        voltage = self._voltage
+        if voltage is None or voltage <= 0:
+            return 1.0
+        return self.nominal_voltage / voltage
+
+    def scale_power(self, power: float) -> float:
+        "Return the power that gives the same speed at the current voltage as power at the nominal voltage."
+        return range_limit(power * self.get_power_scale(), -Motor.MAX_POWER, Motor.MAX_POWER)
+
+    def update(self):
+        "Sample the battery once. Called by the sampling thread."
+        try:
+            voltage = self.bp.get_voltage_battery()
+        except (OSError, TypeError, ValueError):
+            voltage = None
+        now = time.monotonic()
+        if voltage is None:
+            self.missed_samples += 1
+        else:
+            self.samples += 1
+            self._raw_voltage = voltage
+            if self._voltage is None:
+                self._voltage = voltage
+            else:
+                alpha = 1 - math.exp(-(now - self._last_sample_time) / self.time_constant)
+                self._voltage += alpha * (voltage - self._voltage)
+            self._last_sample_time = now
+            self._history.append((now, self._voltage))
+            while self._history and self._history[0][0] < now - self.trend_window:
+                self._history.popleft()
+        if not self.low_voltage.is_set() and self._is_voltage_low():
+            self._warn()
+
+    def _is_voltage_low(self) -> bool:
+        "Return True if the brick is about to float the motors, or already did."
+        for motor in self.motors:
+            flags = motor.get_status()[0]
+            if flags is not None and flags & self.bp.MOTOR_STATUS_FLAG.LOW_VOLTAGE_FLOAT:
+                return True
+        voltage = self._voltage
+        if voltage is None:
+            return False
+        if voltage <= self.float_voltage + self.warning_margin:
+            return True
+        expected = voltage + self.get_trend() * self.lookahead / 60
+        return expected <= self.float_voltage
+
+    def _warn(self):
+        self.low_voltage.set()
+        print(f"Warning: low battery voltage ({self._voltage} V), the motors will soon be cut",
+              file=sys.stderr)
+        for callback in self._callbacks:
+            callback(self)
+
+    def _run(self):
+        "Thread target: call update at a fixed rate."
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.update()
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                next_time = time.perf_counter()
+                delay = 0
+            self._stop_event.wait(delay)
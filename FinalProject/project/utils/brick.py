@@ -7,40 +7,132 @@ Authors: Ryan Au, Younes Boubekeur
 
 from __future__ import annotations
 
+from collections import namedtuple
 from typing import Literal, Type
+import itertools
 import math
 import atexit
 import os
 import signal
+import threading
 import time
 import sys
 
 
+SPIN_TIME = 0.002  # seconds before a deadline at which sleep_until stops sleeping and spins
+
+
+def sleep_until(deadline: float, spin_time: float = SPIN_TIME):
+    """
+    Wait until time.perf_counter() reaches deadline. Sleeps until spin_time seconds
+    before the deadline, then constantly checks the time, which is accurate to a few
+    microseconds where time.sleep alone may wake up a millisecond or more late.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin_time:
+        time.sleep(remaining - spin_time)
+    while time.perf_counter() < deadline:
+        pass
+
+
 def busy_sleep(seconds: float):
     """A different form of time.sleep, which uses a while loop that 
     constantly checks the time, to see if the duration has elapsed."""
-    start = time.time()
-    while (time.time() - start) < seconds:
-        time.sleep(0.005)
+    sleep_until(time.perf_counter() + seconds)
 
 
 class IOError(OSError):
     pass
 
 
-# Save process ID of this program so we can force stop it later if needed
-os.system(f"echo {os.getpid()} > ~/brickpi3_pid")
-BP = None
+_DRIVER_WARNING = None
 try:
     from brickpi3 import Enumeration, FirmwareVersionError, SensorError, BrickPi3
     import spidev
-    BP = BrickPi3()  # The BrickPi3 instance
 except (ModuleNotFoundError, OSError, TypeError) as err:
-    print('A BrickPi module is missing, or BrickPi is missing, intializing dummy BP', file=sys.stderr)
-    print(f'Warning: {err.__class__.__name__}({err})', file=sys.stderr)
+    _DRIVER_WARNING = err
     from .dummy import Enumeration, FirmwareVersionError, SensorError, BrickPi3
-    BP = BrickPi3()  # The BrickPi3 instance
 
+
+class _LazyBrickPi3:
+    """
+    Stand-in for the default BrickPi3 instance, which is only created when first used.
+
+    Creating the BrickPi3 talks to the hardware (or, with the dummy brick, starts motor
+    threads), writes the PID file and registers the reset at exit. Deferring it keeps
+    importing this module cheap and free of side effects, eg, for analysis tools that
+    only use Color or PORTS.
+    """
+
+    def __init__(self):
+        self._driver = None
+        self._lock = threading.Lock()
+
+    def _get_driver(self, write_pid_file: bool = True) -> BrickPi3:
+        "Return the BrickPi3 instance, creating it on first use."
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    self._driver = _create_driver(write_pid_file)
+        return self._driver
+
+    def __getattr__(self, name):
+        return getattr(self._get_driver(), name)
+
+
+def _create_driver(write_pid_file: bool = True) -> BrickPi3:
+    """
+    Create the BrickPi3 instance, and set up what the program needs when it uses the brick.
+    The PID file is only written if write_pid_file is True.
+    """
+    if _DRIVER_WARNING is not None:
+        print('A BrickPi module is missing, or BrickPi is missing, intializing dummy BP', file=sys.stderr)
+        print(f'Warning: {_DRIVER_WARNING.__class__.__name__}({_DRIVER_WARNING})', file=sys.stderr)
+    try:
+        driver = BrickPi3()
+    except (OSError, TypeError) as err:
+        print('BrickPi is missing, intializing dummy BP', file=sys.stderr)
+        print(f'Warning: {err.__class__.__name__}({err})', file=sys.stderr)
+        from .dummy import BrickPi3 as DummyBrickPi3
+        driver = DummyBrickPi3()
+    if write_pid_file:
+        _write_pid_file()
+    # Reset brick when the program exits
+    try:
+        atexit.register(reset_brick)
+    except ValueError as err:
+        print(err, "Must import brick in main thread", file=sys.stderr)
+    return driver
+
+
+def _write_pid_file():
+    "Save process ID of this program so we can force stop it later if needed"
+    try:
+        with open(os.path.expanduser("~/brickpi3_pid"), "w") as pid_file:
+            pid_file.write(f"{os.getpid()}\n")
+    except OSError as err:
+        print(f"Warning: could not write PID file: {err}", file=sys.stderr)
+
+
+def _resolve_brick(bp):
+    "Return the actual BrickPi3 instance behind bp, creating the default one if needed."
+    if isinstance(bp, _LazyBrickPi3):
+        return bp._get_driver()
+    return bp
+
+
+def initialize_brick(write_pid_file: bool = True) -> BrickPi3:
+    """
+    Create the default BrickPi3 instance now, instead of when the first device is created.
+    Return the BrickPi3 instance.
+
+    With write_pid_file False, ~/brickpi3_pid is left as is, eg, in a helper process
+    that must not be taken for the main program.
+    """
+    return _OLD_BP._get_driver(write_pid_file)
+
+
+BP = _LazyBrickPi3()  # The BrickPi3 instance, created on first use
 _OLD_BP = BP
 
 
@@ -53,6 +145,8 @@ def restore_default_brick(bp=None):
 
 
 WAIT_READY_INTERVAL = 0.01
+SENSOR_INIT_TIMEOUT = 10  # seconds to wait for all sensors to be ready, see wait_ready_sensors
+MODE_SWITCH_TIMEOUT = 2  # seconds to wait for a sensor to be ready after a mode switch, see Sensor.switch_mode
 INF = float("inf")
 
 PORTS: dict[str, int] = {
@@ -159,20 +253,253 @@ class Color:
 _color_names_by_code = {c.code: c.name for c in ColorMappings._all_mappings}
 
 
-class Brick(BrickPi3):
+_SENSOR_TYPE = BrickPi3.SENSOR_TYPE
+
+# Length of the SPI request used to read each type of sensor.
+# I2C sensors also need one byte for each byte read from the I2C device.
+_SENSOR_REQUEST_LENGTHS = {
+    _SENSOR_TYPE.CUSTOM: 10,
+    _SENSOR_TYPE.I2C: 6,
+    _SENSOR_TYPE.TOUCH: 7,
+    _SENSOR_TYPE.NXT_TOUCH: 7,
+    _SENSOR_TYPE.EV3_TOUCH: 7,
+    _SENSOR_TYPE.NXT_ULTRASONIC: 7,
+    _SENSOR_TYPE.EV3_COLOR_REFLECTED: 7,
+    _SENSOR_TYPE.EV3_COLOR_AMBIENT: 7,
+    _SENSOR_TYPE.EV3_COLOR_COLOR: 7,
+    _SENSOR_TYPE.EV3_ULTRASONIC_LISTEN: 7,
+    _SENSOR_TYPE.EV3_INFRARED_PROXIMITY: 7,
+    _SENSOR_TYPE.NXT_COLOR_FULL: 12,
+    _SENSOR_TYPE.NXT_LIGHT_ON: 8,
+    _SENSOR_TYPE.NXT_LIGHT_OFF: 8,
+    _SENSOR_TYPE.NXT_COLOR_RED: 8,
+    _SENSOR_TYPE.NXT_COLOR_GREEN: 8,
+    _SENSOR_TYPE.NXT_COLOR_BLUE: 8,
+    _SENSOR_TYPE.NXT_COLOR_OFF: 8,
+    _SENSOR_TYPE.EV3_GYRO_ABS: 8,
+    _SENSOR_TYPE.EV3_GYRO_DPS: 8,
+    _SENSOR_TYPE.EV3_ULTRASONIC_CM: 8,
+    _SENSOR_TYPE.EV3_ULTRASONIC_INCHES: 8,
+    _SENSOR_TYPE.EV3_COLOR_RAW_REFLECTED: 10,
+    _SENSOR_TYPE.EV3_GYRO_ABS_DPS: 10,
+    _SENSOR_TYPE.EV3_COLOR_COLOR_COMPONENTS: 14,
+    _SENSOR_TYPE.EV3_INFRARED_SEEK: 14,
+    _SENSOR_TYPE.EV3_INFRARED_REMOTE: 10,
+}
+
+# Sensor types the brick may report for a configured type, other than the type itself
+_SENSOR_TYPE_ALIASES = {
+    _SENSOR_TYPE.TOUCH: (_SENSOR_TYPE.NXT_TOUCH, _SENSOR_TYPE.EV3_TOUCH),
+}
+
+_SENSOR_PORT_INDEX = {
+    BrickPi3.PORT_1: 0,
+    BrickPi3.PORT_2: 1,
+    BrickPi3.PORT_3: 2,
+    BrickPi3.PORT_4: 3,
+}
+
+
+def _int16(high: int, low: int) -> int:
+    "Return the signed 16-bit value of two reply bytes."
+    value = (high << 8) | low
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _int8(value: int) -> int:
+    "Return the signed 8-bit value of a reply byte."
+    return value - 0x100 if value & 0x80 else value
+
+
+# Buttons pressed for each code of the EV3 infrared remote (red up, red down, blue up, blue down, beacon)
+_REMOTE_BUTTONS = {
+    1: [1, 0, 0, 0, 0],
+    2: [0, 1, 0, 0, 0],
+    3: [0, 0, 1, 0, 0],
+    4: [0, 0, 0, 1, 0],
+    5: [1, 0, 1, 0, 0],
+    6: [1, 0, 0, 1, 0],
+    7: [0, 1, 1, 0, 0],
+    8: [0, 1, 0, 1, 0],
+    9: [0, 0, 0, 0, 1],
+    10: [1, 1, 0, 0, 0],
+    11: [0, 0, 1, 1, 0],
+}
+
+
+def _decode_custom(reply: list[int]) -> list[int]:
+    return [((reply[8] & 0x0F) << 8) | reply[9], ((reply[8] >> 4) & 0x0F) | (reply[7] << 4),
+            reply[6] & 0x01, (reply[6] >> 1) & 0x01]
+
+
+def _decode_byte(reply: list[int]) -> int:
+    return reply[6]
+
+
+def _decode_nxt_color_full(reply: list[int]) -> list[int]:
+    return [reply[6], (reply[7] << 2) | ((reply[11] >> 6) & 0x03), (reply[8] << 2) | ((reply[11] >> 4) & 0x03),
+            (reply[9] << 2) | ((reply[11] >> 2) & 0x03), (reply[10] << 2) | (reply[11] & 0x03)]
+
+
+def _decode_word(reply: list[int]) -> int:
+    return (reply[6] << 8) | reply[7]
+
+
+def _decode_signed_word(reply: list[int]) -> int:
+    return _int16(reply[6], reply[7])
+
+
+def _decode_tenths(reply: list[int]) -> float:
+    return ((reply[6] << 8) | reply[7]) / 10
+
+
+def _decode_two_words(reply: list[int]) -> list[int]:
+    return [(reply[6] << 8) | reply[7], (reply[8] << 8) | reply[9]]
+
+
+def _decode_two_signed_words(reply: list[int]) -> list[int]:
+    return [_int16(reply[6], reply[7]), _int16(reply[8], reply[9])]
+
+
+def _decode_four_words(reply: list[int]) -> list[int]:
+    return [(reply[6] << 8) | reply[7], (reply[8] << 8) | reply[9],
+            (reply[10] << 8) | reply[11], (reply[12] << 8) | reply[13]]
+
+
+def _decode_infrared_seek(reply: list[int]) -> list[list[int]]:
+    return [[_int8(reply[i]), _int8(reply[i + 1])] for i in range(6, 14, 2)]
+
+
+def _decode_infrared_remote(reply: list[int]) -> list[list[int]]:
+    return [list(_REMOTE_BUTTONS.get(reply[i], [0, 0, 0, 0, 0])) for i in range(6, 10)]
+
+
+# Function that turns the reply of a valid read into the sensor value, for each type of sensor.
+# Same results as BrickPi3.get_sensor.
+_SENSOR_DECODERS = {
+    _SENSOR_TYPE.CUSTOM: _decode_custom,
+    _SENSOR_TYPE.I2C: lambda reply: reply[6:],
+    _SENSOR_TYPE.TOUCH: _decode_byte,
+    _SENSOR_TYPE.NXT_TOUCH: _decode_byte,
+    _SENSOR_TYPE.EV3_TOUCH: _decode_byte,
+    _SENSOR_TYPE.NXT_ULTRASONIC: _decode_byte,
+    _SENSOR_TYPE.EV3_COLOR_REFLECTED: _decode_byte,
+    _SENSOR_TYPE.EV3_COLOR_AMBIENT: _decode_byte,
+    _SENSOR_TYPE.EV3_COLOR_COLOR: _decode_byte,
+    _SENSOR_TYPE.EV3_ULTRASONIC_LISTEN: _decode_byte,
+    _SENSOR_TYPE.EV3_INFRARED_PROXIMITY: _decode_byte,
+    _SENSOR_TYPE.NXT_COLOR_FULL: _decode_nxt_color_full,
+    _SENSOR_TYPE.NXT_LIGHT_ON: _decode_word,
+    _SENSOR_TYPE.NXT_LIGHT_OFF: _decode_word,
+    _SENSOR_TYPE.NXT_COLOR_RED: _decode_word,
+    _SENSOR_TYPE.NXT_COLOR_GREEN: _decode_word,
+    _SENSOR_TYPE.NXT_COLOR_BLUE: _decode_word,
+    _SENSOR_TYPE.NXT_COLOR_OFF: _decode_word,
+    _SENSOR_TYPE.EV3_GYRO_ABS: _decode_signed_word,
+    _SENSOR_TYPE.EV3_GYRO_DPS: _decode_signed_word,
+    _SENSOR_TYPE.EV3_ULTRASONIC_CM: _decode_tenths,
+    _SENSOR_TYPE.EV3_ULTRASONIC_INCHES: _decode_tenths,
+    _SENSOR_TYPE.EV3_COLOR_RAW_REFLECTED: _decode_two_words,
+    _SENSOR_TYPE.EV3_GYRO_ABS_DPS: _decode_two_signed_words,
+    _SENSOR_TYPE.EV3_COLOR_COLOR_COMPONENTS: _decode_four_words,
+    _SENSOR_TYPE.EV3_INFRARED_SEEK: _decode_infrared_seek,
+    _SENSOR_TYPE.EV3_INFRARED_REMOTE: _decode_infrared_remote,
+}
+
+# get_sensor of the BrickPi3 driver, whose SPI requests Brick.get_sensor can do itself.
+# Other drivers (dummy, replay, shared I/O process) provide their own get_sensor.
+_DRIVER_GET_SENSOR = BrickPi3.get_sensor if _DRIVER_WARNING is None else None
+
+
+class _SensorRequest:
     """
-    Wrapper class for the BrickPi3 class. Comes with additional methods such get_sensor_status.
+    Precomputed SPI request of one configured sensor port. The brick answers the same
+    request with both the status and the value of the sensor, so it serves both reads.
     """
+    __slots__ = ("port_index", "sensor_type", "out_array", "expected_types", "reply_length", "decode")
+
+    def __init__(self, port_index: int, sensor_type: int, out_array: list[int]):
+        self.port_index = port_index
+        self.sensor_type = sensor_type
+        self.out_array = out_array
+        self.expected_types = (sensor_type,) + _SENSOR_TYPE_ALIASES.get(sensor_type, ())
+        self.reply_length = len(out_array)
+        self.decode = _SENSOR_DECODERS[sensor_type]
+
+
+class Brick:
+    """
+    Lightweight proxy for a BrickPi3 instance. Comes with additional methods such get_sensor_status.
+
+    Every other attribute (methods, SensorType, ...) is read from the BrickPi3 instance
+    when it is used, so all devices see the same, current driver state.
+    Devices use Brick.shared(bp), which returns the single proxy of each brick.
+    """
+    _shared: dict[int, Brick] = {}  # by id of the BrickPi3 instance
+    _shared_lock = threading.Lock()
 
     def __init__(self, bp=None):
         if bp is None:
-            self.bp = BP
+            self.bp = _resolve_brick(BP)
         else:
-            self.bp = bp
-        child = self.__dict__
-        parent = self.bp.__dict__
-        for key in parent.keys():
-            setattr(self, str(key), child.get(key, parent.get(key)))
+            self.bp = _resolve_brick(bp)
+        self._sensor_requests: dict[int, _SensorRequest] = {}
+        self._decodes_values = type(self.bp).get_sensor is _DRIVER_GET_SENSOR
+        # Drivers that publish the state read by another process (eg, SharedBrickPi3)
+        # give the time and number of each read, see get_sensor_sample
+        self._publishes_samples = hasattr(self.bp, "get_sensor_sample")
+
+    @classmethod
+    def shared(cls, bp=None) -> Brick:
+        "Return the proxy shared by all devices of the brick bp (the default brick if None)."
+        bp = _resolve_brick(BP if bp is None else bp)
+        brick = cls._shared.get(id(bp))
+        if brick is None:
+            with cls._shared_lock:
+                brick = cls._shared.setdefault(id(bp), cls(bp))
+        return brick
+
+    def __getattr__(self, name):
+        # Only called for attributes that the proxy does not define itself
+        if name == "bp":
+            raise AttributeError(name)
+        return getattr(self.bp, name)
+
+    def set_sensor_type(self, port, type, params=0):
+        """
+        Set the sensor type of a port, and prepare the request used to read its status and value.
+        See BrickPi3.set_sensor_type for the meaning of the arguments.
+        """
+        self.bp.set_sensor_type(port, type, params)
+        if port in _SENSOR_PORT_INDEX:
+            self._prepare_sensor_request(port)
+
+    def _prepare_sensor_request(self, port: int) -> _SensorRequest:
+        "Build and store the request for a sensor port, based on its configured type."
+        port_index = _SENSOR_PORT_INDEX.get(port)
+        if port_index is None:
+            raise IOError(
+                "get_sensor error. Must be one sensor port at a time. PORT_1, PORT_2, PORT_3, or PORT_4.")
+        sensor_type = self.SensorType[port_index]
+        length = _SENSOR_REQUEST_LENGTHS.get(sensor_type)
+        if length is None:
+            raise IOError(
+                "get_sensor error: Sensor not configured or not supported.")
+        if sensor_type == _SENSOR_TYPE.I2C:
+            length += self.I2CInBytes[port_index]
+        out_array = [0] * length
+        out_array[0] = self.SPI_Address
+        out_array[1] = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_1 + port_index
+        request = _SensorRequest(port_index, sensor_type, out_array)
+        self._sensor_requests[port] = request
+        return request
+
+    def _sensor_request(self, port: int) -> _SensorRequest:
+        "Return the request of a sensor port, rebuilt if the port type changed since it was prepared."
+        request = self._sensor_requests.get(port)
+        if request is None or request.sensor_type != self.bp.SensorType[request.port_index]:
+            request = self._prepare_sensor_request(port)
+        return request
 
     def get_sensor_status(self, port: Literal[1, 2, 4, 8]):
         """
@@ -190,147 +517,65 @@ class Brick(BrickPi3):
         4: I2C_ERROR
         5: INCORRECT_SENSOR_PORT
         """
-        if port == self.PORT_1:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_1
-            port_index = 0
-        elif port == self.PORT_2:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_2
-            port_index = 1
-        elif port == self.PORT_3:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_3
-            port_index = 2
-        elif port == self.PORT_4:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_4
-            port_index = 3
-        else:
-            raise IOError(
-                "get_sensor error. Must be one sensor port at a time. PORT_1, PORT_2, PORT_3, or PORT_4.")
+        request = self._sensor_request(port)
+        reply = self.bp.spi_transfer_array(request.out_array)
+        if reply[3] != 0xA5:
+            raise IOError("get_sensor error: No SPI response")
+        if reply[4] in request.expected_types:
+            return reply[5]
+        return SENSOR_STATE.INCORRECT_SENSOR_PORT
+
+    def get_sensor(self, port: Literal[1, 2, 4, 8]):
+        """
+        Read a sensor value. Same as BrickPi3.get_sensor, but with the request prepared
+        by set_sensor_type. Drivers other than the BrickPi3 one read the value themselves.
 
-        if self.SensorType[port_index] == self.SENSOR_TYPE.CUSTOM:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.I2C:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0]
-            for b in range(self.I2CInBytes[port_index]):
-                outArray.append(0)
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_ULTRASONIC
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_REFLECTED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_AMBIENT
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_COLOR
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_LISTEN
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_PROXIMITY):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if (reply[3] == 0xA5):
-                if ((reply[4] == self.SensorType[port_index] or (self.SensorType[port_index] == self.SENSOR_TYPE.TOUCH
-                                                                 and (reply[4] == self.SENSOR_TYPE.NXT_TOUCH or reply[4] == self.SENSOR_TYPE.EV3_TOUCH)))):
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_FULL:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.NXT_LIGHT_ON
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_LIGHT_OFF
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_RED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_GREEN
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_BLUE
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_OFF
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_ABS
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_DPS
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_CM
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_INCHES):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_RAW_REFLECTED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_ABS_DPS):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_COLOR_COMPONENTS:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_SEEK:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_REMOTE:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
+        Keyword arguments:
+        port - The sensor port (one at a time). PORT_1, PORT_2, PORT_3, or PORT_4.
 
-        raise IOError(
-            "get_sensor error: Sensor not configured or not supported.")
+        Raises SensorError if the sensor has no valid data, IOError if the brick does not answer.
+        """
+        if not self._decodes_values:
+            return self.bp.get_sensor(port)
+        request = self._sensor_request(port)
+        reply = self.bp.spi_transfer_array(request.out_array)
+        if reply[3] != 0xA5:
+            raise IOError("get_sensor error: No SPI response")
+        if (reply[4] not in request.expected_types or reply[5] != SENSOR_STATE.VALID_DATA
+                or len(reply) != request.reply_length):
+            raise SensorError("get_sensor error: Invalid sensor data")
+        return request.decode(reply)
+
+
+class ReadPolicy:
+    """
+    How a sensor read handles errors from the brick (SensorError or IOError).
+    The default policy reads once and returns None on error, eg, ReadPolicy(retries=2,
+    max_staleness=0.1) retries twice, then returns the last good value if it is recent enough.
+
+    retries - number of extra attempts after a failed read
+    backoff - seconds to wait before the first retry, doubled before each following one
+    max_staleness - seconds during which the last good value (read in the same mode)
+        is returned when every attempt failed. After that, or if 0, the read returns None.
+    """
+
+    def __init__(self, retries: int = 0, backoff: float = 0.0002, max_staleness: float = 0):
+        if retries < 0 or backoff < 0 or max_staleness < 0:
+            raise ValueError("retries, backoff and max_staleness cannot be negative")
+        self.retries = retries
+        self.backoff = backoff
+        self.max_staleness = max_staleness
+
+    def __repr__(self):
+        return f"ReadPolicy(retries={self.retries}, backoff={self.backoff}, max_staleness={self.max_staleness})"
+
+
+NO_RETRY = ReadPolicy(retries=0, backoff=0, max_staleness=0)  # return None as soon as a read fails, without fallback
+
+# Value read from a device, the time.monotonic() time of the read, and the sequence number
+# of the read for that device (1 for the first read). Reads served from a cache (SensorHub,
+# last good value, shared motor status) keep the time and sequence number of the original read.
+Sample = namedtuple("Sample", "value t seq")
 
 
 class Sensor:
@@ -346,13 +591,31 @@ class Sensor:
         INCORRECT_SENSOR_PORT = "INCORRECT_SENSOR_PORT"
 
     ALL_SENSORS = {key: None for key in '1 2 3 4'.split(' ')}
+    READ_POLICY = NO_RETRY  # default read policy of all sensors, see set_read_policy
 
     def __init__(self, port: Literal[1, 2, 3, 4], bp=None):
         "Initialize sensor with a given port (1, 2, 3, or 4)."
-        self.brick = Brick(bp=bp)
+        self.brick = Brick.shared(bp)
         self.port = PORTS[str(port).upper()]
+        self.read_policy = self.READ_POLICY
+        self._last_good: tuple = None  # (value, monotonic time, mode, seq) of the last successful read
+        self._seq = itertools.count(1)
+        self.read_errors = 0
+        self.read_retries = 0
+        self.read_fallbacks = 0
+        self.read_failures = 0
+        self.hub: SensorHub = None
+        self._aio: AsyncSensor = None
+        self._mode_switches: dict[tuple[str, str], list[float]] = {}
         Sensor.ALL_SENSORS[str(port)] = self
 
+    @property
+    def aio(self) -> AsyncSensor:
+        "asyncio counterpart of this sensor, eg, await sensor.aio.read()."
+        if self._aio is None:
+            self._aio = AsyncTouchSensor(self) if isinstance(self, TouchSensor) else AsyncSensor(self)
+        return self._aio
+
     def get_status(self):
         """
         Get the sensor status of this sensor.
@@ -375,37 +638,400 @@ class Sensor:
             return error
 
     def get_value(self):
-        "Get the raw sensor value. May return a float, int, list or None if error."
-        try:
-            return self.brick.get_sensor(self.port)
-        except SensorError:
-            return None
+        """
+        Get the raw sensor value. May return a float, int, list or None if error.
+
+        If this sensor is registered to a SensorHub, the latest value cached by
+        the hub is returned instead of reading the brick.
+        """
+        if self.hub is not None:
+            return self.hub.get_value(self)[0]
+        return self._read_value()
+
+    def _read_value(self):
+        """
+        Read the sensor value directly from the brick, following the read policy:
+        retry failed reads, then fall back to the last good value if the policy allows it.
+        Return None if error.
+        """
+        return self._read_sample().value
+
+    def _read_sample(self) -> Sample:
+        """
+        Read the sensor from the brick like _read_value, and return a Sample. A fallback to
+        the last good value keeps the time and sequence number of that value. With a driver
+        that publishes its reads, the sample has the time and number of the published read.
+        """
+        policy = self.read_policy
+        delay = policy.backoff
+        for attempt in range(policy.retries + 1):
+            try:
+                if self.brick._publishes_samples:
+                    sample = self.brick.bp.get_sensor_sample(self.port)
+                else:
+                    sample = Sample(self.brick.get_sensor(self.port), time.monotonic(), next(self._seq))
+            except (SensorError, OSError):
+                self.read_errors += 1
+            else:
+                self._last_good = (sample.value, sample.t, getattr(self, "mode", None), sample.seq)
+                return sample
+            if attempt < policy.retries:
+                self.read_retries += 1
+                if delay > 0:
+                    busy_sleep(delay)
+                delay *= 2
+        last = self._last_good
+        if (last is not None and policy.max_staleness > 0 and last[2] == getattr(self, "mode", None)
+                and time.monotonic() - last[1] <= policy.max_staleness):
+            self.read_fallbacks += 1
+            return Sample(last[0], last[1], last[3])
+        self.read_failures += 1
+        return Sample(None, time.monotonic(), next(self._seq))
+
+    def get_sample(self) -> Sample:
+        """
+        Get the sensor value like get_value, as a Sample(value, t, seq) with the time of
+        the read and its sequence number. A read that failed has a value of None.
+        """
+        if self.hub is not None:
+            return self.hub.get_sample(self)
+        return self._read_sample()
+
+    def set_read_policy(self, policy: ReadPolicy):
+        "Change how reads of this sensor handle errors, eg, set_read_policy(ReadPolicy(retries=5))."
+        self.read_policy = policy
+
+    def get_read_stats(self) -> dict:
+        """
+        Return the number of failed attempts (errors), retries, reads answered with
+        the last good value (fallbacks), and reads that returned None (failures).
+        """
+        return {
+            "errors": self.read_errors,
+            "retries": self.read_retries,
+            "fallbacks": self.read_fallbacks,
+            "failures": self.read_failures,
+        }
+
+    def _on_sample(self, value, timestamp: float):
+        "Called by a SensorHub after each read of this sensor. Does nothing by default."
+        pass
+
+    def get_sample_age(self) -> float:
+        """
+        Return the age in seconds of the value given by get_value.
+        Sensors not registered to a SensorHub are read on demand, so their age is 0.
+        """
+        if self.hub is not None:
+            return self.hub.get_value(self)[1]
+        return 0.0
 
     def get_raw_value(self):
         "Get the raw sensor value. May return a float, int, list or None if error."
         return self.get_value()
 
-    def wait_ready(self):
-        "Wait (pause program) until the sensor is initialized."
-        while self.get_status() != Sensor.Status.VALID_DATA:
+    def is_ready(self) -> bool:
+        """
+        Return True if the sensor is initialized and has valid data.
+        Errors while reading the status (eg, no sensor plugged in) count as not ready.
+        """
+        try:
+            return self.get_status() == Sensor.Status.VALID_DATA
+        except OSError:
+            return False
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """
+        Wait (pause program) until the sensor is initialized.
+
+        Return True once the sensor is ready, or False if timeout seconds passed first.
+        Errors while reading the status (eg, no sensor plugged in) count as not ready.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.is_ready():
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
             time.sleep(WAIT_READY_INTERVAL)
+        return True
 
+    def switch_mode(self, mode: str, timeout: float = MODE_SWITCH_TIMEOUT):
+        """
+        Change the sensor mode if it is not already in that mode, and wait until it is ready.
+        The time taken by each switch is recorded, see get_mode_switch_latency.
 
-def wait_ready_sensors(debug=False):
-    for port, sensor in Sensor.ALL_SENSORS.items():
-        if sensor is not None:
-            if debug:
-                print(f"Initializing Port {port}:", type(sensor).__name__)
-            sensor.wait_ready()
+        Raises SensorError if the sensor is not ready after timeout seconds
+        (eg, it was unplugged).
+        """
+        previous = getattr(self, "mode", None)
+        if previous == mode:
+            return
+        start = time.perf_counter()
+        self.set_mode(mode)
+        if not self.wait_ready(timeout):
+            raise SensorError(f"switch_mode error: sensor not ready in mode {mode} after {timeout}s")
+        latency = time.perf_counter() - start
+        stats = self._mode_switches.setdefault((previous, mode), [0, 0.0, 0.0, 0.0])
+        stats[0] += 1  # count
+        stats[1] += latency  # total
+        stats[2] = max(stats[2], latency)  # max
+        stats[3] = latency  # last
+
+    def get_mode_switch_latency(self, previous: str = None, mode: str = None):
+        """
+        Return the measured time to switch modes, in seconds.
+
+        With both modes given, return the mean switch time from previous to mode,
+        or None if that switch was never measured. Otherwise, return a dictionary of
+        all measured switches: {(previous, mode): {"count", "mean", "max", "last"}}.
+        """
+        if previous is not None and mode is not None:
+            stats = self._mode_switches.get((previous, mode))
+            return stats[1] / stats[0] if stats else None
+        return {pair: {"count": count, "mean": total / count, "max": maximum, "last": last}
+                for pair, (count, total, maximum, last) in self._mode_switches.items()}
+
+
+def wait_ready_sensors(debug=False, timeout: float = SENSOR_INIT_TIMEOUT) -> dict[str, dict]:
+    """
+    Wait until every created sensor is initialized. All ports are waited on at the same
+    time, so this takes as long as the slowest sensor, and at most timeout seconds overall
+    (None to wait forever).
+
+    Return a report of each port: {port: {"sensor", "ready", "time", "error"}}, where time is
+    the seconds the sensor took to be ready. Sensors that are not ready are printed as errors.
+    """
+    sensors = {port: sensor for port, sensor in Sensor.ALL_SENSORS.items() if sensor is not None}
     if debug:
+        for port, sensor in sensors.items():
+            print(f"Initializing Port {port}:", type(sensor).__name__)
+    report = _wait_ready_concurrently(sensors, timeout)
+    for port, result in report.items():
+        if debug and result["ready"]:
+            print(f"Port {port} ready in {result['time']:.2f}s")
+        if not result["ready"]:
+            print(f"Port {port} ({result['sensor']}) not ready: {result['error']}", file=sys.stderr)
+    if debug and all(result["ready"] for result in report.values()):
         print("All Sensors Initialized")
+    return report
+
+
+def _wait_ready_concurrently(sensors: dict[str, Sensor], timeout: float = None) -> dict[str, dict]:
+    """
+    Wait for each sensor that is not ready yet in its own thread, with one deadline for all.
+    Return the per-port report.
+    """
+    start = time.perf_counter()
+    report = {port: {"sensor": type(sensor).__name__, "ready": False, "time": None, "error": None}
+              for port, sensor in sensors.items()}
+    # Sensors that are already ready (eg, on later calls) need no thread
+    pending = {}
+    for port, sensor in sensors.items():
+        try:
+            ready = sensor.is_ready()
+        except Exception:
+            ready = False  # reported by wait_port
+        if ready:
+            report[port]["ready"] = True
+            report[port]["time"] = time.perf_counter() - start
+        else:
+            pending[port] = sensor
+
+    def wait_port(port: str, sensor: Sensor):
+        try:
+            ready = sensor.wait_ready(timeout)
+        except Exception as err:
+            report[port]["error"] = f"{err.__class__.__name__}({err})"
+            return
+        report[port]["ready"] = ready
+        if ready:
+            report[port]["time"] = time.perf_counter() - start
+        else:
+            report[port]["error"] = f"timed out after {timeout}s"
+
+    if len(pending) == 1:
+        wait_port(*next(iter(pending.items())))
+        return report
+    threads = [threading.Thread(target=wait_port, args=item, daemon=True) for item in pending.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # Threads stop on their own at the deadline, the join timeout is only a safety margin
+        thread.join(None if timeout is None else max(0, start + timeout + 1 - time.perf_counter()))
+    for port, thread in zip(pending, threads):
+        if thread.is_alive():
+            report[port]["error"] = f"timed out after {timeout}s"
+    return report
+
+
+class _HubEntry:
+    "Latest-value cache slot for one sensor registered to a SensorHub."
+
+    def __init__(self, sensor: Sensor, period: float):
+        self.sensor = sensor
+        self.period = period
+        self.next_time = time.monotonic()
+        self.value = None
+        self.mode = None
+        self.timestamp = None
+        self.seq = None
+        self.reads = 0
+        self.errors = 0
+
+
+class SensorHub:
+    """
+    Background poller that reads each registered sensor at its own rate,
+    and keeps the latest value of each sensor in a lock-protected cache.
+
+    Once a sensor is registered, and while the hub is running, its get_value() returns
+    the cached value, so any number of threads can read it without extra bus traffic.
+    When the hub is not running, reads go to the brick (and update the cache).
+
+    Example:
+
+    hub = SensorHub()
+    hub.register(COLOR_SENSOR, rate=50)  # 50 reads per second
+    hub.register(TOUCH_SENSOR, rate=100)
+    hub.start()
+    value, age = hub.get_value(COLOR_SENSOR)
+    """
+    DEFAULT_RATE = 50  # reads per second
+    MAX_IDLE = 0.1  # longest time the poller sleeps without checking for changes
+    _default: SensorHub = None
+
+    def __init__(self):
+        self._entries: dict[Sensor, _HubEntry] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread: threading.Thread = None
+
+    @classmethod
+    def get_default(cls) -> SensorHub:
+        "Return the hub shared by all event-driven sensors, eg, TouchSensor callbacks."
+        if cls._default is None:
+            cls._default = SensorHub()
+        return cls._default
+
+    def register(self, sensor: Sensor, rate: float = DEFAULT_RATE):
+        "Poll the sensor rate times per second, and serve its get_value() from the cache."
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of reads per second")
+        with self._lock:
+            self._entries[sensor] = _HubEntry(sensor, 1 / rate)
+        sensor.hub = self
+        self._wakeup.set()
+
+    def unregister(self, sensor: Sensor):
+        "Stop polling the sensor. Its get_value() reads the brick directly again."
+        with self._lock:
+            self._entries.pop(sensor, None)
+        if sensor.hub is self:
+            sensor.hub = None
+
+    def start(self):
+        "Start the polling thread. Does nothing if it is already running."
+        if self.is_running():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop the polling thread. Cached values are kept."
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_value(self, sensor: Sensor) -> tuple:
+        """
+        Return (value, age) for the sensor, where age is the number of seconds since
+        the value was read from the brick.
+
+        If the sensor has no cached value in its current mode (eg, right after a
+        mode change), or the hub is not running, it is read immediately and the cache is updated.
+        """
+        with self._lock:
+            entry = self._entries.get(sensor)
+            if self._is_served(entry, sensor):
+                return entry.value, time.monotonic() - entry.timestamp
+        if entry is None:
+            return sensor._read_value(), 0.0
+        self._sample(entry)
+        return entry.value, 0.0
+
+    def get_sample(self, sensor: Sensor) -> Sample:
+        "Return the cached value of the sensor as a Sample. See get_value."
+        with self._lock:
+            entry = self._entries.get(sensor)
+            if self._is_served(entry, sensor):
+                return Sample(entry.value, entry.timestamp, entry.seq)
+        if entry is None:
+            return sensor._read_sample()
+        self._sample(entry)
+        return Sample(entry.value, entry.timestamp, entry.seq)
+
+    def _is_served(self, entry: _HubEntry, sensor: Sensor) -> bool:
+        "True if the cached value can be returned: it is in the current mode, and the poller keeps it up to date."
+        return (entry is not None and entry.timestamp is not None
+                and entry.mode == getattr(sensor, "mode", None) and self.is_running())
+
+    def get_stats(self, sensor: Sensor) -> dict:
+        "Return the number of reads and failed reads done by the poller for this sensor."
+        with self._lock:
+            entry = self._entries[sensor]
+            return {"reads": entry.reads, "errors": entry.errors, "period": entry.period}
+
+    def _sample(self, entry: _HubEntry):
+        "Read one sensor and store its value, unless it changed mode during the read."
+        mode = getattr(entry.sensor, "mode", None)
+        value, timestamp, seq = entry.sensor._read_sample()
+        with self._lock:
+            entry.reads += 1
+            if value is None:
+                entry.errors += 1
+            if mode != getattr(entry.sensor, "mode", None):
+                return
+            if value is not None or entry.mode != mode:
+                entry.value = value
+                entry.mode = mode
+                entry.timestamp = timestamp
+                entry.seq = seq
+        entry.sensor._on_sample(value, timestamp)
+
+    def _poll(self):
+        "Thread target: read every sensor that is due, then sleep until the next one is."
+        while self._running:
+            with self._lock:
+                entries = list(self._entries.values())
+            now = time.monotonic()
+            next_time = now + self.MAX_IDLE
+            for entry in entries:
+                if entry.next_time <= now:
+                    self._sample(entry)
+                    # Skip missed reads instead of bursting to catch up
+                    entry.next_time = max(entry.next_time + entry.period, now)
+                next_time = min(next_time, entry.next_time)
+            self._wakeup.wait(max(0, next_time - time.monotonic()))
+            self._wakeup.clear()
 
 
 class TouchSensor(Sensor):
     """
     Basic touch sensor class. There is only one mode.
     Gives values 0 to 1, with 1 meaning the button is being pressed.
+
+    Presses can also be handled as events, with on_press, on_release and wait_for_press.
+    These are driven by a SensorHub (the shared default hub, unless the sensor is already
+    registered to another hub), which polls the sensor in the background.
     """
+    POLL_RATE = 400  # reads per second, when the sensor is polled for events
+    DEBOUNCE = 0.003  # seconds a new state must last before it counts as a press or release
 
     def __init__(self, port: Literal[1, 2, 3, 4], mode: str = "touch", bp=None):
         """
@@ -414,6 +1040,14 @@ class TouchSensor(Sensor):
         """
         super(TouchSensor, self).__init__(port, bp)
         self.set_mode(mode.lower())
+        self.debounce = TouchSensor.DEBOUNCE
+        self._press_callbacks = []
+        self._release_callbacks = []
+        self._state = None  # debounced state, None until the first sample
+        self._candidate = None
+        self._candidate_time = 0.0
+        self._press_count = 0
+        self._pressed_event = threading.Condition()
 
     def set_mode(self, mode: str = "touch"):
         """
@@ -431,6 +1065,67 @@ class TouchSensor(Sensor):
         "Return True if pressed, False otherwise."
         return self.get_value() == 1
 
+    def set_debounce(self, seconds: float):
+        "Set how long a new state must last before it counts as a press or release."
+        self.debounce = seconds
+
+    def on_press(self, callback):
+        """
+        Call callback(sensor) every time the button is pressed.
+        Callbacks run in the poller thread, so they should return quickly.
+        """
+        self._press_callbacks.append(callback)
+        self._start_polling()
+        return callback
+
+    def on_release(self, callback):
+        """
+        Call callback(sensor) every time the button is released.
+        Callbacks run in the poller thread, so they should return quickly.
+        """
+        self._release_callbacks.append(callback)
+        self._start_polling()
+        return callback
+
+    def wait_for_press(self, timeout: float = None) -> bool:
+        """
+        Wait (pause program) until the button is pressed. If the button is already
+        held down, wait for the next press.
+
+        Return True if the button was pressed, False if timeout seconds passed first.
+        """
+        self._start_polling()
+        with self._pressed_event:
+            count = self._press_count
+            return self._pressed_event.wait_for(lambda: self._press_count != count, timeout)
+
+    def _start_polling(self):
+        "Make sure this sensor is polled in the background, so that its events fire."
+        if self.hub is None:
+            SensorHub.get_default().register(self, rate=TouchSensor.POLL_RATE)
+        self.hub.start()
+
+    def _on_sample(self, value, timestamp: float):
+        "Debounce the raw samples from the hub, and fire the press and release events."
+        if value is None:
+            return
+        pressed = value == 1
+        if pressed != self._candidate:
+            self._candidate = pressed
+            self._candidate_time = timestamp
+        if pressed == self._state or timestamp - self._candidate_time < self.debounce:
+            return
+        was_initialized = self._state is not None
+        self._state = pressed
+        if not was_initialized:
+            return
+        if pressed:
+            with self._pressed_event:
+                self._press_count += 1
+                self._pressed_event.notify_all()
+        for callback in (self._press_callbacks if pressed else self._release_callbacks):
+            callback(self)
+
 
 class EV3UltrasonicSensor(Sensor):
     """
@@ -476,21 +1171,15 @@ class EV3UltrasonicSensor(Sensor):
             return error
 
     def get_cm(self):
-        if self.mode != self.Mode.CM:
-            self.set_mode(self.Mode.CM)
-            self.wait_ready()
+        self.switch_mode(self.Mode.CM)
         return self.get_value()
 
     def get_inches(self):
-        if self.mode != self.Mode.IN:
-            self.set_mode(self.Mode.IN)
-            self.wait_ready()
+        self.switch_mode(self.Mode.IN)
         return self.get_value()
 
     def detects_other_us_sensor(self):
-        if self.mode != self.Mode.LISTEN:
-            self.set_mode(self.Mode.LISTEN)
-            self.wait_ready()
+        self.switch_mode(self.Mode.LISTEN)
         return self.get_value() == 1
 
 
@@ -553,31 +1242,23 @@ class EV3ColorSensor(Sensor):
 
     def get_ambient(self) -> float:
         "Returns the ambient light detected by the sensor. Light will not turn on."
-        if self.mode != self.Mode.AMBIENT:
-            self.set_mode(self.Mode.AMBIENT)
-            self.wait_ready()
+        self.switch_mode(self.Mode.AMBIENT)
         return self.get_value()
 
     def get_rgb(self) -> list[float]:
         "Return the RGB values from the sensor. This will switch the sensor to component mode."
-        if self.mode != self.Mode.COMPONENT:
-            self.set_mode(self.Mode.COMPONENT)
-            self.wait_ready()
+        self.switch_mode(self.Mode.COMPONENT)
         val = self.get_value()
         return val[:-1] if val is not None else [None, None, None]
 
     def get_red(self) -> float:
         "Returns the red light detected by the sensor. Only red light turns on."
-        if self.mode != self.Mode.RED:
-            self.set_mode(self.Mode.RED)
-            self.wait_ready()
+        self.switch_mode(self.Mode.RED)
         return self.get_value()
 
     def get_color_name(self) -> str:
         "Return the closest detected color by name. This will switch the sensor to id mode."
-        if self.mode != self.Mode.ID:
-            self.set_mode(self.Mode.ID)
-            self.wait_ready()
+        self.switch_mode(self.Mode.ID)
         return _color_names_by_code.get(self.get_value(), Color.UNKNOWN)
 
 
@@ -629,29 +1310,146 @@ class EV3GyroSensor(Sensor):
         return self.set_mode(self.mode.lower())
 
     def get_abs_measure(self):
-        if self.mode != self.Mode.ABS:
-            self.set_mode(self.Mode.ABS)
-            self.wait_ready()
+        self.switch_mode(self.Mode.ABS)
         return self.get_value()
 
     def get_dps_measure(self):
-        if self.mode != self.Mode.DPS:
-            self.set_mode(self.Mode.DPS)
-            self.wait_ready()
+        self.switch_mode(self.Mode.DPS)
         return self.get_value()
 
     def get_both_measure(self):
-        if self.mode != self.Mode.BOTH:
-            self.set_mode(self.Mode.BOTH)
-            self.wait_ready()
+        self.switch_mode(self.Mode.BOTH)
         return self.get_value()
 
 
+class ModeScheduler:
+    """
+    Plans reads of a sensor in several modes, so that mode changes (which each cost a
+    set_mode and a wait_ready) are done as rarely and as cheaply as possible.
+
+    Reads are batched by mode, and the order of the modes is chosen from the switch
+    latencies measured so far by the sensor (see Sensor.get_mode_switch_latency),
+    starting with the mode the sensor is already in.
+
+    Example:
+
+    scheduler = ModeScheduler(COLOR_SENSOR)
+    values = scheduler.sample({"component": 5, "red": 5})
+    values["component"]  # => list of 5 raw component readings
+    """
+    UNKNOWN_LATENCY = 0.5  # seconds, assumed for switches that were never measured
+
+    def __init__(self, sensor: Sensor):
+        self.sensor = sensor
+
+    def switch_cost(self, previous: str, mode: str) -> float:
+        "Return the expected time to switch from previous to mode, in seconds."
+        if previous == mode:
+            return 0.0
+        latency = self.sensor.get_mode_switch_latency(previous, mode)
+        return self.UNKNOWN_LATENCY if latency is None else latency
+
+    def order(self, modes) -> list[str]:
+        "Return the modes in the order that minimizes the expected total switch time."
+        current = getattr(self.sensor, "mode", None)
+        modes = list(dict.fromkeys(modes))
+        best_order, best_cost = modes, math.inf
+        for order in itertools.permutations(modes):
+            cost, previous = 0.0, current
+            for mode in order:
+                cost += self.switch_cost(previous, mode)
+                previous = mode
+            if cost < best_cost:
+                best_order, best_cost = list(order), cost
+        return best_order
+
+    def sample(self, plan: dict[str, int]) -> dict[str, list]:
+        """
+        Read the sensor plan[mode] times in each mode, all reads of a mode in a row.
+        Return a dictionary of the raw values read in each mode.
+        """
+        values = {}
+        for mode in self.order(plan.keys()):
+            self.sensor.switch_mode(mode)
+            values[mode] = [self.sensor.get_value() for _ in range(plan[mode])]
+        return values
+
+    def read(self, modes) -> dict[str, object]:
+        "Read the sensor once in each of the given modes. Return a dictionary of raw values."
+        return {mode: values[0] for mode, values in self.sample({mode: 1 for mode in modes}).items()}
+
+
+class MoveResult:
+    """
+    Outcome of a Motor.move_relative command.
+
+    target - encoder position the motor was sent to, in degrees
+    position - encoder position when the wait ended, in degrees
+    reached - True if the motor settled within tolerance of the target before the timeout
+    settle_time - seconds from the command until the motor entered tolerance for the last
+        time, ie, stayed within it from then on (or the timeout)
+    overshoot - largest distance the motor went past the target while waiting, in degrees
+    """
+
+    def __init__(self, target: float, position: float, reached: bool, settle_time: float, overshoot: float):
+        self.target = target
+        self.position = position
+        self.reached = reached
+        self.settle_time = settle_time
+        self.overshoot = overshoot
+
+    def __repr__(self):
+        return (f"MoveResult(target={self.target}, position={self.position}, reached={self.reached}, "
+                f"settle_time={self.settle_time:.3f}, overshoot={self.overshoot})")
+
+
+class _MoveWatch:
+    """
+    Progress of the last move_relative of a motor, measured by polling its encoder.
+    Used by Motor.wait_move_done and MotorGroup.wait_move_done.
+    """
+
+    def __init__(self, motor: Motor, tolerance=None):
+        self.motor = motor
+        self.tolerance = motor.MOVE_TOLERANCE if tolerance is None else tolerance
+        self.target, self.direction, self.start_time, self.timeout = motor._move
+        self.overshoot = 0
+        self.entered = None  # seconds after the command at which the motor last entered tolerance
+
+    def check(self) -> MoveResult:
+        """
+        Read the encoder once. Return a MoveResult if the move has settled or timed out,
+        None if it is still going.
+        """
+        motor = self.motor
+        position = motor.get_encoder()
+        elapsed = time.perf_counter() - self.start_time
+        error = self.target - position
+        self.overshoot = max(self.overshoot, -error * self.direction)
+        inside = abs(error) <= self.tolerance
+        if not inside:
+            self.entered = None
+        elif self.entered is None:
+            self.entered = elapsed
+        if inside and (elapsed - self.entered >= motor.MOVE_SETTLE_TIME or motor.is_moving() is False):
+            return MoveResult(self.target, position, True, self.entered, self.overshoot)
+        if self.timeout is not None and elapsed >= self.timeout:
+            settle_time = elapsed if self.entered is None else self.entered
+            return MoveResult(self.target, position, False, settle_time, self.overshoot)
+        return None
+
+
 class Motor:
     "Motor class for any motor."
     INF = INF
     MAX_SPEED = 1560  # positive or negative degree per second speed
     MAX_POWER = 100  # positive or negative percent power
+    MOVE_TOLERANCE = 2  # degrees from the target at which a move is considered done
+    MOVE_POLL_INTERVAL = 0.005  # seconds between encoder reads while waiting for a move
+    MOVE_SETTLE_TIME = 0.05  # seconds a move must stay within tolerance to be done, if the motor still turns
+    STATUS_MAX_AGE = 0  # seconds during which status reads share one get_motor_status result, 0 to never share
+    _tick = 0  # control tick counter, see new_tick
+    COMMAND_INTERVAL = 0  # minimum seconds between power/dps setpoints, 0 to send every setpoint
 
     def __init__(self, port: Literal["A", "B", "C", "D"] | list[str], bp=None):
         """
@@ -659,8 +1457,32 @@ class Motor:
         You may also provide a list of these ports such as ["A", "C"] to run
         both motors at the exact same time (exact combined behavior unknown).
         """
-        self.brick = Brick(bp)
+        self.brick = Brick.shared(bp)
         self.set_port(port)
+        self._aio: AsyncMotor = None
+        self._move: tuple = None  # (target, direction, start time, timeout) of the last move_relative
+        self.status_max_age = self.STATUS_MAX_AGE
+        self._status_sample: tuple = None  # (status, monotonic time, tick, seq) of the last status read
+        self._seq = itertools.count(1)
+        self.status_hits = 0
+        self.status_misses = 0
+        self._commanded: dict[str, object] = {}  # last command sent of each kind, see _write
+        self.command_interval = self.COMMAND_INTERVAL
+        self._command_lock = threading.RLock()  # guards the commands, held while one is sent
+        self._pending: tuple = None  # (send method, value) of the setpoint waiting for the flush timer
+        self._flush_timer: threading.Timer = None
+        self._last_setpoint_time = -INF
+        self.writes_sent = 0
+        self.writes_suppressed = 0
+        self.writes_coalesced = 0
+        self.battery = None  # BatteryMonitor that scales set_power, see BatteryMonitor.attach
+
+    @property
+    def aio(self) -> AsyncMotor:
+        "asyncio counterpart of this motor, eg, await motor.aio.wait_is_stopped()."
+        if self._aio is None:
+            self._aio = AsyncMotor(self)
+        return self._aio
 
     def set_port(self, port):
         """
@@ -690,8 +1512,21 @@ class Motor:
 
         Keyword arguments:
         power - The power from -100 to 100, or -128 for float
+
+        If a BatteryMonitor is attached, the power is scaled to give the same speed
+        as at the nominal battery voltage.
         """
-        self.brick.set_motor_power(self.port, power)
+        if self.battery is not None and power != -128:
+            power = self.battery.scale_power(power)
+        with self._command_lock:
+            if not self._coalesce(self._send_power, power):
+                self._send_power(power)
+
+    def _send_power(self, power):
+        with self._command_lock:
+            if self._write("mode", ("power", power), self.brick.set_motor_power, power):
+                self._commanded.pop("limits", None)  # the brick resets the limits
+                self._last_setpoint_time = time.perf_counter()
 
     def float_motor(self):
         """(Float the motor), which unlocks the motor, and allows outside forces to rotate it.
@@ -707,7 +1542,10 @@ class Motor:
         It DOES NOT RESET any limits defined by (Motor.set_limits)
         The Motor will stop any current movements, then unlock
         """
-        self.brick.set_motor_power(self.port, -128)
+        with self._command_lock:
+            self._cancel_pending()
+            if self._write("mode", ("power", -128), self.brick.set_motor_power, -128):
+                self._commanded.pop("limits", None)
 
     def set_position(self, position):
         """
@@ -732,7 +1570,9 @@ class Motor:
         If you use Motor.set_position IMMEDIATELY AFTER Motor.set_power or Motor.set_dps,
             it will rotate at FULL POWER. This may crash the robot.
         """
-        self.brick.set_motor_position(self.port, position)
+        with self._command_lock:
+            self._cancel_pending()
+            self._write("mode", ("position", position), self.brick.set_motor_position, position)
 
     def set_position_relative(self, degrees):
         """
@@ -759,7 +1599,69 @@ class Motor:
         If you use Motor.set_position IMMEDIATELY AFTER Motor.set_power or Motor.set_dps,
             it will rotate at FULL POWER. This may crash the robot.
         """
-        self.brick.set_motor_position_relative(self.port, degrees)
+        with self._command_lock:
+            self._cancel_pending()
+            self._commanded.pop("mode", None)  # the target is no longer known, never suppress this command
+            self._write("mode", None, self.brick.set_motor_position_relative, degrees)
+
+    def move_relative(self, degrees, dps=None, wait=True, tolerance=None, timeout=None):
+        """
+        Rotate the motor a given number of degrees away from its current position,
+        and (by default) wait until the encoder reaches the target.
+        (Position-Type Motor Control)
+
+        Unlike set_position_relative followed by time.sleep, this returns as soon as
+        the motor has settled within tolerance of the target.
+
+        Keyword arguments:
+        degrees - The number of degrees to rotate, positive or negative
+        dps - The speed limit in degrees per second, None to keep the current limits
+        wait - True to wait for the move to finish, False to return immediately
+            (use wait_move_done later to wait for it)
+        tolerance - Degrees from the target at which the move is done (default MOVE_TOLERANCE)
+        timeout - Maximum seconds to wait. By default, twice the time the move should take at dps,
+            plus one second, or no limit if dps is None
+
+        Returns a MoveResult if wait is True, None otherwise.
+        """
+        start_position = self.get_encoder()
+        if dps is not None:
+            self.set_limits(dps=dps)
+        self._start_move(start_position, degrees, dps, timeout)
+        if wait:
+            return self.wait_move_done(tolerance)
+        return None
+
+    def _start_move(self, start_position, degrees, dps=None, timeout=None, start_time=None):
+        """
+        Send the relative position command of move_relative, and remember its target.
+        start_time is the perf_counter time the move is measured from (now if None).
+        """
+        if timeout is None and dps:
+            timeout = 2 * abs(degrees / dps) + 1
+        self.set_position_relative(degrees)
+        direction = 1 if degrees >= 0 else -1
+        if start_time is None:
+            start_time = time.perf_counter()
+        self._move = (start_position + degrees, direction, start_time, timeout)
+
+    def wait_move_done(self, tolerance=None) -> MoveResult:
+        """
+        Wait (pause program) until the last move_relative has settled at its target, or until
+        the timeout given to move_relative. The move has settled once the motor is within
+        tolerance of the target and has stopped, or has stayed within tolerance for
+        MOVE_SETTLE_TIME seconds. Any overshoot past the target before that is measured.
+
+        Returns a MoveResult, or None if no move was started.
+        """
+        if self._move is None:
+            return None
+        watch = _MoveWatch(self, tolerance)
+        while True:
+            result = watch.check()
+            if result is not None:
+                return result
+            time.sleep(self.MOVE_POLL_INTERVAL)
 
     def set_position_kp(self, kp=25):
         """
@@ -772,7 +1674,9 @@ class Motor:
         Keyword arguments:
         kp - The KP constant (default 25)
         """
-        self.brick.set_motor_position_kp(self.port, kp)
+        with self._command_lock:
+            self._flush_pending()
+            self._write("kp", kp, self.brick.set_motor_position_kp, kp)
 
     def set_position_kd(self, kd=70):
         """
@@ -785,7 +1689,9 @@ class Motor:
         Keyword arguments:
         kd - The KD constant (default 70)
         """
-        self.brick.set_motor_position_kd(self.port, kd)
+        with self._command_lock:
+            self._flush_pending()
+            self._write("kd", kd, self.brick.set_motor_position_kd, kd)
 
     def set_dps(self, dps):
         """
@@ -804,8 +1710,16 @@ class Motor:
         Keyword arguments:
         dps - The target speed in degrees per second
         """
-        self.brick.set_motor_dps(self.port, dps)
-        self.set_limits(dps=dps)
+        with self._command_lock:
+            if not self._coalesce(self._send_dps, dps):
+                self._send_dps(dps)
+
+    def _send_dps(self, dps):
+        with self._command_lock:
+            if self._write("mode", ("dps", dps), self.brick.set_motor_dps, dps):
+                self._commanded.pop("limits", None)  # the brick resets the limits
+                self._last_setpoint_time = time.perf_counter()
+            self._write("limits", (0, dps), self.brick.set_motor_limits, 0, dps)
 
     def set_limits(self, power=0, dps=0):
         """
@@ -823,7 +1737,102 @@ class Motor:
         power - The power limit in percent (0 to 100), with 0 being no limit (100)
         dps - The speed limit in degrees per second, with 0 being no limit
         """
-        self.brick.set_motor_limits(self.port, power, dps)
+        with self._command_lock:
+            self._flush_pending()
+            self._write("limits", (power, dps), self.brick.set_motor_limits, power, dps)
+
+    def _write(self, kind: str, value, send, *args) -> bool:
+        """
+        Send a command to the brick with send(port, *args), unless the last command of the
+        same kind had the same value. Return True if the command was sent.
+        The command lock is held from the check to the update of the last command, so the
+        flush timer and other threads cannot send a command in between.
+        """
+        with self._command_lock:
+            commanded = self._commanded
+            if kind in commanded and commanded[kind] == value:
+                self.writes_suppressed += 1
+                return False
+            send(self.port, *args)
+            commanded[kind] = value
+            self.writes_sent += 1
+            self._status_sample = None
+            return True
+
+    def _coalesce(self, send, value) -> bool:
+        """
+        Return True if the power/dps setpoint was left for the flush timer, because the last
+        setpoint was sent less than command_interval seconds ago. A newer setpoint replaces
+        the one waiting. Stopping (0) is never delayed.
+        """
+        with self._command_lock:
+            if self.command_interval <= 0 or value == 0:
+                self._cancel_pending()
+                return False
+            delay = self._last_setpoint_time + self.command_interval - time.perf_counter()
+            if delay <= 0:
+                if self._pending is not None:
+                    self._pending = None
+                    self.writes_coalesced += 1
+                return False
+            if self._pending is not None:
+                self.writes_coalesced += 1
+            self._pending = (send, value)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(delay, self._flush_pending)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return True
+
+    def _cancel_pending(self):
+        "Drop the setpoint waiting for the flush timer, because a newer command replaces it."
+        with self._command_lock:
+            if self._pending is not None:
+                self._pending = None
+                self.writes_coalesced += 1
+
+    def _flush_pending(self):
+        """
+        Send the setpoint waiting for the flush timer now, if there is one. The command lock
+        is held while it is sent, so a newer command cannot be sent before it.
+        """
+        with self._command_lock:
+            pending = self._pending
+            self._pending = None
+            self._flush_timer = None
+            if pending is not None:
+                send, value = pending
+                send(value)
+
+    def flush(self):
+        "Send the latest power/dps setpoint now, if it is waiting because of command_interval."
+        self._flush_pending()
+
+    def set_command_interval(self, seconds: float):
+        """
+        Set the minimum time between power/dps setpoints sent to the brick. Setpoints given
+        sooner are coalesced: only the latest one is sent, when the interval is over.
+        0 (the default) sends every setpoint immediately.
+        """
+        self.flush()
+        self.command_interval = seconds
+
+    def forget_commands(self):
+        """
+        Forget the commands sent to this motor, so the next ones are sent even if identical.
+        Use it if the motor may have been commanded by something else, eg, another Motor
+        object on the same port.
+        """
+        with self._command_lock:
+            self._commanded = {}
+
+    def get_command_stats(self) -> dict:
+        "Return the number of commands sent to the brick, suppressed because identical, and coalesced."
+        return {
+            "sent": self.writes_sent,
+            "suppressed": self.writes_suppressed,
+            "coalesced": self.writes_coalesced,
+        }
 
     def get_status(self):
         """
@@ -839,11 +1848,77 @@ class Motor:
             power - the raw PWM power in percent (-100 to 100)
             encoder - The encoder position
             dps - The current speed in Degrees Per Second
+
+        By default, every call reads the brick. With set_status_max_age, reads within
+        status_max_age seconds of each other, and in the same control tick (see new_tick),
+        share one get_motor_status result. Commands sent to the motor discard the shared result.
+        """
+        sample = self._read_status()
+        if sample is None:
+            return [None, None, None, None]
+        return list(sample[0])
+
+    def get_status_sample(self) -> Sample:
+        "Read the motor status like get_status, as a Sample(status, t, seq)."
+        sample = self._read_status()
+        if sample is None:
+            return Sample([None, None, None, None], time.monotonic(), next(self._seq))
+        return Sample(list(sample[0]), sample[1], sample[3])
+
+    def _fresh_status(self) -> tuple:
+        "Return the shared (status, time, tick, seq) if sharing is on and it is still fresh, None otherwise."
+        sample = self._status_sample
+        if (self.status_max_age > 0 and sample is not None and sample[2] == Motor._tick
+                and time.monotonic() - sample[1] <= self.status_max_age):
+            self.status_hits += 1
+            return sample
+        return None
+
+    def _read_status(self, shared: bool = True) -> tuple:
         """
+        Return the fresh shared status, or read a new one. Return None if the read failed.
+        With shared False, always read the brick (eg, for recordings).
+        """
+        sample = self._fresh_status() if shared else None
+        if sample is not None:
+            return sample
+        self.status_misses += 1
         try:
-            return self.brick.get_motor_status(self.port)
+            if self.brick._publishes_samples:
+                status, t, seq = self.brick.bp.get_motor_status_sample(self.port)
+            else:
+                status, t, seq = self.brick.get_motor_status(self.port), time.monotonic(), next(self._seq)
         except IOError:
-            return [None, None, None, None]
+            return None
+        sample = self._status_sample = (status, t, Motor._tick, seq)
+        return sample
+
+    def set_status_max_age(self, seconds: float):
+        """
+        Set how long a motor status stays fresh: 0 to read the brick every time (default),
+        or INF to share one status per control tick, until the next new_tick call.
+        Sharing saves bus traffic when many parts of a control loop read the same motor,
+        at the cost of values up to seconds old.
+        """
+        self.status_max_age = seconds
+        self._status_sample = None
+
+    @staticmethod
+    def new_tick():
+        """
+        Start a new control tick: motors that share their status (see set_status_max_age)
+        read it again at their next use.
+        """
+        Motor._tick += 1
+
+    def get_status_cache_stats(self) -> dict:
+        "Return the number of status reads served from the shared result (hits) and from the brick (misses)."
+        total = self.status_hits + self.status_misses
+        return {
+            "hits": self.status_hits,
+            "misses": self.status_misses,
+            "hit_rate": self.status_hits / total if total else 0.0,
+        }
 
     def get_encoder(self):
         """
@@ -854,8 +1929,19 @@ class Motor:
         Keyword arguments:
         Returns the encoder position in degrees
         """
+        sample = self._fresh_status()
+        if sample is not None:
+            return sample[0][2]
         return self.brick.get_motor_encoder(self.port)
 
+    def get_encoder_sample(self) -> Sample:
+        "Read the motor encoder like get_encoder, as a Sample(position, t, seq)."
+        sample = self._fresh_status()
+        if sample is not None:
+            return Sample(sample[0][2], sample[1], sample[3])
+        value = self.brick.get_motor_encoder(self.port)
+        return Sample(value, time.monotonic(), next(self._seq))
+
     def get_position(self):
         """
         Read a motor encoder in degrees. The current position of the motor.
@@ -888,8 +1974,9 @@ class Motor:
         return self.get_status()[3]
 
     def is_moving(self):
+        _, power, _, speed = self.get_status()
         try:
-            return (not math.isclose(self.get_power(), 0)) and (not math.isclose(self.get_speed(), 0))
+            return (not math.isclose(power, 0)) and (not math.isclose(speed, 0))
         except TypeError:
             return None
 
@@ -911,7 +1998,13 @@ class Motor:
 
         You can zero the encoder by offsetting it by the current position
         """
-        self.brick.offset_motor_encoder(self.port, position)
+        with self._command_lock:
+            self._flush_pending()
+            self.brick.offset_motor_encoder(self.port, position)
+            self._status_sample = None
+            mode = self._commanded.get("mode")
+            if mode is not None and mode[0] == "position":
+                self._commanded.pop("mode")  # the target is relative to the old origin
 
     def reset_encoder(self):
         """
@@ -919,7 +2012,13 @@ class Motor:
 
         Keyword arguments:
         """
-        self.brick.reset_motor_encoder(self.port)
+        with self._command_lock:
+            self._flush_pending()
+            self.brick.reset_motor_encoder(self.port)
+            self._status_sample = None
+            mode = self._commanded.get("mode")
+            if mode is not None and mode[0] == "position":
+                self._commanded.pop("mode")  # the target is relative to the old origin
 
     def reset_position(self):
         """
@@ -949,6 +2048,341 @@ class Motor:
             time.sleep(sleep_interval)
 
 
+class MotorGroup:
+    """
+    Group of motors that receive their commands together.
+
+    Each motor gets its own target, but the commands for all motors are sent
+    back-to-back while holding a lock, so the motors start as close together
+    as possible and commands from other groups cannot slip in between.
+
+    Example:
+
+    wheels = MotorGroup(LEFT_MOTOR, RIGHT_MOTOR)
+    wheels.move_relative([85, 0], dps=150)  # pivot on the right wheel
+    """
+    _burst_lock = threading.Lock()  # shared by all groups, since they share the brick
+
+    def __init__(self, *motors: Motor):
+        if len(motors) == 0:
+            raise ValueError("MotorGroup needs at least one motor")
+        self.motors = motors
+
+    def _per_motor(self, values) -> list:
+        "Return one value per motor, repeating values if it is a single number."
+        if isinstance(values, (list, tuple)):
+            if len(values) != len(self.motors):
+                raise ValueError(f"Expected {len(self.motors)} values, one per motor, got {len(values)}")
+            return list(values)
+        return [values] * len(self.motors)
+
+    def set_power(self, power):
+        "Set the power of each motor. power can be one value, or a list with one value per motor."
+        powers = self._per_motor(power)
+        with MotorGroup._burst_lock:
+            for motor, p in zip(self.motors, powers):
+                motor.set_power(p)
+
+    def set_dps(self, dps):
+        "Set the speed of each motor. dps can be one value, or a list with one value per motor."
+        speeds = self._per_motor(dps)
+        with MotorGroup._burst_lock:
+            for motor, d in zip(self.motors, speeds):
+                motor.set_dps(d)
+
+    def set_limits(self, power=0, dps=0):
+        "Set the limits of each motor. See Motor.set_limits."
+        powers = self._per_motor(power)
+        speeds = self._per_motor(dps)
+        with MotorGroup._burst_lock:
+            for motor, p, d in zip(self.motors, powers, speeds):
+                motor.set_limits(p, d)
+
+    def set_position_relative(self, degrees):
+        "Rotate each motor relative to its current position. degrees has one value per motor."
+        targets = self._per_motor(degrees)
+        with MotorGroup._burst_lock:
+            for motor, d in zip(self.motors, targets):
+                motor.set_position_relative(d)
+
+    def move_relative(self, degrees, dps=None, wait=True, tolerance=None, timeout=None):
+        """
+        Rotate each motor relative to its current position, and (by default) wait until
+        every motor reaches its target. See Motor.move_relative.
+
+        degrees and dps can be one value, or a list with one value per motor.
+
+        Returns a list of MoveResult (one per motor) if wait is True, None otherwise.
+        """
+        targets = self._per_motor(degrees)
+        speeds = self._per_motor(dps)
+        # Read and configure everything first, so the position commands go out back-to-back
+        start_positions = [motor.get_encoder() for motor in self.motors]
+        with MotorGroup._burst_lock:
+            for motor, d in zip(self.motors, speeds):
+                if d is not None:
+                    motor.set_limits(dps=d)
+            start_time = time.perf_counter()  # the moves of all motors are measured from the same time
+            for motor, start, target, d in zip(self.motors, start_positions, targets, speeds):
+                motor._start_move(start, target, d, timeout, start_time)
+        if wait:
+            return self.wait_move_done(tolerance)
+        return None
+
+    def wait_move_done(self, tolerance=None) -> list[MoveResult]:
+        """
+        Wait until every motor has settled at the target of its last move, at the same time,
+        or has timed out. All motors are polled together, so a motor that leaves tolerance
+        while another one is still moving is seen, and its overshoot is measured.
+
+        Returns one MoveResult per motor (None for motors without a move).
+        """
+        watches = [None if motor._move is None else _MoveWatch(motor, tolerance) for motor in self.motors]
+        results = [None] * len(watches)
+        while True:
+            for i, watch in enumerate(watches):
+                if watch is not None and (results[i] is None or results[i].reached):
+                    results[i] = watch.check()  # timed out moves keep their result
+            if all(watch is None or result is not None for watch, result in zip(watches, results)):
+                return results
+            time.sleep(Motor.MOVE_POLL_INTERVAL)
+
+    def stop(self):
+        "Solidly stop every motor."
+        self.set_power(0)
+
+    def reset_encoder(self):
+        "Reset the encoder of every motor to 0."
+        for motor in self.motors:
+            motor.reset_encoder()
+
+    def get_encoders(self) -> list:
+        "Return the encoder position of every motor, in degrees."
+        return [motor.get_encoder() for motor in self.motors]
+
+
+class DifferentialDrive(MotorGroup):
+    """
+    Two-wheeled robot, driven by a left and a right motor.
+
+    Distances are in the same unit as wheel_diameter and track_width (eg, cm),
+    and angles are in degrees, positive to turn left (counterclockwise).
+
+    Example:
+
+    drive = DifferentialDrive(LEFT_MOTOR, RIGHT_MOTOR, wheel_diameter=4.3, track_width=11.5)
+    drive.drive(20)  # 20 cm forward
+    drive.turn(90)  # turn left on the spot
+    drive.arc(15, -90)  # quarter circle to the right, 15 cm radius
+    """
+    DEFAULT_DPS = 360
+
+    def __init__(self, left: Motor, right: Motor, wheel_diameter: float, track_width: float):
+        """
+        wheel_diameter - diameter of the wheels
+        track_width - distance between the centers of the two wheels
+        """
+        super(DifferentialDrive, self).__init__(left, right)
+        self.left = left
+        self.right = right
+        self.wheel_diameter = wheel_diameter
+        self.track_width = track_width
+
+    def distance_to_degrees(self, distance: float) -> float:
+        "Return the wheel rotation in degrees that rolls the wheel over distance."
+        return distance / (math.pi * self.wheel_diameter) * 360
+
+    def degrees_to_distance(self, degrees: float) -> float:
+        "Return the distance rolled by a wheel that rotates the given number of degrees."
+        return degrees / 360 * math.pi * self.wheel_diameter
+
+    def drive(self, distance: float, dps: float = DEFAULT_DPS, wait=True, tolerance=None, timeout=None):
+        "Drive straight for distance (negative to go backwards). See MotorGroup.move_relative."
+        degrees = self.distance_to_degrees(distance)
+        return self.move_relative([degrees, degrees], dps, wait, tolerance, timeout)
+
+    def turn(self, angle: float, dps: float = DEFAULT_DPS, wait=True, tolerance=None, timeout=None):
+        "Turn on the spot by angle degrees, positive to turn left. See MotorGroup.move_relative."
+        wheel_distance = math.radians(angle) * self.track_width / 2
+        degrees = self.distance_to_degrees(wheel_distance)
+        return self.move_relative([-degrees, degrees], dps, wait, tolerance, timeout)
+
+    def arc(self, radius: float, angle: float, dps: float = DEFAULT_DPS, wait=True, tolerance=None, timeout=None):
+        """
+        Drive forward along a circle of the given radius (measured to the center of the robot),
+        until the robot has turned by angle degrees, positive to turn left.
+        The outer wheel turns at dps, and the inner wheel is slowed down so both finish together.
+        """
+        if radius < 0:
+            raise ValueError("radius must be positive, use a negative angle to turn right")
+        sweep = abs(math.radians(angle))
+        inner = self.distance_to_degrees((radius - self.track_width / 2) * sweep)
+        outer = self.distance_to_degrees((radius + self.track_width / 2) * sweep)
+        inner_dps = abs(dps * inner / outer) if outer != 0 else dps
+        if angle >= 0:
+            degrees, speeds = [inner, outer], [inner_dps, dps]
+        else:
+            degrees, speeds = [outer, inner], [dps, inner_dps]
+        return self.move_relative(degrees, speeds, wait, tolerance, timeout)
+
+
+class AsyncSensor:
+    """
+    asyncio counterpart of a Sensor, obtained with sensor.aio.
+
+    Reads from the brick run in the event loop's default executor, so they never block
+    the loop. Waiting methods poll the sensor between awaits, so a single event loop
+    can wait on many devices at once, each with its own precise timeout.
+
+    Example:
+
+    async def main():
+        await COLOR_SENSOR.aio.wait_ready(timeout=2)
+        rgb = await COLOR_SENSOR.aio.read()
+    """
+    POLL_INTERVAL = WAIT_READY_INTERVAL
+
+    def __init__(self, sensor: Sensor):
+        self.sensor = sensor
+
+    async def read(self):
+        "Get the raw sensor value. May return a float, int, list or None if error."
+        return await _run_blocking(self.sensor.get_value)
+
+    async def get_status(self) -> str:
+        "Get the sensor status of this sensor. See Sensor.get_status."
+        return await _run_blocking(self.sensor.get_status)
+
+    async def wait_ready(self, timeout: float = None) -> bool:
+        """
+        Wait until the sensor is initialized.
+        Return True once it is ready, or False if timeout seconds passed first.
+        Errors while reading the status (eg, no sensor plugged in) count as not ready.
+        """
+        import asyncio  # imported here, since it is slow to import and only needed by async code
+
+        async def poll():
+            while True:
+                try:
+                    if await self.get_status() == Sensor.Status.VALID_DATA:
+                        return
+                except OSError:
+                    pass
+                await asyncio.sleep(self.POLL_INTERVAL)
+        return await _wait_with_timeout(poll(), timeout)
+
+
+class AsyncTouchSensor(AsyncSensor):
+    "asyncio counterpart of a TouchSensor, obtained with touch_sensor.aio."
+
+    def __init__(self, sensor: TouchSensor):
+        super(AsyncTouchSensor, self).__init__(sensor)
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._waiters_lock = threading.Lock()
+        self._listening = False
+
+    async def is_pressed(self) -> bool:
+        "Return True if pressed, False otherwise."
+        return await _run_blocking(self.sensor.is_pressed)
+
+    async def wait_for_press(self, timeout: float = None) -> bool:
+        """
+        Wait until the button is pressed. If the button is already held down,
+        wait for the next press.
+
+        Return True if the button was pressed, False if timeout seconds passed first.
+        """
+        import asyncio
+
+        if not self._listening:
+            self._listening = True
+            self.sensor.on_press(self._on_press)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._waiters_lock:
+            self._waiters.append(waiter)
+        # A waiter that timed out or was cancelled must not stay in the list until the next press
+        future.add_done_callback(lambda _: self._remove_waiter(waiter))
+        return await _wait_with_timeout(future, timeout)
+
+    def _remove_waiter(self, waiter: tuple):
+        with self._waiters_lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _on_press(self, sensor: TouchSensor):
+        "Poller thread callback: wake every coroutine waiting for a press."
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_future_result, future, True)
+
+
+class AsyncMotor:
+    "asyncio counterpart of a Motor, obtained with motor.aio."
+    POLL_INTERVAL = WAIT_READY_INTERVAL
+
+    def __init__(self, motor: Motor):
+        self.motor = motor
+
+    async def get_status(self) -> list:
+        "Read the motor status. See Motor.get_status."
+        return await _run_blocking(self.motor.get_status)
+
+    async def get_encoder(self) -> int:
+        "Read the motor encoder in degrees. See Motor.get_encoder."
+        return await _run_blocking(self.motor.get_encoder)
+
+    async def wait_is_moving(self, timeout: float = None) -> bool:
+        """
+        Wait until the motor is moving.
+        Return True once it moves, or False if timeout seconds passed first.
+        """
+        import asyncio
+
+        async def poll():
+            while not await _run_blocking(self.motor.is_moving):
+                await asyncio.sleep(self.POLL_INTERVAL)
+        return await _wait_with_timeout(poll(), timeout)
+
+    async def wait_is_stopped(self, timeout: float = None) -> bool:
+        """
+        Wait until the motor is stopped.
+        Return True once it stops, or False if timeout seconds passed first.
+        """
+        import asyncio
+
+        async def poll():
+            while await _run_blocking(self.motor.is_moving):
+                await asyncio.sleep(self.POLL_INTERVAL)
+        return await _wait_with_timeout(poll(), timeout)
+
+
+async def _run_blocking(func, *args):
+    "Call func(*args), which talks to the brick, in the default executor of the running loop."
+    import asyncio
+
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def _wait_with_timeout(awaitable, timeout: float = None) -> bool:
+    "Await awaitable, and return True if it finished or False if timeout seconds passed first."
+    import asyncio
+
+    try:
+        await asyncio.wait_for(awaitable, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def _set_future_result(future: asyncio.Future, result):
+    "Set the result of a future, unless it was already cancelled (eg, by a timeout)."
+    if not future.done():
+        future.set_result(result)
+
+
 def create_motors(motor_ports: list[Literal["A", "B", "C", "D"]] | str):
     return Motor.create_motors(motor_ports)
 
@@ -963,12 +2397,15 @@ def configure_ports(*,
                     PORT_C: Type[Motor] = None,
                     PORT_D: Type[Motor] = None,
                     wait: bool = True,
-                    print_status: bool = True) -> Sensor | Motor | list[Sensor | Motor]:
+                    print_status: bool = True,
+                    timeout: float = SENSOR_INIT_TIMEOUT) -> Sensor | Motor | list[Sensor | Motor]:
     """
     Configure the ports to use the specified sensor or motor and return objects for each item,
     ordered by sensor ports followed by motor ports.
 
     When wait is True (the default), the function will wait for the sensors to be ready before returning.
+    All sensors are waited on at the same time, for at most timeout seconds overall (None to wait forever).
+    Sensors that are not ready by then are printed as errors.
     When print_status is True (the default), the function will print two messages, the first to let the user
     know to wait until the ports are configured, and the second to indicate the port configuration is complete.
 
@@ -986,15 +2423,19 @@ def configure_ports(*,
             f"Configuring port{'' if is_single_device else 's'}, please wait...")
     sensors: list[Sensor] = []
     motors: list[Motor] = []
+    slow_sensors: dict[str, Sensor] = {}  # sensors that take time to initialize
     for n, sensor_type in enumerate(sensor_ports, 1):
         if sensor_type:
             sensor = sensor_type(n)
-            if wait:
-                if isinstance(sensor, (EV3UltrasonicSensor, EV3ColorSensor)):
-                    sensor.wait_ready()
-            if is_single_device:
-                return sensor
+            if isinstance(sensor, (EV3UltrasonicSensor, EV3ColorSensor)):
+                slow_sensors[str(n)] = sensor
             sensors.append(sensor)
+    if wait:
+        for port, result in _wait_ready_concurrently(slow_sensors, timeout).items():
+            if not result["ready"]:
+                print(f"Port {port} ({result['sensor']}) not ready: {result['error']}", file=sys.stderr)
+    if is_single_device and sensors:
+        return sensors[0]
     for letter, motor_type in zip("ABCD", motor_ports):
         if motor_type:
             if is_single_device:
@@ -1007,11 +2448,6 @@ def configure_ports(*,
 
 def reset_brick(*args):
     "Reset BrickPi devices when program exits ('at exit')."
+    if isinstance(BP, _LazyBrickPi3) and BP._driver is None:
+        return  # the brick was never used, so there is nothing to reset
     BP.reset_all()
-
-
-# Reset brick when the program exits
-try:
-    atexit.register(reset_brick)
-except ValueError as err:
-    print(err, "Must import brick in main thread", file=sys.stderr)
@@ -0,0 +1,433 @@
+"""
+Module for closed-loop controllers that drive the motors from sensor feedback,
+such as a PID line follower or gyro turns, and for running them at a fixed rate.
+
+Example:
+
+follower = LineFollower(LEFT_MOTOR, RIGHT_MOTOR, COLOR_SENSOR, target=40, base_dps=300)
+follower.run(duration=10)
+print(follower.get_stats())
+
+turner = GyroTurner(DifferentialDrive(LEFT_MOTOR, RIGHT_MOTOR, 4.3, 11.5), GYRO_SENSOR)
+result = turner.turn_by(90)  # MoveResult with the heading reached and the time it took
+
+runner = LoopRunner(rate=100)
+runner.run(lambda dt: print(dt), duration=1)  # any function of the time since the previous tick
+print(runner.get_stats())
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+from .brick import SPIN_TIME, DifferentialDrive, EV3ColorSensor, EV3GyroSensor, Motor, MoveResult, sleep_until
+from .filters import range_limit
+from .tracing import Histogram
+
+
+class PID:
+    """
+    Proportional-Integral-Derivative controller.
+
+    The output is clamped to output_limit (in both directions), and the integral
+    term stops accumulating while the output is saturated (anti-windup).
+    """
+
+    def __init__(self, kp: float, ki: float = 0.0, kd: float = 0.0, output_limit: float = math.inf):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = abs(output_limit)
+        self.reset()
+
+    def reset(self):
+        "Forget the accumulated integral and the previous error."
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, error: float, dt: float) -> float:
+        """
+        Return the controller output for the given error, dt seconds after the previous update.
+
+        >>> pid = PID(kp=2, ki=1, kd=0.5, output_limit=10)
+        >>> pid.update(1, 0.1)
+        2.1
+        >>> pid.update(100, 0.1)  # saturated, integral is not accumulated
+        10
+        >>> round(pid.integral, 6)
+        0.1
+        """
+        derivative = 0.0
+        if self.last_error is not None and dt > 0:
+            derivative = (error - self.last_error) / dt
+        self.last_error = error
+        integral = self.integral + error * dt
+        output = self.kp * error + self.ki * integral + self.kd * derivative
+        limited = range_limit(output, -self.output_limit, self.output_limit)
+        if limited == output:
+            self.integral = integral
+        return limited
+
+
+class LoopRunner:
+    """
+    Calls a function at a fixed rate, with each tick scheduled against an absolute
+    time.perf_counter() deadline, so the period does not drift with the time the work takes.
+    Waiting uses sleep_until (sleep, then spin for the last spin_time seconds).
+
+    A tick that ends after the next deadline is an overrun: the missed ticks are skipped,
+    and the next tick starts immediately, instead of bursting to catch up.
+    """
+
+    def __init__(self, rate: float, spin_time: float = SPIN_TIME):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of ticks per second")
+        self.period = 1 / rate
+        self.spin_time = spin_time
+        self._running = False
+        self._thread: threading.Thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        "Forget the timing statistics."
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self._period_sum = 0.0
+        self._period_square_sum = 0.0
+        self._max_jitter = 0.0
+        self._last_tick_time = None
+        self.period_histogram = Histogram()  # actual periods, in microseconds
+        self.jitter_histogram = Histogram()  # absolute difference from the period, in microseconds
+
+    def run(self, step, duration: float = None, stop_condition=None):
+        """
+        Call step(dt) every period, with dt the time since the previous tick (the period
+        at the first tick), until stop() is called, duration seconds have passed, or
+        stop_condition() returns True.
+        """
+        self._running = True
+        self._loop(step, duration, stop_condition)
+
+    def _loop(self, step, duration: float = None, stop_condition=None):
+        "Body of run, also the target of the start thread. Stops as soon as _running is cleared."
+        self.reset_stats()
+        period = self.period
+        start = next_time = time.perf_counter()
+        try:
+            while self._running:
+                now = time.perf_counter()
+                if duration is not None and now - start >= duration:
+                    break
+                if stop_condition is not None and stop_condition():
+                    break
+                step(self._record_tick(now))
+                next_time += period
+                now = time.perf_counter()
+                if now > next_time:
+                    # Overrun: start the next tick now, without trying to catch up
+                    self.overruns += 1
+                    self.missed_ticks += int((now - next_time) / period)
+                    next_time = now
+                else:
+                    sleep_until(next_time, self.spin_time)
+        finally:
+            self._running = False
+
+    def start(self, step, duration: float = None, stop_condition=None):
+        "Run the loop in a background thread. See run."
+        # Set before the thread starts, so that a stop() right after start() is never undone
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, args=(step, duration, stop_condition), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop the loop after the current tick, and wait for the background thread if there is one."
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def _record_tick(self, now: float) -> float:
+        "Update the timing statistics, and return the time since the previous tick."
+        self.ticks += 1
+        if self._last_tick_time is None:
+            self._last_tick_time = now
+            return self.period
+        actual = now - self._last_tick_time
+        self._last_tick_time = now
+        jitter = abs(actual - self.period)
+        self._period_sum += actual
+        self._period_square_sum += actual * actual
+        self._max_jitter = max(self._max_jitter, jitter)
+        self.period_histogram.add(actual * 1e6)
+        self.jitter_histogram.add(jitter * 1e6)
+        return actual
+
+    def get_stats(self) -> dict:
+        """
+        Return the timing statistics of the last run, in seconds: target and mean period,
+        standard deviation and largest deviation (jitter) of the period, the number of ticks,
+        overruns and skipped ticks, and histograms of the period and jitter (in microseconds).
+        """
+        count = self.ticks - 1
+        mean = self._period_sum / count if count > 0 else 0.0
+        variance = self._period_square_sum / count - mean * mean if count > 0 else 0.0
+        return {
+            "period": self.period,
+            "mean_period": mean,
+            "jitter_std": math.sqrt(max(variance, 0.0)),
+            "max_jitter": self._max_jitter,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "period_histogram": self.period_histogram.to_dict(),
+            "jitter_histogram": self.jitter_histogram.to_dict(),
+        }
+
+
+class LineFollower:
+    """
+    Fixed-rate PID controller that keeps the color sensor on the edge of a line,
+    by continuously adjusting the speed of the two drive motors with set_dps.
+
+    The measured value is the reflected red light (get_red) by default, or the mean
+    of the RGB components with source="rgb". The target is the value measured with
+    the sensor half on the line and half on the floor.
+
+    edge is 1 to follow the left edge of the line and -1 to follow the right edge.
+    """
+    RATE = 50  # control ticks per second
+
+    def __init__(self, left: Motor, right: Motor, sensor: EV3ColorSensor, target: float,
+                 base_dps: float = 300, kp: float = 4.0, ki: float = 0.0, kd: float = 0.2,
+                 rate: float = RATE, max_correction: float = None, source: str = "red", edge: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of ticks per second")
+        if source not in ("red", "rgb"):
+            raise ValueError('source must be "red" or "rgb"')
+        self.left = left
+        self.right = right
+        self.sensor = sensor
+        self.target = target
+        self.base_dps = base_dps
+        self.period = 1 / rate
+        self.source = source
+        self.edge = 1 if edge >= 0 else -1
+        if max_correction is None:
+            max_correction = abs(base_dps)
+        self.pid = PID(kp, ki, kd, output_limit=max_correction)
+        self.runner = LoopRunner(rate)
+        self.missed_reads = 0
+        self._thread: threading.Thread = None
+
+    def measure(self) -> float:
+        "Return the value compared to the target, or None if the sensor could not be read."
+        if self.source == "red":
+            return self.sensor.get_red()
+        rgb = self.sensor.get_rgb()
+        if None in rgb:
+            return None
+        return sum(rgb) / len(rgb)
+
+    def step(self, dt: float):
+        "Run one control tick: read the sensor, and set the speed of both motors."
+        value = self.measure()
+        if value is None:
+            self.missed_reads += 1
+            return
+        correction = self.edge * self.pid.update(self.target - value, dt)
+        limit = Motor.MAX_SPEED
+        self.left.set_dps(range_limit(self.base_dps - correction, -limit, limit))
+        self.right.set_dps(range_limit(self.base_dps + correction, -limit, limit))
+
+    def run(self, duration: float = None, stop_condition=None):
+        """
+        Follow the line until stop() is called, duration seconds have passed, or
+        stop_condition() returns True. The motors are stopped at the end.
+        """
+        self.missed_reads = 0
+        self.pid.reset()
+        try:
+            self.runner.run(self.step, duration, stop_condition)
+        finally:
+            self.left.set_dps(0)
+            self.right.set_dps(0)
+
+    def start(self, duration: float = None, stop_condition=None):
+        "Run the follower in a background thread. See run."
+        self._thread = threading.Thread(target=self.run, args=(duration, stop_condition), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop following the line, and wait for the background thread if there is one."
+        self.runner.stop()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """
+        Return the loop timing statistics of the last run (see LoopRunner.get_stats),
+        and the number of failed sensor reads.
+        """
+        stats = self.runner.get_stats()
+        stats["missed_reads"] = self.missed_reads
+        return stats
+
+
+class GyroTurner:
+    """
+    Turns a differential-drive robot on the spot to a heading measured by a gyro sensor,
+    with a PID loop on the heading error (the derivative term uses the rate measured by
+    the gyro). Headings are in degrees, positive counterclockwise (to the left), like
+    DifferentialDrive.turn.
+
+    The EV3 gyro counts clockwise as positive when mounted upright: use gyro_sign=1
+    if it is mounted upside down.
+
+    With encoder_weight > 0, the heading is a complementary filter of the gyro and the
+    wheel encoders: the encoders follow quick changes smoothly, and the gyro corrects
+    their drift from wheel slip. encoder_weight=0 uses the gyro alone.
+
+    The turn ends as soon as the heading is within tolerance of the target, with the robot
+    turning slower than settle_rate degrees per second. min_dps is the slowest wheel speed
+    used, so that the robot does not stall just before the target.
+    """
+    RATE = 100  # control ticks per second
+    TOLERANCE = 1  # degrees
+    SETTLE_RATE = 20  # degrees per second
+    MAX_DPS = 500  # wheel speed
+    MIN_DPS = 40  # wheel speed
+
+    def __init__(self, drive: DifferentialDrive, gyro: EV3GyroSensor, kp: float = 8.0, ki: float = 0.0,
+                 kd: float = 0.4, rate: float = RATE, tolerance: float = TOLERANCE,
+                 settle_rate: float = SETTLE_RATE, max_dps: float = MAX_DPS, min_dps: float = MIN_DPS,
+                 encoder_weight: float = 0.0, gyro_sign: int = -1):
+        if not 0 <= encoder_weight < 1:
+            raise ValueError("encoder_weight must be between 0 (gyro only) and 1 (excluded)")
+        self.drive = drive
+        self.gyro = gyro
+        self.kd = kd
+        self.tolerance = tolerance
+        self.settle_rate = settle_rate
+        self.max_dps = max_dps
+        self.min_dps = min_dps
+        self.encoder_weight = encoder_weight
+        self.gyro_sign = 1 if gyro_sign >= 0 else -1
+        self.pid = PID(kp, ki, 0.0, output_limit=max_dps)
+        self.runner = LoopRunner(rate)
+        self._offset = 0.0
+        self._heading = None
+        self._rate = 0.0
+        self._last_encoders = None
+
+    def _read_gyro(self) -> tuple[float, float]:
+        "Return the gyro (heading, rate) with the turner's sign, or None if the gyro could not be read."
+        value = self.gyro.get_both_measure()
+        if not isinstance(value, (list, tuple)) or None in value:
+            return None
+        angle, rate = value
+        return self.gyro_sign * angle - self._offset, self.gyro_sign * rate
+
+    def _encoder_turn(self) -> float:
+        "Return how many degrees the robot turned according to the encoders since the last call."
+        left, right = self.drive.left.get_encoder(), self.drive.right.get_encoder()
+        if left is None or right is None:
+            return 0.0
+        last = self._last_encoders
+        self._last_encoders = (left, right)
+        if last is None:
+            return 0.0
+        difference = self.drive.degrees_to_distance((right - last[1]) - (left - last[0]))
+        return math.degrees(difference / self.drive.track_width)
+
+    def update_heading(self) -> float:
+        "Read the sensors once, and return the current heading (None if it is not known)."
+        gyro = self._read_gyro()
+        turned = self._encoder_turn() if self.encoder_weight > 0 else 0.0
+        if gyro is None:
+            if self._heading is not None and self.encoder_weight > 0:
+                self._heading += turned
+            return self._heading
+        gyro_heading, self._rate = gyro
+        if self._heading is None or self.encoder_weight == 0:
+            self._heading = gyro_heading
+        else:
+            weight = self.encoder_weight
+            self._heading = weight * (self._heading + turned) + (1 - weight) * gyro_heading
+        return self._heading
+
+    def get_heading(self) -> float:
+        "Return the current heading, or None if the gyro could not be read."
+        self._heading = None
+        self._last_encoders = None
+        return self.update_heading()
+
+    def reset_heading(self, heading: float = 0.0):
+        "Declare the current direction of the robot to be heading."
+        gyro = self._read_gyro()
+        if gyro is not None:
+            self._offset += gyro[0] - heading
+        self._heading = None
+
+    def turn_by(self, angle: float, timeout: float = None) -> MoveResult:
+        "Turn by angle degrees from the current heading, positive to turn left. See turn_to_heading."
+        heading = self.get_heading()
+        if heading is None:
+            return MoveResult(None, None, False, 0.0, 0.0)
+        return self._turn(heading + angle, timeout)
+
+    def turn_to_heading(self, heading: float, timeout: float = None) -> MoveResult:
+        """
+        Turn the shortest way to the absolute heading (relative to the last reset_heading).
+
+        Returns a MoveResult with the target and reached headings, whether the heading
+        was reached within tolerance before the timeout (by default, one second plus the
+        time the turn takes at half of max_dps), the duration, and the overshoot in degrees.
+        """
+        current = self.get_heading()
+        if current is None:
+            return MoveResult(heading, None, False, 0.0, 0.0)
+        error = (heading - current + 180) % 360 - 180
+        return self._turn(current + error, timeout)
+
+    def _turn(self, target: float, timeout: float = None) -> MoveResult:
+        "Run the control loop until the heading reaches target, and return the result."
+        start_heading = self._heading
+        direction = 1 if target >= start_heading else -1
+        if timeout is None:
+            wheel_degrees = self.drive.distance_to_degrees(math.radians(abs(target - start_heading))
+                                                           * self.drive.track_width / 2)
+            timeout = 1 + wheel_degrees / (self.max_dps / 2)
+        self.pid.reset()
+        state = {"reached": False, "overshoot": 0.0}
+        start_time = time.perf_counter()
+
+        def step(dt):
+            heading = self.update_heading()
+            if heading is None:
+                return
+            error = target - heading
+            state["overshoot"] = max(state["overshoot"], -error * direction)
+            if abs(error) <= self.tolerance and abs(self._rate) <= self.settle_rate:
+                state["reached"] = True
+                self.runner.stop()
+                return
+            output = self.pid.update(error, dt) - self.kd * self._rate
+            if abs(error) > self.tolerance and abs(output) < self.min_dps:
+                output = math.copysign(self.min_dps, error)
+            output = range_limit(output, -self.max_dps, self.max_dps)
+            self.drive.set_dps([-output, output])
+
+        try:
+            self.runner.run(step, duration=timeout)
+        finally:
+            self.drive.set_dps(0)
+        duration = time.perf_counter() - start_time
+        return MoveResult(target, self._heading, state["reached"], duration, state["overshoot"])
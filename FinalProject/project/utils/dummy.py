@@ -458,7 +458,7 @@ class BrickPi3():
         pass
 
     def get_voltage_battery(self):
-        pass
+        return 9.0
 
     def set_sensor_type(self, port, type, params=0):
         i, _ = self._convert_port(port)
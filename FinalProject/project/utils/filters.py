@@ -5,6 +5,8 @@ Changes to the source list result in changes in the filters' results.
 Author: Ryan Au
 """
 
+from __future__ import annotations
+
 import math
 import time
 from collections import UserList, deque
@@ -0,0 +1,442 @@
+"""
+Module for running all brick I/O in a separate process.
+
+A BrickIOProcess owns the BrickPi3 driver: it continuously reads the configured sensors,
+the motor statuses and the battery voltage, and publishes them in shared memory.
+Commands (motor power, speed, position, sensor types, ...) are sent to it through a
+command ring in the same shared memory. The control program uses a SharedBrickPi3, which
+has the BrickPi3 methods used by utils.brick, so Sensor and Motor objects work unchanged,
+but never wait for the bus nor contend for the GIL with the I/O.
+
+Both processes take one multiprocessing.Lock on every access to the published state and
+to the command ring, which keeps them consistent and ordered on the Raspberry Pi's ARM CPU.
+The lock is only held while copying a few bytes: on a PC it adds under a microsecond to
+each read, and commands still show up in the published status after one update period.
+
+The motors are reset when the I/O process stops, including when it is terminated, and
+the control program stops it at exit if io.stop() was not called.
+
+The I/O process must be started before any device uses the default brick in the
+control program, so that only the I/O process talks to the hardware.
+
+Example:
+
+io = BrickIOProcess(rate=200)
+io.start()
+io.connect().set_default_brick()  # devices created from now on go through the I/O process
+COLOR_SENSOR = EV3ColorSensor(1)
+LEFT_MOTOR = Motor("A")
+...
+io.stop()
+"""
+
+from __future__ import annotations
+
+import atexit
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+import signal
+import struct
+import sys
+import time
+
+from . import brick
+from .brick import SENSOR_STATE, BrickPi3, SensorError
+
+
+MAGIC = b"BPIO\x00\x02\x00\x00"
+
+# BrickPi3 methods sent to the I/O process, by command id.
+COMMANDS = (
+    "set_sensor_type",
+    "set_motor_power",
+    "set_motor_position",
+    "set_motor_position_relative",
+    "set_motor_position_kp",
+    "set_motor_position_kd",
+    "set_motor_dps",
+    "set_motor_limits",
+    "offset_motor_encoder",
+    "reset_motor_encoder",
+    "reset_all",
+)
+_COMMAND_IDS = {name: i for i, name in enumerate(COMMANDS)}
+
+SENSOR_PORTS = (BrickPi3.PORT_1, BrickPi3.PORT_2, BrickPi3.PORT_3, BrickPi3.PORT_4)
+MOTOR_PORTS = (BrickPi3.PORT_A, BrickPi3.PORT_B, BrickPi3.PORT_C, BrickPi3.PORT_D)
+MAX_SENSOR_VALUES = 4
+
+# Shared memory layout. The slots, the state and the command ring are only read and written
+# while holding the multiprocessing.Lock of the BrickIOProcess. Besides keeping each copy
+# consistent, taking and releasing the lock are memory barriers: plain writes to shared
+# memory may be seen out of order by the other process on ARM (the Raspberry Pi).
+# The running and shutdown flags are single words that are only polled, so they are not locked.
+_HEADER = struct.Struct("<8sIIQd")  # magic, running, shutdown, loop count, battery voltage
+_FLAG = struct.Struct("<I")
+_RUNNING_OFFSET = 8  # written by the I/O process
+_SHUTDOWN_OFFSET = 12  # written by the control program
+_STATE = struct.Struct("<Qd")  # loop count and battery voltage, written by the I/O process
+_STATE_OFFSET = 16
+_SENSOR_SLOT = struct.Struct(f"<iiI{MAX_SENSOR_VALUES}ddQ")  # type, status, count, values, time, seq
+_MOTOR_SLOT = struct.Struct("<I4ddQ")  # valid, flags, power, encoder, dps, time, seq
+_RING_INDEXES = struct.Struct("<QQ")  # head (written by the control program), tail (written by the I/O process)
+_COMMAND = struct.Struct("<B3xi3d")  # command id, port, arguments
+RING_SIZE = 256
+
+_SENSORS_OFFSET = _HEADER.size
+_MOTORS_OFFSET = _SENSORS_OFFSET + 4 * _SENSOR_SLOT.size
+_RING_OFFSET = _MOTORS_OFFSET + 4 * _MOTOR_SLOT.size
+_COMMANDS_OFFSET = _RING_OFFSET + _RING_INDEXES.size
+_SIZE = _COMMANDS_OFFSET + RING_SIZE * _COMMAND.size
+
+
+def _from_float(value: float):
+    "Return a published value as the driver would, with whole numbers as int."
+    return int(value) if value.is_integer() else value
+
+
+class BrickIOProcess:
+    """
+    Process that owns the BrickPi3 driver, and publishes the device state rate times per second.
+
+    motor_ports are the motors whose status is read (all four by default). Sensors are read
+    once their type is set, eg, when a Sensor object is created in the control program.
+    The shared memory is guarded by a lock, taken by both processes on every access.
+    """
+    RATE = 200  # updates per second
+    BATTERY_PERIOD = 1  # seconds between battery voltage reads
+
+    def __init__(self, rate: float = RATE, motor_ports: str = "ABCD"):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of updates per second")
+        self.rate = rate
+        self.motor_ports = [brick.PORTS[port.upper()] for port in motor_ports]
+        self._memory: shared_memory.SharedMemory = None
+        self._lock = multiprocessing.Lock()  # guards the shared memory, see the layout above
+        self._process: multiprocessing.Process = None
+        self._client: SharedBrickPi3 = None
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the shared memory. To connect to the I/O process from another process,
+        give it name and lock when it is created, and use SharedBrickPi3(name, lock).
+        """
+        return self._memory.name
+
+    @property
+    def lock(self):
+        "Lock that guards the shared memory. See name."
+        return self._lock
+
+    def start(self, timeout: float = 10):
+        "Start the I/O process, and wait until it publishes its first update."
+        if self.is_running():
+            return
+        self._memory = shared_memory.SharedMemory(create=True, size=_SIZE)
+        self._memory.buf[:_SIZE] = bytes(_SIZE)
+        _HEADER.pack_into(self._memory.buf, 0, MAGIC, 0, 0, 0, math.nan)
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self._memory.name, self._lock, self.rate, self.motor_ports), daemon=True)
+        self._process.start()
+        # Runs before multiprocessing terminates its daemon processes at exit
+        atexit.register(self.stop)
+        deadline = time.monotonic() + timeout
+        while self._get_loops() == 0:
+            if not self._process.is_alive() or time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("the brick I/O process did not start")
+            time.sleep(0.001)
+
+    def _get_loops(self) -> int:
+        "Return the number of updates published by the I/O process."
+        with self._lock:
+            return _STATE.unpack_from(self._memory.buf, _STATE_OFFSET)[0]
+
+    def connect(self) -> SharedBrickPi3:
+        "Return the SharedBrickPi3 of this process, which reads and commands the brick through the I/O process."
+        if self._client is None:
+            self._client = SharedBrickPi3(self._memory.name, self._lock)
+        return self._client
+
+    def stop(self, timeout: float = 2):
+        "Ask the I/O process to reset the brick and exit, and release the shared memory."
+        if self._memory is None:
+            return
+        atexit.unregister(self.stop)
+        _FLAG.pack_into(self._memory.buf, _SHUTDOWN_OFFSET, 1)
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._process = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+
+def _serve(name: str, lock, rate: float, motor_ports: list):
+    "Target of the I/O process: apply the commands and publish the device state until asked to stop."
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)  # Process.terminate, still reset the motors
+    memory = shared_memory.SharedMemory(name=name)
+    buffer = memory.buf
+    driver = brick.initialize_brick(write_pid_file=False)  # the PID file belongs to the control program
+    status_brick = brick.Brick.shared(driver)
+    period = 1 / rate
+    sensor_seq = [0] * 4
+    motor_seq = [0] * 4
+    battery = math.nan
+    next_battery_time = 0.0
+    loops = 0
+    next_time = time.perf_counter()
+    try:
+        while True:
+            if _FLAG.unpack_from(buffer, _SHUTDOWN_OFFSET)[0]:
+                break
+            _apply_commands(buffer, lock, driver, status_brick)
+
+            for i, port in enumerate(SENSOR_PORTS):
+                sensor_type = driver.SensorType[i]
+                if sensor_type is None or sensor_type == BrickPi3.SENSOR_TYPE.NONE:
+                    continue
+                values = ()
+                try:
+                    value = driver.get_sensor(port)
+                    status = SENSOR_STATE.VALID_DATA
+                    values = value if isinstance(value, (list, tuple)) else (value,)
+                except (SensorError, OSError):
+                    try:
+                        status = status_brick.get_sensor_status(port)
+                    except OSError:
+                        status = SENSOR_STATE.NO_DATA
+                    if status == SENSOR_STATE.VALID_DATA:
+                        status = SENSOR_STATE.NO_DATA
+                values = [math.nan if v is None else v for v in values[:MAX_SENSOR_VALUES]]
+                count = len(values)
+                values += [math.nan] * (MAX_SENSOR_VALUES - count)
+                sensor_seq[i] += 1
+                with lock:
+                    _SENSOR_SLOT.pack_into(buffer, _SENSORS_OFFSET + i * _SENSOR_SLOT.size,
+                                           sensor_type, status, count, *values, time.monotonic(), sensor_seq[i])
+
+            for i, port in enumerate(MOTOR_PORTS):
+                if port not in motor_ports:
+                    continue
+                try:
+                    status = driver.get_motor_status(port)
+                    valid = 1
+                except OSError:
+                    status, valid = (0, 0, 0, 0), 0
+                status = [math.nan if v is None else v for v in status]
+                motor_seq[i] += 1
+                with lock:
+                    _MOTOR_SLOT.pack_into(buffer, _MOTORS_OFFSET + i * _MOTOR_SLOT.size,
+                                          valid, *status, time.monotonic(), motor_seq[i])
+
+            now = time.perf_counter()
+            if now >= next_battery_time:
+                try:
+                    voltage = driver.get_voltage_battery()
+                    battery = math.nan if voltage is None else voltage
+                except OSError:
+                    pass
+                next_battery_time = now + BrickIOProcess.BATTERY_PERIOD
+            loops += 1
+            with lock:
+                _STATE.pack_into(buffer, _STATE_OFFSET, loops, battery)
+            _FLAG.pack_into(buffer, _RUNNING_OFFSET, 1)
+
+            next_time += period
+            if next_time < time.perf_counter():
+                next_time = time.perf_counter()  # running late, skip the missed updates
+            else:
+                brick.sleep_until(next_time)
+    finally:
+        driver.reset_all()
+        _FLAG.pack_into(buffer, _RUNNING_OFFSET, 0)
+        del buffer
+        memory.close()
+
+
+def _exit_on_sigterm(signum, frame):
+    "Signal handler of the I/O process: exit through the finally block of _serve, which resets the brick."
+    raise SystemExit(0)
+
+
+def _apply_commands(buffer, lock, driver: BrickPi3, status_brick: brick.Brick):
+    "Run every command waiting in the ring, oldest first."
+    with lock:
+        head, tail = _RING_INDEXES.unpack_from(buffer, _RING_OFFSET)
+        commands = [_COMMAND.unpack_from(buffer, _COMMANDS_OFFSET + (index % RING_SIZE) * _COMMAND.size)
+                    for index in range(tail, head)]
+        struct.pack_into("<Q", buffer, _RING_OFFSET + 8, head)  # the commands were copied, free their space
+    for command_id, port, *args in commands:
+        name = COMMANDS[command_id]
+        try:
+            if name == "set_sensor_type":
+                status_brick.set_sensor_type(port, int(args[0]), int(args[1]))
+            elif name == "reset_all":
+                driver.reset_all()
+            elif name == "set_motor_limits":
+                driver.set_motor_limits(port, args[0], args[1])
+            elif name == "reset_motor_encoder":
+                driver.reset_motor_encoder(port)
+            else:
+                getattr(driver, name)(port, _from_float(args[0]))
+        except (OSError, SensorError, ValueError) as err:
+            print(f"Warning: {name} failed in the brick I/O process: {err}", file=sys.stderr)
+
+
+class SharedBrickPi3(BrickPi3):
+    """
+    BrickPi3 that reads the device state published by a BrickIOProcess, and sends it the commands.
+
+    Reads never touch the bus: they return the latest state published by the I/O process.
+    Commands are queued in the command ring, and applied at the next update of the I/O process.
+    lock is the lock of the BrickIOProcess (see BrickIOProcess.name). It is taken on every
+    read and every command.
+    """
+
+    def __init__(self, name: str, lock):
+        # The driver is in the I/O process: BrickPi3.__init__ is not called
+        self._memory = shared_memory.SharedMemory(name=name)
+        self._buffer = self._memory.buf
+        if _HEADER.unpack_from(self._buffer, 0)[0] != MAGIC:
+            raise ValueError(f"{name} is not the shared memory of a BrickIOProcess")
+        self.SPI_Address = 1
+        self.SensorType = [BrickPi3.SENSOR_TYPE.NONE] * 4
+        self.I2CInBytes = [0] * 4
+        self._lock = lock
+        self.ring_full_waits = 0
+
+    def close(self):
+        "Stop using the shared memory. The I/O process keeps running."
+        if self._memory is not None:
+            self._buffer.release()
+            self._memory.close()
+            self._memory = None
+
+    def __del__(self):
+        # Unlike the dummy BrickPi3, there are no motor threads to stop here
+        pass
+
+    def set_default_brick(self):
+        """
+        Make this the default brick for all newly initialized motors or sensors.
+        Use brick.restore_default_brick() to reset back to normal.
+        """
+        brick.restore_default_brick(self)
+
+    def _send(self, name: str, port: int, *args):
+        "Queue a command in the ring, waiting for space if the ring is full."
+        values = [float(arg) for arg in args] + [0.0] * (3 - len(args))
+        buffer = self._buffer
+        while True:
+            with self._lock:
+                head, tail = _RING_INDEXES.unpack_from(buffer, _RING_OFFSET)
+                if head - tail < RING_SIZE:
+                    _COMMAND.pack_into(buffer, _COMMANDS_OFFSET + (head % RING_SIZE) * _COMMAND.size,
+                                       _COMMAND_IDS[name], port, *values)
+                    struct.pack_into("<Q", buffer, _RING_OFFSET, head + 1)  # publish the command
+                    return
+            self.ring_full_waits += 1
+            time.sleep(0.0005)
+
+    def _sensor_slot(self, port: int) -> tuple:
+        index = SENSOR_PORTS.index(port) if port in SENSOR_PORTS else None
+        if index is None:
+            raise brick.IOError(
+                "get_sensor error. Must be one sensor port at a time. PORT_1, PORT_2, PORT_3, or PORT_4.")
+        with self._lock:
+            return index, _SENSOR_SLOT.unpack_from(self._buffer, _SENSORS_OFFSET + index * _SENSOR_SLOT.size)
+
+    def _motor_slot(self, port: int) -> tuple:
+        if port not in MOTOR_PORTS:
+            raise brick.IOError("get_motor_status error. Must be one motor port at a time. PORT_A, PORT_B, PORT_C, or PORT_D.")
+        index = MOTOR_PORTS.index(port)
+        with self._lock:
+            return _MOTOR_SLOT.unpack_from(self._buffer, _MOTORS_OFFSET + index * _MOTOR_SLOT.size)
+
+    def set_sensor_type(self, port, type, params=0):
+        index = SENSOR_PORTS.index(port)
+        self.SensorType[index] = type
+        self._send("set_sensor_type", port, type, params if isinstance(params, (int, float)) else 0)
+
+    def get_sensor(self, port):
+        return self.get_sensor_sample(port).value
+
+    def get_sensor_sample(self, port) -> brick.Sample:
+        "Return the latest published value of a sensor as a Sample, with the time and number of the read."
+        index, (sensor_type, status, count, *fields) = self._sensor_slot(port)
+        values, timestamp, seq = fields[:MAX_SENSOR_VALUES], fields[-2], fields[-1]
+        if seq == 0 or sensor_type != self.SensorType[index]:
+            raise SensorError("get_sensor error: Sensor not configured yet")
+        if status != SENSOR_STATE.VALID_DATA:
+            raise SensorError(f"get_sensor error: Invalid sensor data (status {status})")
+        values = [_from_float(v) for v in values[:count]]
+        return brick.Sample(values[0] if count == 1 else values, timestamp, seq)
+
+    def spi_transfer_array(self, data_out):
+        "Answer the sensor status requests of Brick.get_sensor_status from the published state."
+        index = data_out[1] - self.BPSPI_MESSAGE_TYPE.GET_SENSOR_1
+        if not 0 <= index < 4:
+            return [0, 0, 0, 0, 0, 0]
+        _, (sensor_type, status, _, *fields) = self._sensor_slot(SENSOR_PORTS[index])
+        if fields[-1] == 0 or sensor_type != self.SensorType[index]:
+            return [0, 0, 0, 0xA5, self.SensorType[index], SENSOR_STATE.CONFIGURING]
+        return [0, 0, 0, 0xA5, sensor_type, status]
+
+    def get_motor_status(self, port):
+        return self.get_motor_status_sample(port).value
+
+    def get_motor_status_sample(self, port) -> brick.Sample:
+        "Return the latest published status of a motor as a Sample, with the time and number of the read."
+        valid, flags, power, encoder, dps, timestamp, seq = self._motor_slot(port)
+        if not valid or seq == 0:
+            raise brick.IOError("get_motor_status error: No status published for this motor")
+        return brick.Sample([int(flags), int(power), int(encoder), int(dps)], timestamp, seq)
+
+    def get_motor_encoder(self, port):
+        return self.get_motor_status(port)[2]
+
+    def get_voltage_battery(self):
+        with self._lock:
+            voltage = _STATE.unpack_from(self._buffer, _STATE_OFFSET)[1]
+        return None if math.isnan(voltage) else voltage
+
+    def set_motor_power(self, port, power):
+        self._send("set_motor_power", port, power)
+
+    def set_motor_position(self, port, position):
+        self._send("set_motor_position", port, position)
+
+    def set_motor_position_relative(self, port, degrees):
+        self._send("set_motor_position_relative", port, degrees)
+
+    def set_motor_position_kp(self, port, kp=25):
+        self._send("set_motor_position_kp", port, kp)
+
+    def set_motor_position_kd(self, port, kd=70):
+        self._send("set_motor_position_kd", port, kd)
+
+    def set_motor_dps(self, port, dps):
+        self._send("set_motor_dps", port, dps)
+
+    def set_motor_limits(self, port, power=0, dps=0):
+        self._send("set_motor_limits", port, power, dps)
+
+    def offset_motor_encoder(self, port, position):
+        self._send("offset_motor_encoder", port, position)
+
+    def reset_motor_encoder(self, port):
+        self._send("reset_motor_encoder", port)
+
+    def reset_all(self):
+        self._send("reset_all", 0)
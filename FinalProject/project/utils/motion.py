@@ -0,0 +1,248 @@
+"""
+Module for smooth motor moves: the speed ramps up and down following a motion profile
+instead of jumping to full speed, which avoids wheel slip and overshoot at high speeds.
+
+A MotionProfile plans the speed over time of a move of a given distance, with limits on
+the speed, the acceleration and (optionally) the jerk. Without a jerk limit, the speed
+follows a trapezoid; with one, the corners of the trapezoid are rounded (S-curve).
+A ProfiledMover streams the planned speeds to the motors with set_dps at a fixed rate,
+correcting the drift between the planned and the actual encoder positions.
+
+Example:
+
+mover = ProfiledMover(MotorGroup(LEFT_MOTOR, RIGHT_MOTOR), acceleration=1500, jerk=15000)
+results = mover.move([720, 720], max_dps=600)  # one MoveResult per motor
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+from .brick import Motor, MotorGroup, MoveResult
+from .control import LoopRunner
+from .filters import range_limit
+
+
+class MotionProfile:
+    """
+    Speed plan of a move of distance degrees (positive or negative), starting and ending
+    at rest, with at most max_velocity degrees per second, max_acceleration degrees per
+    second squared and, if given, max_jerk degrees per second cubed.
+
+    The move accelerates, cruises at peak_velocity (which is lower than max_velocity on
+    short moves), and decelerates symmetrically. It lasts duration seconds.
+    """
+
+    def __init__(self, distance: float, max_velocity: float, max_acceleration: float, max_jerk: float = None):
+        if max_velocity <= 0 or max_acceleration <= 0 or (max_jerk is not None and max_jerk <= 0):
+            raise ValueError("max_velocity, max_acceleration and max_jerk must be positive")
+        self.distance = distance
+        self.direction = 1 if distance >= 0 else -1
+        self.max_acceleration = max_acceleration
+        self.max_jerk = max_jerk
+        length = abs(distance)
+        velocity = max_velocity
+        if velocity * self._ramp(velocity)[0] > length:
+            # Too short to reach max_velocity: find the peak velocity that covers exactly the distance
+            low, high = 0.0, max_velocity
+            for _ in range(60):
+                velocity = (low + high) / 2
+                if velocity * self._ramp(velocity)[0] > length:
+                    high = velocity
+                else:
+                    low = velocity
+            velocity = low
+        self.peak_velocity = velocity
+        self.ramp_time, self.jerk_time, self.acceleration = self._ramp(velocity)
+        self.cruise_time = (length - velocity * self.ramp_time) / velocity if velocity > 0 else 0.0
+        self.duration = 2 * self.ramp_time + self.cruise_time
+
+    def _ramp(self, velocity: float) -> tuple[float, float, float]:
+        """
+        Return the duration of the ramp from rest to velocity, the duration of each jerk
+        phase at the start and end of the ramp (0 without a jerk limit), and the highest
+        acceleration reached.
+        """
+        acceleration = self.max_acceleration
+        if self.max_jerk is None:
+            return velocity / acceleration, 0.0, acceleration
+        jerk_time = acceleration / self.max_jerk
+        if velocity < acceleration * jerk_time:
+            # max_acceleration is never reached: the ramp is made of the two jerk phases only
+            jerk_time = math.sqrt(velocity / self.max_jerk)
+            return 2 * jerk_time, jerk_time, self.max_jerk * jerk_time
+        return velocity / acceleration + jerk_time, jerk_time, acceleration
+
+    def _ramp_velocity(self, t: float) -> float:
+        "Speed t seconds into the ramp from rest."
+        jerk_time, ramp_time = self.jerk_time, self.ramp_time
+        if t <= 0:
+            return 0.0
+        if t >= ramp_time:
+            return self.peak_velocity
+        if t < jerk_time:
+            return self.max_jerk * t * t / 2
+        if t <= ramp_time - jerk_time:
+            return self.acceleration * (t - jerk_time / 2)
+        s = ramp_time - t
+        return self.peak_velocity - self.max_jerk * s * s / 2
+
+    def _ramp_position(self, t: float) -> float:
+        "Distance covered t seconds into the ramp from rest."
+        jerk_time, ramp_time = self.jerk_time, self.ramp_time
+        if t <= 0:
+            return 0.0
+        if t >= ramp_time:
+            return self.peak_velocity * ramp_time / 2 + self.peak_velocity * (t - ramp_time)
+        if t < jerk_time:
+            return self.max_jerk * t ** 3 / 6
+        if t <= ramp_time - jerk_time:
+            start = self.max_jerk * jerk_time ** 3 / 6 if jerk_time > 0 else 0.0
+            elapsed = t - jerk_time
+            return start + self._ramp_velocity(jerk_time) * elapsed + self.acceleration * elapsed * elapsed / 2
+        s = ramp_time - t
+        return self.peak_velocity * ramp_time / 2 - (self.peak_velocity * s - self.max_jerk * s ** 3 / 6)
+
+    def velocity(self, t: float) -> float:
+        """
+        Return the planned speed t seconds after the start of the move, in degrees per second.
+
+        >>> profile = MotionProfile(360, max_velocity=360, max_acceleration=720)
+        >>> profile.duration, profile.velocity(0.25), profile.velocity(0.75), profile.velocity(1.25)
+        (1.5, 180.0, 360, 180.0)
+        """
+        if t <= 0 or t >= self.duration:
+            return 0.0
+        if t < self.ramp_time:
+            speed = self._ramp_velocity(t)
+        elif t <= self.ramp_time + self.cruise_time:
+            speed = self.peak_velocity
+        else:
+            speed = self._ramp_velocity(self.duration - t)
+        return self.direction * speed
+
+    def position(self, t: float) -> float:
+        """
+        Return the planned distance covered t seconds after the start of the move, in degrees.
+
+        >>> profile = MotionProfile(-360, max_velocity=360, max_acceleration=720, max_jerk=7200)
+        >>> round(profile.position(profile.duration / 2), 6), profile.position(profile.duration)
+        (-180.0, -360)
+        """
+        if t <= 0:
+            return 0.0
+        if t >= self.duration:
+            return self.distance
+        length = abs(self.distance)
+        if t <= self.ramp_time + self.cruise_time:
+            covered = self._ramp_position(t)
+        else:
+            covered = length - self._ramp_position(self.duration - t)
+        return self.direction * covered
+
+
+class ProfiledMover:
+    """
+    Moves a group of motors (or a single motor) along motion profiles, by sending the
+    planned speed of each motor with set_dps rate times per second.
+
+    All motors finish together: the motor with the longest move follows the profile, and
+    the others follow it scaled to their own distance. The speed sent is corrected by kp
+    times the difference between the planned and the actual position, so the motors do
+    not drift away from the plan. After the profile, the correction continues until every
+    motor is within tolerance of its target, or for at most settle_timeout seconds.
+    """
+    RATE = 100  # speed updates per second
+    ACCELERATION = 1500  # degrees per second squared
+    KP = 5  # degrees per second of speed correction per degree of position error
+    SETTLE_TIMEOUT = 0.5  # seconds
+
+    def __init__(self, motors: MotorGroup | Motor, acceleration: float = ACCELERATION, jerk: float = None,
+                 rate: float = RATE, kp: float = KP, tolerance: float = Motor.MOVE_TOLERANCE,
+                 settle_timeout: float = SETTLE_TIMEOUT):
+        self.group = motors if isinstance(motors, MotorGroup) else MotorGroup(motors)
+        self.acceleration = acceleration
+        self.jerk = jerk
+        self.kp = kp
+        self.tolerance = tolerance
+        self.settle_timeout = settle_timeout
+        self.runner = LoopRunner(rate)
+        self.profile: MotionProfile = None
+        self.results: list[MoveResult] = None
+        self._thread: threading.Thread = None
+
+    def plan(self, degrees, max_dps: float) -> MotionProfile:
+        "Return the profile of the motor with the longest move, without moving."
+        distances = self.group._per_motor(degrees)
+        longest = max(distances, key=abs)
+        return MotionProfile(longest, max_dps, self.acceleration, self.jerk)
+
+    def move(self, degrees, max_dps: float, wait: bool = True) -> list[MoveResult]:
+        """
+        Rotate each motor relative to its current position, following a motion profile
+        with at most max_dps degrees per second. degrees can be one value, or a list with
+        one value per motor.
+
+        The move takes about self.plan(degrees, max_dps).duration seconds.
+        Returns a list of MoveResult (one per motor) if wait is True. Otherwise, returns None
+        immediately, and wait_done gives the results.
+        """
+        distances = self.group._per_motor(degrees)
+        self.profile = profile = self.plan(distances, max_dps)
+        scales = [d / profile.distance if profile.distance else 0.0 for d in distances]
+        starts = self.group.get_encoders()
+        targets = [start + d for start, d in zip(starts, distances)]
+        if not wait:
+            self._thread = threading.Thread(target=self._execute, args=(profile, scales, starts, targets),
+                                            daemon=True)
+            self._thread.start()
+            return None
+        return self._execute(profile, scales, starts, targets)
+
+    def wait_done(self) -> list[MoveResult]:
+        "Wait until the last move started with wait=False is done, and return its results."
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        return self.results
+
+    def _execute(self, profile: MotionProfile, scales: list, starts: list, targets: list) -> list[MoveResult]:
+        "Stream the speeds of a move to the motors, and return its results."
+        motors = self.group.motors
+        overshoots = [0.0] * len(motors)
+        directions = [1 if target >= start else -1 for start, target in zip(starts, targets)]
+        positions = list(starts)
+        done_time = [None]
+        start_time = time.perf_counter()
+
+        def step(dt):
+            elapsed = time.perf_counter() - start_time
+            planned = profile.position(elapsed)
+            speed = profile.velocity(elapsed)
+            settled = elapsed >= profile.duration
+            speeds = []
+            for i, motor in enumerate(motors):
+                position = motor.get_encoder()
+                if position is None:
+                    position = positions[i]
+                positions[i] = position
+                error = starts[i] + planned * scales[i] - position
+                overshoots[i] = max(overshoots[i], (position - targets[i]) * directions[i])
+                settled = settled and abs(targets[i] - position) <= self.tolerance
+                speeds.append(range_limit(speed * scales[i] + self.kp * error, -Motor.MAX_SPEED, Motor.MAX_SPEED))
+            if settled:
+                done_time[0] = elapsed
+                self.runner.stop()
+                return
+            self.group.set_dps(speeds)
+
+        try:
+            self.runner.run(step, duration=profile.duration + self.settle_timeout)
+        finally:
+            self.group.set_dps(0)
+        elapsed = done_time[0] if done_time[0] is not None else time.perf_counter() - start_time
+        self.results = [MoveResult(target, position, done_time[0] is not None, elapsed, overshoot)
+                        for target, position, overshoot in zip(targets, positions, overshoots)]
+        return self.results
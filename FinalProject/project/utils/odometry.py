@@ -0,0 +1,162 @@
+"""
+Module that keeps track of where a differential-drive robot is, by integrating
+its wheel encoders on a background thread.
+
+Example:
+
+drive = DifferentialDrive(LEFT_MOTOR, RIGHT_MOTOR, wheel_diameter=4.3, track_width=11.5)
+odometry = Odometry(drive)
+odometry.start()
+...
+pose = odometry.get_pose()  # Pose(x, y, theta, timestamp)
+if odometry.get_distance() > 50:
+    ...
+"""
+
+from __future__ import annotations
+
+from collections import deque, namedtuple
+import math
+import threading
+import time
+
+from .brick import DifferentialDrive
+
+
+# Position (x, y) in the drive's distance unit, heading theta in degrees (0 along the x axis,
+# positive counterclockwise), and the time.monotonic() time of the sample.
+Pose = namedtuple("Pose", "x y theta timestamp")
+
+
+class Odometry:
+    """
+    Background service that samples the drive motors' encoders at a fixed rate
+    and integrates the pose (x, y, theta) of the robot.
+
+    Reading the pose never blocks: the latest pose is an immutable Pose that is
+    replaced at every sample, and past poses are kept in a bounded history.
+    """
+    RATE = 100  # samples per second
+    HISTORY_SIZE = 1000  # number of past poses kept
+
+    def __init__(self, drive: DifferentialDrive, rate: float = RATE, history_size: int = HISTORY_SIZE):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of samples per second")
+        self.drive = drive
+        self.period = 1 / rate
+        self._history: deque[Pose] = deque(maxlen=history_size)
+        self._pose = Pose(0.0, 0.0, 0.0, time.monotonic())
+        self._distance = 0.0
+        self._last_encoders = None
+        self._lock = threading.Lock()  # taken by the writers only (sampling thread and reset)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+        self.samples = 0
+        self.missed_samples = 0
+
+    def start(self):
+        "Start sampling the encoders. Does nothing if already running."
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop sampling the encoders. The last pose is kept."
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def reset(self, x: float = 0.0, y: float = 0.0, theta: float = 0.0):
+        "Set the current pose of the robot, eg, when it is placed at a known position."
+        with self._lock:
+            self._last_encoders = None
+            self._distance = 0.0
+            self._history.clear()
+            self._set_pose(Pose(x, y, theta, time.monotonic()))
+
+    def get_pose(self) -> Pose:
+        "Return the latest pose of the robot."
+        return self._pose
+
+    def get_history(self, since: float = None) -> list[Pose]:
+        "Return the past poses, oldest first, optionally only those sampled after time since."
+        history = list(self._history)
+        if since is None:
+            return history
+        return [pose for pose in history if pose.timestamp > since]
+
+    def get_distance(self) -> float:
+        "Return the total distance travelled by the center of the robot since the last reset."
+        return self._distance
+
+    def update(self):
+        "Sample the encoders once and integrate the pose. Called by the sampling thread."
+        try:
+            left, right = self.drive.left.get_encoder(), self.drive.right.get_encoder()
+        except (OSError, TypeError):
+            self.missed_samples += 1
+            return
+        if left is None or right is None:
+            self.missed_samples += 1
+            return
+        timestamp = time.monotonic()
+        with self._lock:
+            self.samples += 1
+            if self._last_encoders is None:
+                self._last_encoders = (left, right)
+                pose = self._pose
+                self._set_pose(Pose(pose.x, pose.y, pose.theta, timestamp))
+                return
+            last_left, last_right = self._last_encoders
+            self._last_encoders = (left, right)
+            left_distance = self.drive.degrees_to_distance(left - last_left)
+            right_distance = self.drive.degrees_to_distance(right - last_right)
+            self._set_pose(integrate_pose(self._pose, left_distance, right_distance,
+                                          self.drive.track_width, timestamp))
+            self._distance += abs(left_distance + right_distance) / 2
+
+    def _set_pose(self, pose: Pose):
+        "Publish a new pose. The single assignment keeps readers lock-free."
+        self._pose = pose
+        self._history.append(pose)
+
+    def _run(self):
+        "Thread target: call update at a fixed rate, scheduled against absolute deadlines."
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.update()
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                # Running late, skip the missed samples instead of bursting to catch up
+                next_time = time.perf_counter()
+                delay = 0
+            self._stop_event.wait(delay)
+
+
+def integrate_pose(pose: Pose, left_distance: float, right_distance: float,
+                   track_width: float, timestamp: float) -> Pose:
+    """
+    Return the pose after the left and right wheels rolled the given distances,
+    using the differential-drive model (midpoint heading approximation).
+
+    >>> integrate_pose(Pose(0, 0, 0, 0), 10, 10, 12, 1)
+    Pose(x=10.0, y=0.0, theta=0.0, timestamp=1)
+    >>> p = integrate_pose(Pose(0, 0, 0, 0), -math.pi * 3, math.pi * 3, 12, 1)
+    >>> round(p.x, 6), round(p.y, 6), round(p.theta, 6)
+    (0.0, 0.0, 90.0)
+    """
+    distance = (left_distance + right_distance) / 2
+    delta_theta = (right_distance - left_distance) / track_width
+    theta = math.radians(pose.theta)
+    mid_theta = theta + delta_theta / 2
+    x = pose.x + distance * math.cos(mid_theta)
+    y = pose.y + distance * math.sin(mid_theta)
+    new_theta = math.degrees(theta + delta_theta)
+    return Pose(x, y, new_theta, timestamp)
@@ -0,0 +1,230 @@
+"""
+Module for recording sensor values and motor statuses at a high rate, into a binary file.
+
+The file is preallocated and memory-mapped, and used as a ring: once it is full, the oldest
+samples are overwritten. Each sample is one row of 64-bit floats: the time.monotonic() time
+of the sample, followed by the columns of every recorded device (NaN when a read failed).
+A small header at the start of the file describes the columns, so a recording can be loaded
+without knowing how it was made.
+
+Example:
+
+recorder = Recorder("run.rec", capacity=60000)
+recorder.add_sensor(COLOR_SENSOR, "color")
+recorder.add_motor(LEFT_MOTOR, "left")
+recorder.start(rate=1000)
+...
+recorder.close()
+
+columns = load_recording("run.rec")  # {"time": array('d', [...]), "color[0]": ..., "left.encoder": ...}
+"""
+
+from __future__ import annotations
+
+from array import array
+import json
+import math
+import mmap
+import struct
+import threading
+import time
+
+from .brick import Motor, Sensor
+
+
+# First bytes of a recording file.
+MAGIC = b"BPREC\x00\x01\x00"
+
+# Magic, size of the header in bytes, number of columns (including time), number of rows the file
+# can hold, and number of rows written since the file was created. The header is followed by the
+# column names as a JSON list, padded to the header size.
+_HEADER = struct.Struct("<8sIIQQ")
+_WRITTEN_OFFSET = 24  # offset of the number of rows written in the header
+
+# Columns recorded for each motor, from Motor.get_status.
+MOTOR_COLUMNS = ("flags", "power", "encoder", "dps")
+
+NAN = math.nan
+
+
+class RecordingError(Exception):
+    "Error raised when a recording file is invalid, or the recorder is used in the wrong state."
+    pass
+
+
+class Recorder:
+    """
+    Records the values of any set of sensors and the statuses of any set of motors,
+    either one sample at a time with record(), or at a fixed rate with start().
+
+    Every sample reads the brick, even for sensors served by a SensorHub and motors that
+    share their status (see Motor.set_status_max_age), so no sample is a repeated cached value.
+    Devices must be added before the file is opened, which happens at the first record()
+    or start(). The number of columns of a sensor is the length of its first value
+    (1 for single values), unless given when adding it.
+    """
+    CAPACITY = 100000  # rows kept in the file
+
+    def __init__(self, path: str, capacity: int = CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive number of rows")
+        self.path = path
+        self.capacity = capacity
+        self.columns: list[str] = ["time"]
+        self._devices: list[tuple[object, int]] = []  # (sensor or motor, number of columns)
+        self._file = None
+        self._map: mmap.mmap = None
+        self._row: struct.Struct = None
+        self._data_offset = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+        self.overruns = 0
+
+    def add_sensor(self, sensor: Sensor, name: str = None, width: int = None):
+        "Record the values of a sensor, in width columns named name[0], name[1], ..."
+        self._check_not_open()
+        name = name or f"{type(sensor).__name__}{sensor.port}"
+        if width is None:
+            value = sensor.get_value()
+            width = len(value) if isinstance(value, (list, tuple)) else 1
+        if width == 1:
+            self.columns.append(name)
+        else:
+            self.columns.extend(f"{name}[{i}]" for i in range(width))
+        self._devices.append((sensor, width))
+
+    def add_motor(self, motor: Motor, name: str = None):
+        "Record the statuses of a motor, in the columns name.flags, name.power, name.encoder and name.dps."
+        self._check_not_open()
+        name = name or f"motor{motor.port}"
+        self.columns.extend(f"{name}.{column}" for column in MOTOR_COLUMNS)
+        self._devices.append((motor, len(MOTOR_COLUMNS)))
+
+    def _check_not_open(self):
+        if self._map is not None:
+            raise RecordingError("devices cannot be added once the recording has started")
+
+    def open(self):
+        "Create the recording file, overwriting any existing file. Called by record and start."
+        if self._map is not None:
+            return
+        names = json.dumps(self.columns).encode()
+        header_size = _HEADER.size + len(names)
+        header_size += -header_size % 8  # keep the rows aligned
+        self._row = struct.Struct(f"<{len(self.columns)}d")
+        self._data_offset = header_size
+        size = header_size + self.capacity * self._row.size
+        self._file = open(self.path, "w+b")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._map[:header_size] = _HEADER.pack(MAGIC, header_size, len(self.columns), self.capacity, 0) \
+            + names.ljust(header_size - _HEADER.size, b" ")
+        self.written = 0
+
+    def record(self):
+        "Read every device once, and append the sample to the file."
+        if self._map is None:
+            self.open()
+        row = [time.monotonic()]
+        for device, width in self._devices:
+            if isinstance(device, Motor):
+                sample = device._read_status(shared=False)
+                value = list(sample[0]) if sample is not None else [None] * width
+            else:
+                value = device._read_value()
+            if isinstance(value, (list, tuple)):
+                values = [NAN if v is None else v for v in value[:width]]
+                values.extend([NAN] * (width - len(values)))
+                row.extend(values)
+            else:
+                row.append(NAN if value is None else value)
+        with self._lock:
+            offset = self._data_offset + (self.written % self.capacity) * self._row.size
+            self._row.pack_into(self._map, offset, *row)
+            self.written += 1
+            struct.pack_into("<Q", self._map, _WRITTEN_OFFSET, self.written)
+
+    def start(self, rate: float):
+        "Record rate samples per second in a background thread. Does nothing if already running."
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of samples per second")
+        if self.is_running():
+            return
+        self.open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(1 / rate,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop recording in the background. The file stays open."
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def close(self):
+        "Stop recording, and flush and close the file."
+        self.stop()
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._file.close()
+                self._map = None
+                self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self, period: float):
+        "Thread target: call record at a fixed rate, scheduled against absolute deadlines."
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.record()
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                # Running late, skip the missed samples instead of bursting to catch up
+                self.overruns += 1
+                next_time = time.perf_counter()
+            elif delay > 0.001:
+                self._stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+
+
+def load_recording(path: str) -> dict[str, array]:
+    """
+    Load a recording file into one array of floats per column, oldest sample first.
+    The "time" column holds the time.monotonic() time of each sample.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise RecordingError(f"{path} is not a recording file")
+    magic, header_size, column_count, capacity, written = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise RecordingError(f"{path} is not a recording file")
+    columns = json.loads(data[_HEADER.size:header_size])
+    if len(columns) != column_count:
+        raise RecordingError(f"{path} has an invalid header")
+
+    rows = array("d")
+    rows.frombytes(data[header_size:header_size + capacity * column_count * 8])
+    if struct.pack("<d", 1.0) != array("d", [1.0]).tobytes():
+        rows.byteswap()  # the file is little-endian
+    if written > capacity:
+        split = (written % capacity) * column_count  # start of the oldest row
+        rows = rows[split:] + rows[:split]
+    else:
+        rows = rows[:written * column_count]
+    return {name: rows[column::column_count] for column, name in enumerate(columns)}
@@ -41,7 +41,8 @@ class RemoteBrickClient(RemoteClient):
 class RemoteBrickServer(RemoteServer):
     def __init__(self, password, port=None):
         super(RemoteBrickServer, self).__init__(password, port)
-        self.register_object(brick.BP, var_name='brick')
+        # Register the BrickPi3 itself: the methods are looked up on the class of the object
+        self.register_object(brick._resolve_brick(brick.BP), var_name='brick')
 
 
 class RemoteEV3UltrasonicSensor(brick.EV3UltrasonicSensor):
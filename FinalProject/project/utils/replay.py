@@ -0,0 +1,227 @@
+"""
+Module for running a program offline against a recorded session.
+
+ReplayBrickPi3 is a BrickPi3 whose sensors and motor statuses come from a recording
+made with utils.recorder, instead of constant dummy values. The recorded values are served
+either with their original timing (speed=1), faster (eg, speed=10), or unthrottled
+(speed=None), where every read returns the next recorded sample of that device.
+Every command the program sends (motor power, speed, position, ...) is kept, so two runs
+can be compared.
+
+Example:
+
+replay = ReplayBrickPi3("run.rec", sensors={1: "color", 2: "touch"}, motors={"A": "left"}, speed=None)
+replay.set_default_brick()  # devices created from now on use the replay
+...  # run the program logic
+replay.save_commands("commands.json")
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+import json
+import math
+import threading
+import time
+
+from . import brick
+from .dummy import BrickPi3
+from .recorder import MOTOR_COLUMNS, load_recording
+
+
+# BrickPi3 methods whose calls are kept by ReplayBrickPi3.
+RECORDED_COMMANDS = (
+    "set_sensor_type",
+    "set_motor_power",
+    "set_motor_position",
+    "set_motor_position_relative",
+    "set_motor_position_kp",
+    "set_motor_position_kd",
+    "set_motor_dps",
+    "set_motor_limits",
+    "offset_motor_encoder",
+    "reset_motor_encoder",
+    "set_led",
+    "reset_all",
+)
+
+
+def _to_port(port) -> int:
+    "Return the BrickPi3 port value of a port given as 1-4, 'A'-'D' or a PORT_ constant."
+    return brick.PORTS[str(port).upper()] if str(port).upper() in brick.PORTS else port
+
+
+def _from_float(value: float):
+    "Return a recorded value as the driver would, with whole numbers as int."
+    return int(value) if value.is_integer() else value
+
+
+class _Stream:
+    "Recorded columns of one device, with the position of the next sample in unthrottled mode."
+
+    def __init__(self, columns: list):
+        self.columns = columns
+        self.cursor = 0
+
+
+class ReplayBrickPi3(BrickPi3):
+    """
+    BrickPi3 that serves the sensor values and motor statuses of a recording.
+
+    sensors and motors map ports (1-4 and 'A'-'D') to the names the devices were given when
+    recording. Ports that are not in the recording behave like the dummy brick.
+    A recorded read failure (NaN) raises SensorError for sensors and IOError for motors,
+    as the real driver does. Once the recording is over, the last values are kept.
+    """
+
+    def __init__(self, path: str, sensors: dict = None, motors: dict = None, speed: float = 1.0):
+        super().__init__()
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be a positive factor, or None for unthrottled replay")
+        self.speed = speed
+        recording = load_recording(path)
+        self.times = recording["time"]
+        self._sensor_streams: dict[int, _Stream] = {}
+        self._motor_streams: dict[int, _Stream] = {}
+        for port, name in (sensors or {}).items():
+            if name in recording:
+                columns = [recording[name]]
+            else:
+                columns = []
+                while f"{name}[{len(columns)}]" in recording:
+                    columns.append(recording[f"{name}[{len(columns)}]"])
+            if not columns:
+                raise KeyError(f"sensor {name} is not in the recording {path}")
+            self._sensor_streams[_to_port(port)] = _Stream(columns)
+        for port, name in (motors or {}).items():
+            try:
+                columns = [recording[f"{name}.{column}"] for column in MOTOR_COLUMNS]
+            except KeyError:
+                raise KeyError(f"motor {name} is not in the recording {path}") from None
+            self._motor_streams[_to_port(port)] = _Stream(columns)
+        self.commands: list[tuple[float, str, tuple]] = []
+        self._lock = threading.Lock()
+        self._start_time = None
+        for name in RECORDED_COMMANDS:
+            setattr(self, name, self._recording_command(name, getattr(self, name)))
+
+    def set_default_brick(self):
+        """
+        Make this replay the default brick for all newly initialized motors or sensors.
+        Use brick.restore_default_brick() to reset back to normal.
+        """
+        brick.restore_default_brick(self)
+
+    def start(self):
+        "Start the replay clock now. Otherwise, it starts at the first read."
+        self._start_time = time.perf_counter()
+
+    def rewind(self):
+        "Replay the recording from the beginning, and forget the recorded commands."
+        with self._lock:
+            self._start_time = None
+            self.commands = []
+            for stream in (*self._sensor_streams.values(), *self._motor_streams.values()):
+                stream.cursor = 0
+
+    def is_finished(self) -> bool:
+        "Return True once every recorded sample has been served."
+        if self.speed is None:
+            return all(stream.cursor >= len(self.times)
+                       for stream in (*self._sensor_streams.values(), *self._motor_streams.values()))
+        return self._start_time is not None and self._index() >= len(self.times) - 1
+
+    def _index(self) -> int:
+        "Return the index of the sample recorded at the current replay time."
+        if self._start_time is None:
+            self.start()
+        if not self.times:
+            return 0
+        elapsed = (time.perf_counter() - self._start_time) * self.speed
+        return max(0, bisect_right(self.times, self.times[0] + elapsed) - 1)
+
+    def _next_values(self, stream: _Stream) -> list:
+        "Return the values of the current sample of the stream."
+        with self._lock:
+            if self.speed is None:
+                index = min(stream.cursor, len(self.times) - 1)
+                stream.cursor += 1
+            else:
+                index = self._index()
+        if index < 0:
+            return [math.nan] * len(stream.columns)
+        return [column[index] for column in stream.columns]
+
+    def get_sensor(self, port):
+        stream = self._sensor_streams.get(port)
+        if stream is None:
+            return super().get_sensor(port)
+        values = self._next_values(stream)
+        if any(math.isnan(value) for value in values):
+            raise brick.SensorError("get_sensor error: No data in the recording")
+        if len(values) == 1:
+            return _from_float(values[0])
+        return [_from_float(value) for value in values]
+
+    def get_motor_status(self, port):
+        stream = self._motor_streams.get(port)
+        if stream is None:
+            return super().get_motor_status(port)
+        values = self._next_values(stream)
+        if any(math.isnan(value) for value in values):
+            raise brick.IOError("get_motor_status error: No data in the recording")
+        return [_from_float(value) for value in values]
+
+    def get_motor_encoder(self, port):
+        if port not in self._motor_streams:
+            return super().get_motor_encoder(port)
+        return self.get_motor_status(port)[2]
+
+    def _recording_command(self, name: str, method):
+        "Return a replacement for a command method that also keeps the call."
+        def command(*args):
+            with self._lock:
+                self.commands.append((time.perf_counter(), name, args))
+            return method(*args)
+        command.__name__ = name
+        return command
+
+    def get_commands(self, name: str = None) -> list[tuple[float, str, tuple]]:
+        "Return the (time, method name, arguments) of the commands sent so far, optionally of one method."
+        with self._lock:
+            commands = list(self.commands)
+        if name is None:
+            return commands
+        return [command for command in commands if command[1] == name]
+
+    def save_commands(self, path: str):
+        "Save the commands sent so far to a JSON file, with times relative to the start of the replay."
+        start = self._start_time if self._start_time is not None else 0.0
+        with open(path, "w") as f:
+            json.dump([[t - start, name, list(args)] for t, name, args in self.get_commands()], f, indent=1)
+
+
+def load_commands(path: str) -> list[tuple[float, str, tuple]]:
+    "Load commands saved with ReplayBrickPi3.save_commands."
+    with open(path) as f:
+        return [(t, name, tuple(args)) for t, name, args in json.load(f)]
+
+
+def compare_commands(expected: list, actual: list) -> list[tuple[int, tuple, tuple]]:
+    """
+    Compare two lists of (time, method name, arguments) commands, ignoring the times.
+    Return the (index, expected, actual) of every command that differs, with None for
+    missing commands.
+
+    >>> compare_commands([(0, "set_motor_dps", (1, 90))], [(0.1, "set_motor_dps", (1, 90))])
+    []
+    >>> compare_commands([(0, "set_motor_dps", (1, 90))], [(0, "set_motor_dps", (1, 0)), (1, "reset_all", ())])
+    [(0, ('set_motor_dps', (1, 90)), ('set_motor_dps', (1, 0))), (1, None, ('reset_all', ()))]
+    """
+    differences = []
+    for i in range(max(len(expected), len(actual))):
+        a = tuple(expected[i][1:]) if i < len(expected) else None
+        b = tuple(actual[i][1:]) if i < len(actual) else None
+        if a != b:
+            differences.append((i, a, b))
+    return differences
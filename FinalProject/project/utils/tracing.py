@@ -0,0 +1,213 @@
+"""
+Module for measuring how much time is spent talking to the brick.
+
+A BusTracer wraps the BrickPi3 driver methods used by utils.brick, and records the number
+of calls, a latency histogram for each method and port (or SPI message type), and the gaps
+between consecutive calls. Nothing is wrapped until the tracer is enabled, so tracing costs
+nothing when it is off.
+
+Example:
+
+tracer = BusTracer()
+tracer.enable()
+...  # run the control loop
+tracer.disable()
+print(tracer.summary())
+tracer.save_json("bus_trace.json")
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+from . import brick
+
+
+# BrickPi3 methods wrapped by a BusTracer.
+TRACED_METHODS = (
+    "get_sensor",
+    "get_sensor_sample",
+    "set_sensor_type",
+    "get_motor_status",
+    "get_motor_status_sample",
+    "get_motor_encoder",
+    "set_motor_power",
+    "set_motor_position",
+    "set_motor_position_relative",
+    "set_motor_position_kp",
+    "set_motor_position_kd",
+    "set_motor_dps",
+    "set_motor_limits",
+    "offset_motor_encoder",
+    "reset_motor_encoder",
+    "spi_transfer_array",
+)
+
+# Upper bounds of the histogram buckets, in microseconds.
+HISTOGRAM_BOUNDS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, float("inf"))
+
+
+class Histogram:
+    "Count of samples (in microseconds) falling in each of the HISTOGRAM_BOUNDS buckets."
+
+    def __init__(self):
+        self.buckets = [0] * len(HISTOGRAM_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+
+    def add(self, microseconds: float):
+        """
+        Add one sample.
+
+        >>> h = Histogram()
+        >>> h.add(15); h.add(15); h.add(400)
+        >>> h.buckets[:6], h.count, h.mean()
+        ([0, 2, 0, 0, 0, 1], 3, 143.33333333333334)
+        """
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if microseconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += microseconds
+        self.minimum = min(self.minimum, microseconds)
+        self.maximum = max(self.maximum, microseconds)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.mean(),
+            "min_us": self.minimum if self.count else None,
+            "max_us": self.maximum,
+            "buckets": {str(bound): n for bound, n in zip(HISTOGRAM_BOUNDS, self.buckets)},
+        }
+
+
+class BusTracer:
+    """
+    Opt-in instrumentation of the calls made to a BrickPi3 driver (the default brick if None).
+
+    Latencies are grouped by (method, port), where port is the motor or sensor port given
+    to the method, or the SPI message type for spi_transfer_array. Gaps are measured between
+    the end of a call and the start of the next one, ignoring calls made from inside another
+    traced call (eg, spi_transfer_array inside get_sensor). The time spent in driver calls
+    (bus time) also only counts these top-level calls, so nested calls are not counted twice.
+    """
+
+    def __init__(self, bp=None):
+        self.bp = brick._resolve_brick(brick.BP if bp is None else bp)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals: dict[str, object] = {}
+        self.reset()
+
+    def reset(self):
+        "Forget all recorded calls."
+        with self._lock:
+            self.latencies: dict[tuple[str, object], Histogram] = {}
+            self.gaps = Histogram()
+            self._bus_time = 0.0  # seconds spent in top-level calls
+            self._last_end = None
+            self._start_time = time.perf_counter()
+
+    def is_enabled(self) -> bool:
+        return len(self._originals) > 0
+
+    def enable(self):
+        "Start recording calls, by wrapping the driver methods. Does nothing if already enabled."
+        if self.is_enabled():
+            return
+        for name in TRACED_METHODS:
+            method = getattr(self.bp, name, None)
+            if callable(method):
+                self._originals[name] = method
+                setattr(self.bp, name, self._wrap(name, method))
+
+    def disable(self):
+        "Stop recording calls, and restore the original driver methods. Recorded data is kept."
+        for name in self._originals:
+            try:
+                delattr(self.bp, name)  # uncovers the class method again
+            except AttributeError:
+                pass
+            if getattr(self.bp, name, None) is not self._originals[name]:
+                setattr(self.bp, name, self._originals[name])
+        self._originals = {}
+
+    def _wrap(self, name: str, method):
+        "Return a replacement for the driver method that records the time of each call."
+        def traced(*args, **kwargs):
+            local = self._local
+            depth = getattr(local, "depth", 0)
+            local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                local.depth = depth
+                self._record(name, args, start, end, depth == 0)
+        traced.__name__ = name
+        traced.__doc__ = method.__doc__
+        return traced
+
+    def _record(self, name: str, args: tuple, start: float, end: float, top_level: bool):
+        if name == "spi_transfer_array":
+            port = args[0][1] if args and len(args[0]) > 1 else None  # SPI message type
+        else:
+            port = args[0] if args else None
+        with self._lock:
+            key = (name, port)
+            histogram = self.latencies.get(key)
+            if histogram is None:
+                histogram = self.latencies[key] = Histogram()
+            histogram.add((end - start) * 1e6)
+            if top_level:
+                self._bus_time += end - start
+                if self._last_end is not None:
+                    self.gaps.add(max(0.0, start - self._last_end) * 1e6)
+                self._last_end = end
+
+    def get_stats(self) -> dict:
+        "Return all recorded data as a dictionary that can be saved as JSON."
+        with self._lock:
+            elapsed = time.perf_counter() - self._start_time
+            calls = [{"method": name, "port": port, **histogram.to_dict()}
+                     for (name, port), histogram in sorted(self.latencies.items(), key=str)]
+            return {
+                "elapsed_s": elapsed,
+                "bus_time_s": self._bus_time,
+                "calls": calls,
+                "gaps": self.gaps.to_dict(),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.get_stats(), indent=2)
+
+    def save_json(self, path: str):
+        "Save the recorded data to a JSON file."
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    def summary(self) -> str:
+        "Return a text table of the recorded calls."
+        stats = self.get_stats()
+        lines = [f"{'method':<30}{'port':>6}{'calls':>8}{'mean us':>10}{'min us':>10}{'max us':>10}"]
+        for call in stats["calls"]:
+            minimum = call["min_us"] if call["min_us"] is not None else 0.0
+            lines.append(f"{call['method']:<30}{str(call['port']):>6}{call['count']:>8}"
+                         f"{call['mean_us']:>10.1f}{minimum:>10.1f}{call['max_us']:>10.1f}")
+        gaps = stats["gaps"]
+        lines.append(f"gaps between calls: {gaps['count']} gaps, mean {gaps['mean_us']:.1f} us, "
+                     f"max {gaps['max_us']:.1f} us")
+        if stats["elapsed_s"] > 0:
+            lines.append(f"time in driver calls: {stats['bus_time_s']:.3f} s of {stats['elapsed_s']:.3f} s "
+                         f"({stats['bus_time_s'] / stats['elapsed_s']:.1%})")
+        return "\n".join(lines)
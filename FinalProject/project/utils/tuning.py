@@ -0,0 +1,219 @@
+"""
+Module for tuning the position control gains (kp and kd) of a motor.
+
+The tuner runs step-response experiments: it sends the motor a fixed number of degrees
+with set_position_relative, records the encoder at a high rate, and measures the rise
+time, overshoot and settle time of the response. It searches for the kp/kd pair that
+settles the fastest without overshooting more than allowed, and saves it so that the
+program can load it at startup instead of using the defaults (kp=25, kd=70).
+
+Example:
+
+tuner = PositionTuner(CONVEYOR_MOTOR)
+best = tuner.tune()  # moves the motor back and forth for about a minute
+save_gains(CONVEYOR_MOTOR, best.kp, best.kd)
+
+# At startup:
+load_gains(CONVEYOR_MOTOR)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+from .brick import PORTS, Motor, sleep_until
+
+
+# File where the tuned gains of each motor port are saved.
+GAINS_FILE = os.path.expanduser("~/motor_gains.json")
+
+
+class StepResponse:
+    """
+    Measurements of one step-response experiment, in seconds and degrees.
+
+    kp, kd - gains used
+    rise_time - time to go from 10% to 90% of the step (None if never reached)
+    overshoot - largest distance past the target
+    settle_time - time after which the motor stayed within tolerance of the target (None if never)
+    final_error - distance from the target at the end of the experiment
+    """
+
+    def __init__(self, kp: float, kd: float, rise_time: float, overshoot: float,
+                 settle_time: float, final_error: float):
+        self.kp = kp
+        self.kd = kd
+        self.rise_time = rise_time
+        self.overshoot = overshoot
+        self.settle_time = settle_time
+        self.final_error = final_error
+
+    def __repr__(self):
+        return (f"StepResponse(kp={self.kp}, kd={self.kd}, rise_time={self.rise_time}, "
+                f"overshoot={self.overshoot}, settle_time={self.settle_time}, final_error={self.final_error})")
+
+
+def analyze_step(times: list, positions: list, start: float, target: float, tolerance: float,
+                 kp: float = None, kd: float = None) -> StepResponse:
+    """
+    Measure a step response from an encoder trace, with times relative to the command.
+
+    >>> r = analyze_step([0, 0.1, 0.2, 0.3, 0.4, 0.5], [0, 20, 90, 110, 101, 100], 0, 100, 2)
+    >>> round(r.rise_time, 6), r.overshoot, r.settle_time, r.final_error
+    (0.15, 10, 0.4, 0)
+    """
+    step = target - start
+    direction = 1 if step >= 0 else -1
+    low_time = high_time = None
+    previous_time, previous_progress = times[0], 0.0
+    for t, position in zip(times, positions):
+        progress = (position - start) * direction
+        if low_time is None and progress >= 0.1 * abs(step):
+            low_time = _crossing(previous_time, previous_progress, t, progress, 0.1 * abs(step))
+        if high_time is None and progress >= 0.9 * abs(step):
+            high_time = _crossing(previous_time, previous_progress, t, progress, 0.9 * abs(step))
+        previous_time, previous_progress = t, progress
+    rise_time = high_time - low_time if high_time is not None and low_time is not None else None
+
+    overshoot = max(0, max((position - target) * direction for position in positions))
+    settle_time = None
+    for t, position in zip(reversed(times), reversed(positions)):
+        if abs(position - target) > tolerance:
+            break
+        settle_time = t
+    return StepResponse(kp, kd, rise_time, overshoot, settle_time, target - positions[-1])
+
+
+def _crossing(t0: float, p0: float, t1: float, p1: float, level: float) -> float:
+    "Return the time at which progress crossed level, interpolated between two samples."
+    if p1 == p0:
+        return t1
+    return t0 + (t1 - t0) * (level - p0) / (p1 - p0)
+
+
+class PositionTuner:
+    """
+    Searches the position control gains of a motor that give the fastest well-damped step
+    response: the lowest settle time, with an overshoot of at most max_overshoot degrees.
+
+    Each experiment moves the motor by step degrees, alternately forward and back,
+    and records the encoder rate times per second for duration seconds.
+    The motor must be free to move (eg, wheels off the ground).
+    """
+    STEP = 180  # degrees
+    DURATION = 1.5  # seconds recorded per experiment
+    RATE = 500  # encoder reads per second
+    KP_VALUES = (10, 15, 25, 35, 50, 70)
+    KD_VALUES = (20, 40, 70, 100, 140)
+
+    def __init__(self, motor: Motor, step: float = STEP, tolerance: float = Motor.MOVE_TOLERANCE,
+                 max_overshoot: float = 5, duration: float = DURATION, rate: float = RATE):
+        self.motor = motor
+        self.step = step
+        self.tolerance = tolerance
+        self.max_overshoot = max_overshoot
+        self.duration = duration
+        self.period = 1 / rate
+        self.results: list[StepResponse] = []
+        self._direction = 1
+
+    def run_experiment(self, kp: float, kd: float) -> StepResponse:
+        "Run one step response with the given gains, and return its measurements."
+        motor = self.motor
+        motor.set_position_kp(kp)
+        motor.set_position_kd(kd)
+        step = self.step * self._direction
+        self._direction = -self._direction
+        start = motor.get_encoder()
+        target = start + step
+        times, positions = [], []
+        motor.set_position_relative(step)
+        start_time = next_time = time.perf_counter()
+        while True:
+            now = time.perf_counter() - start_time
+            if now > self.duration:
+                break
+            position = motor.get_encoder()
+            if position is not None:
+                times.append(now)
+                positions.append(position)
+            next_time += self.period
+            sleep_until(next_time)
+        if not positions:
+            positions, times = [start], [0.0]
+        result = analyze_step(times, positions, start, target, self.tolerance, kp, kd)
+        self.results.append(result)
+        return result
+
+    def cost(self, result: StepResponse) -> float:
+        "Return how bad a response is: its settle time, plus a penalty for excess overshoot."
+        settle_time = result.settle_time if result.settle_time is not None else 2 * self.duration
+        excess = max(0, result.overshoot - self.max_overshoot)
+        return settle_time + excess * 0.1
+
+    def tune(self, kp_values=KP_VALUES, kd_values=KD_VALUES, refine_steps: int = 3) -> StepResponse:
+        """
+        Try every kp/kd pair of the grid, then refine around the best pair by trying
+        neighbours at halving distances. Return the best response; its kp and kd are
+        left set on the motor.
+        """
+        best = None
+        for kp in kp_values:
+            for kd in kd_values:
+                result = self.run_experiment(kp, kd)
+                if best is None or self.cost(result) < self.cost(best):
+                    best = result
+        kp_delta = (max(kp_values) - min(kp_values)) / (2 * max(len(kp_values) - 1, 1))
+        kd_delta = (max(kd_values) - min(kd_values)) / (2 * max(len(kd_values) - 1, 1))
+        for _ in range(refine_steps):
+            for kp, kd in ((best.kp + kp_delta, best.kd), (best.kp - kp_delta, best.kd),
+                           (best.kp, best.kd + kd_delta), (best.kp, best.kd - kd_delta)):
+                if kp <= 0 or kd < 0:
+                    continue
+                result = self.run_experiment(round(kp, 1), round(kd, 1))
+                if self.cost(result) < self.cost(best):
+                    best = result
+            kp_delta /= 2
+            kd_delta /= 2
+        self.motor.set_position_kp(best.kp)
+        self.motor.set_position_kd(best.kd)
+        return best
+
+
+def _port_name(motor: Motor) -> str:
+    "Return the port letter of a motor, eg, 'A'."
+    for name in "ABCD":
+        if PORTS[name] == motor.port:
+            return name
+    return str(motor.port)
+
+
+def save_gains(motor: Motor, kp: float, kd: float, path: str = GAINS_FILE):
+    "Save the gains of a motor's port to the gains file, keeping those of the other ports."
+    gains = _read_gains_file(path)
+    gains[_port_name(motor)] = {"kp": kp, "kd": kd}
+    with open(path, "w") as f:
+        json.dump(gains, f, indent=2)
+
+
+def load_gains(motor: Motor, path: str = GAINS_FILE) -> tuple[float, float]:
+    """
+    Set the gains saved for a motor's port, and return them as (kp, kd).
+    Return None, leaving the motor unchanged, if none were saved.
+    """
+    gains = _read_gains_file(path).get(_port_name(motor))
+    if gains is None:
+        return None
+    motor.set_position_kp(gains["kp"])
+    motor.set_position_kd(gains["kd"])
+    return gains["kp"], gains["kd"]
+
+
+def _read_gains_file(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
@@ -31,11 +31,18 @@ stopMotor = True
 
 
 wait_ready_sensors()  # Note: Touch sensors actually have no initialization time
+
+# Set by any touch sensor press, so read_input can sleep until a button is pressed
+any_pressed = threading.Event()
+for touch_sensor in (TOUCH_SENSOR_1, TOUCH_SENSOR_2, TOUCH_SENSOR_3, TOUCH_SENSOR_4):
+    touch_sensor.on_press(lambda sensor: any_pressed.set())
+
+
 def read_input():
     global is_ts1_pressed, is_ts2_pressed, is_ts3_pressed, is_ts4_pressed
-    while True:
-        if TOUCH_SENSOR_1.is_pressed() or TOUCH_SENSOR_2.is_pressed() or TOUCH_SENSOR_3.is_pressed() or TOUCH_SENSOR_4.is_pressed():
-            break
+    any_pressed.clear()  # earlier presses must not wake this call up, a button held down still does
+    if not (TOUCH_SENSOR_1.is_pressed() or TOUCH_SENSOR_2.is_pressed() or TOUCH_SENSOR_3.is_pressed() or TOUCH_SENSOR_4.is_pressed()):
+        any_pressed.wait()
 
     i = 0
     while i < 2:
@@ -12,6 +12,7 @@ import math
 import atexit
 import os
 import signal
+import threading
 import time
 import sys
 
@@ -405,7 +406,12 @@ class TouchSensor(Sensor):
     """
     Basic touch sensor class. There is only one mode.
     Gives values 0 to 1, with 1 meaning the button is being pressed.
+
+    Presses can also be handled as events with on_press. One background thread
+    polls all the touch sensors that have press callbacks.
     """
+    POLL_INTERVAL = 0.0025  # seconds between reads, when the sensor is polled for events
+    DEBOUNCE = 0.003  # seconds a new state must last before it counts as a press
 
     def __init__(self, port: Literal[1, 2, 3, 4], mode: str = "touch", bp=None):
         """
@@ -414,6 +420,11 @@ class TouchSensor(Sensor):
         """
         super(TouchSensor, self).__init__(port, bp)
         self.set_mode(mode.lower())
+        self.debounce = TouchSensor.DEBOUNCE
+        self._press_callbacks = []
+        self._state = None  # debounced state, None until the first read
+        self._candidate = None
+        self._candidate_time = 0.0
 
     def set_mode(self, mode: str = "touch"):
         """
@@ -431,6 +442,56 @@ class TouchSensor(Sensor):
         "Return True if pressed, False otherwise."
         return self.get_value() == 1
 
+    def on_press(self, callback):
+        """
+        Call callback(sensor) every time the button is pressed.
+        Callbacks run in the polling thread, so they should return quickly.
+        """
+        self._press_callbacks.append(callback)
+        _start_touch_polling(self)
+        return callback
+
+    def _poll(self):
+        "Read the sensor once, debounce it, and call the press callbacks on a new press."
+        value = self.get_value()
+        if value is None:
+            return
+        now = time.monotonic()
+        pressed = value == 1
+        if pressed != self._candidate:
+            self._candidate, self._candidate_time = pressed, now
+        if pressed != self._state and now - self._candidate_time >= self.debounce:
+            if pressed and self._state is not None:
+                for callback in self._press_callbacks:
+                    callback(self)
+            self._state = pressed
+
+
+_polled_touch_sensors = []  # TouchSensors with press callbacks, read by the polling thread
+_touch_polling_lock = threading.Lock()
+_touch_polling_thread: threading.Thread = None
+
+
+def _start_touch_polling(sensor: TouchSensor):
+    "Add the sensor to the ones read by the polling thread, and start the thread if needed."
+    global _touch_polling_thread
+    with _touch_polling_lock:
+        if sensor not in _polled_touch_sensors:
+            _polled_touch_sensors.append(sensor)
+        if _touch_polling_thread is None:
+            _touch_polling_thread = threading.Thread(target=_poll_touch_sensors, daemon=True)
+            _touch_polling_thread.start()
+
+
+def _poll_touch_sensors():
+    "Thread target: read every touch sensor with press callbacks, then sleep for POLL_INTERVAL."
+    while True:
+        with _touch_polling_lock:
+            sensors = list(_polled_touch_sensors)
+        for sensor in sensors:
+            sensor._poll()
+        time.sleep(TouchSensor.POLL_INTERVAL)
+
 
 class EV3UltrasonicSensor(Sensor):
     """